@@ -1,25 +1,51 @@
 import pygame
 from commands import CommandType
-from typing import Optional, TYPE_CHECKING, Any, Dict
+from constants import (
+    TEXT_STYLE,
+    BACKPRESSURE,
+    MESSAGE_QUEUE_SIZE,
+)
+from typing import Optional, TYPE_CHECKING, Dict, FrozenSet, List, Tuple
 
 if TYPE_CHECKING:
     from kernel import Kernel
     from window import Window
+    from text_engine import TextEngine
+    from message_bus import Message
 
 
 class BaseApp:
+    title: str = "App"
     commands: Dict[str, CommandType] = {}
+    message_queue_size: int = MESSAGE_QUEUE_SIZE
+    message_policy: BACKPRESSURE = BACKPRESSURE.DROP_OLDEST
+    # pygame event types passed to handle_event(); None means every event
+    event_mask: Optional[FrozenSet[int]] = None
+    # Receive every MOUSEMOTION sample instead of one coalesced per frame
+    raw_motion: bool = False
+    # Hz for update() and message delivery while the window is active and
+    # while it is not; None means every frame. Skipped frames add up into
+    # the next update's dt, and urgent messages are never held back.
+    update_rate: Optional[float] = None
+    background_rate: Optional[float] = None
+    # draw() only touches the given surface and the app's own state (shared
+    # fonts under kernel.fonts.lock()), so the kernel may run it on a render
+    # thread alongside other such apps
+    threaded_draw: bool = False
 
-    def __init__(self, kernel: "Kernel", namespace: str, title: str = "App"):
+    def __init__(self, kernel: "Kernel", namespace: str, title: Optional[str] = None):
         self.kernel = kernel
         self.namespace: str = namespace
-        self.title = title
+        self.title = title or type(self).title
         self.window: Optional["Window"] = None
+        self.fonts: List[Tuple[Optional[str], int, TEXT_STYLE]] = []
 
     @classmethod
     def register_commands(cls) -> int:
         """
-        Called at kernel initialization to register custom app commands.
+        Called when the app is first imported to register custom app commands.
+        Their names are cached in the app manifest, so later boots can offer
+        them without importing the app.
         """
         return 0
 
@@ -35,9 +61,21 @@ class BaseApp:
         """
         pass
 
+    def on_visibility_changed(self, visible: bool) -> None:
+        """
+        Called when the window becomes fully hidden (minimized or covered by
+        other windows) or is shown again. Hidden windows are not drawn, so
+        expensive work feeding only the display can pause meanwhile.
+        """
+        pass
+
+    def wants_event(self, event_type: int) -> bool:
+        return self.event_mask is None or event_type in self.event_mask
+
     def handle_event(self, event: pygame.event.Event) -> None:
         """
-        Receive pygame events forwarded by the kernel/window.
+        Receive pygame events forwarded by the kernel/window, filtered by
+        event_mask.
         """
         pass
 
@@ -47,6 +85,14 @@ class BaseApp:
         """
         pass
 
+    def next_tick(self) -> Optional[float]:
+        """
+        Seconds until update() next has work to do, or None if the app is
+        idle until an event or message arrives. The kernel only sleeps when
+        no app needs a tick, so the default keeps the app ticking.
+        """
+        return 0.0
+
     def draw(self, surface: pygame.Surface) -> None:
         """
         Draw the app's content into the given surface clipped to content_rect.
@@ -55,5 +101,43 @@ class BaseApp:
         """
         pass
 
-    def listen(self, data: dict[str, Any]) -> None:
+    def load_font(
+        self,
+        path: Optional[str],
+        size: int,
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> pygame.font.Font:
+        """
+        Get a shared font from the kernel font manager. Released on close.
+        """
+        font = self.kernel.fonts.acquire(path, size, style)
+        self.fonts.append((path, size, style))
+        return font
+
+    def load_text(self, path: str, size: int) -> "TextEngine":
+        """
+        Get a shared monospace glyph-atlas text engine. Released on close.
+        """
+        text = self.kernel.fonts.acquire_text(path, size)
+        self.fonts.append((path, size, TEXT_STYLE(0)))
+        return text
+
+    def release_fonts(self) -> None:
+        for path, size, style in self.fonts:
+            self.kernel.fonts.release(path, size, style)
+        self.fonts.clear()
+
+    def invalidate(self, rect: Optional[pygame.Rect] = None) -> None:
+        """
+        Request a redraw of the app's content (or of rect, in content
+        coordinates). In compositor mode draw() is only called after this.
+        """
+        if self.window is not None:
+            self.window.invalidate(rect)
+
+    def listen(self, data: "Message") -> None:
+        """
+        Receive a message queued for this app's namespace (or a subscribed
+        topic). data supports dict-style get().
+        """
         pass
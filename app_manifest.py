@@ -0,0 +1,107 @@
+import os
+import json
+from logger import Logger
+from constants import BACKPRESSURE, CACHE_DIR
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, TypedDict
+
+if TYPE_CHECKING:
+    from app_base import BaseApp
+
+MANIFEST_VERSION = 1
+# Modules an app's manifest values can be inherited from, such as the
+# message queue size and policy defaults
+SHARED_SOURCES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ("app_base.py", "constants.py")
+]
+
+
+class AppManifest(TypedDict):
+    namespace: str
+    title: str
+    commands: List[str]
+    message_queue_size: int
+    message_policy: str
+
+
+def manifest_for(namespace: str, app: Type["BaseApp"]) -> AppManifest:
+    """
+    Describe an imported app class. Its commands must already be registered.
+    """
+    return {
+        "namespace": namespace,
+        "title": app.title,
+        "commands": sorted(app.commands),
+        "message_queue_size": app.message_queue_size,
+        "message_policy": app.message_policy.name,
+    }
+
+
+def policy_of(manifest: AppManifest) -> BACKPRESSURE:
+    return BACKPRESSURE[manifest["message_policy"]]
+
+
+def package_mtime(path: str) -> float:
+    """
+    Newest modification time of any source file in an app package, or of
+    the shared modules its manifest can inherit values from.
+    """
+    newest = max(os.path.getmtime(source) for source in SHARED_SOURCES)
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in files:
+            if name.endswith(".py"):
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return newest
+
+
+class ManifestCache:
+    """
+    On-disk cache of app manifests keyed by package mtime, so app discovery
+    at boot only reads a JSON file instead of importing every app.
+    """
+
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "apps.json")) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("apps", {})
+
+    def get(self, namespace: str, mtime: float) -> Optional[AppManifest]:
+        entry = self.entries.get(namespace)
+        if entry is None or entry.get("mtime") != mtime:
+            return None
+        return entry["manifest"]
+
+    def put(self, namespace: str, mtime: float, manifest: AppManifest) -> None:
+        self.entries[namespace] = {"mtime": mtime, "manifest": manifest}
+        self.dirty = True
+
+    def prune(self, namespaces: List[str]) -> None:
+        for name in set(self.entries) - set(namespaces):
+            del self.entries[name]
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "apps": self.entries}, f, indent=1
+                )
+            self.dirty = False
+        except OSError as e:
+            Logger.warn(f"Could not write app manifest cache: {e}", "appmng")
@@ -1,20 +1,29 @@
 import pygame
-from typing import Tuple
+from typing import Optional, Tuple
 from app_base import BaseApp
 from logger import Logger
+from constants import BACKGROUND_UPDATE_RATE
 
 
 from typing import TYPE_CHECKING, Any, Generator
 
 if TYPE_CHECKING:
     from kernel import Kernel
+    from message_bus import Message
 
 
 class CounterApp(BaseApp):
+    title = "Counter App"
+    event_mask = frozenset({pygame.MOUSEBUTTONDOWN})
+    threaded_draw = True
+    background_rate = BACKGROUND_UPDATE_RATE
+
     def __init__(self, kernel: "Kernel", namespace: str) -> None:
-        super().__init__(kernel, namespace, title="Counter App")
+        super().__init__(kernel, namespace)
         self.counter = 0
-        self.font = pygame.font.Font(None, 20)
+        self.font = self.load_font(None, 20)
+        # Shared with every other counter, which may draw at the same time
+        self.font_lock = kernel.fonts.lock(None, 20)
         self.bg: Tuple[int, int, int] = (40, 40, 40)
 
     @classmethod
@@ -31,7 +40,7 @@ class CounterApp(BaseApp):
         )
         yield f"Increased counters by one"
 
-    def listen(self, data: dict[str, Any]) -> None:
+    def listen(self, data: "Message") -> None:
         type = data.get("type")
 
         match type:
@@ -46,19 +55,26 @@ class CounterApp(BaseApp):
             case _:
                 return
 
+        self.invalidate()
+
     def handle_event(self, event: pygame.event.Event) -> None:
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             self.counter += 1
+            self.invalidate()
             self.kernel.queue_message(
                 "counter",
                 {"mode": "broadcast", "type": "set_value", "value": self.counter},
             )
             Logger.info(f"Counter updated to {self.counter}", "counter")
 
+    def next_tick(self) -> Optional[float]:
+        return None
+
     def draw(self, surface: pygame.Surface) -> None:
         surface.fill(self.bg)
 
         text = f"Clicks: {self.counter}"
 
-        surf = self.font.render(text, True, (220, 220, 220))
+        with self.font_lock:
+            surf = self.font.render(text, True, (220, 220, 220))
         surface.blit(surf, (8, 8))
@@ -1,23 +1,30 @@
 import pygame
-from typing import List
+from typing import FrozenSet, List, Optional
 from app_base import BaseApp
+from constants import MONO_FONT, BACKGROUND_UPDATE_RATE
 
 
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from kernel import Kernel
+    from message_bus import Message
 
 
 class LoggerApp(BaseApp):
+    title = "Logger"
+    event_mask: FrozenSet[int] = frozenset()
+    threaded_draw = True
+    background_rate = BACKGROUND_UPDATE_RATE
+
     def __init__(self, kernel: "Kernel", namespace: str) -> None:
-        super().__init__(kernel, namespace, title="Logger")
+        super().__init__(kernel, namespace)
         self.lines: List[str] = []
         self.max_lines = 200
-        self.font = pygame.font.Font("fonts/DMMono.ttf", 16)
+        self.text = self.load_text(MONO_FONT, 16)
         self.bg = (0, 0, 0)
 
-    def listen(self, data: dict[str, Any]) -> None:
+    def listen(self, data: "Message") -> None:
         if data.get("type") != "log":
             return
 
@@ -29,16 +36,22 @@ class LoggerApp(BaseApp):
         self.lines.append(f"[{channel}] {message}")
         if len(self.lines) > self.max_lines:
             self.lines = self.lines[-self.max_lines :]
+        self.invalidate()
+
+    def next_tick(self) -> Optional[float]:
+        return None
 
     def draw(self, surface: pygame.Surface) -> None:
         surface.fill(self.bg)
-        font_height = self.font.get_height()
+        font_height = self.text.line_height
         y = surface.get_height() - font_height - 4
 
+        runs = []
         for line in reversed(self.lines):
-            surf = self.font.render(line, True, (220, 220, 220))
-            surface.blit(surf, (4, y))
+            runs.append((line, (4, y)))
 
             y -= font_height + 4
             if y < 0:
                 break
+
+        self.text.draw_many(surface, runs, (220, 220, 220))
@@ -2,52 +2,217 @@ import pygame
 
 from pygame.event import Event
 from app_base import BaseApp
+from ring_buffer import RingBuffer
+from constants import MONO_FONT, SCROLLBACK_LINES, BACKGROUND_UPDATE_RATE
 
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 
 if TYPE_CHECKING:
     from kernel import Kernel
+    from command_scheduler import Job
 
 
 class TerminalApp(BaseApp):
+    title = "Terminal"
+    event_mask = frozenset({pygame.KEYDOWN, pygame.MOUSEWHEEL})
+    threaded_draw = True
+    background_rate = BACKGROUND_UPDATE_RATE
+    wheel_rows = 3
+
     def __init__(self, kernel: "Kernel", namespace: str) -> None:
-        super().__init__(kernel, namespace, title="Terminal")
-        self.lines: list[str] = []
+        super().__init__(kernel, namespace)
+        self.lines: RingBuffer[str] = RingBuffer(SCROLLBACK_LINES)
         self.inp_history: list[str] = []
         self.inp_history_idx: Optional[int] = None
         self.inp_history_temp: str = ""
         self.current: str = ""
         self.current_prefix: str = "[root@pkzos /]$"
+        # Job the prompt waits for; commands ending in '&' run in background
+        self.foreground: Optional["Job"] = None
+        self.typeahead: list[str] = []
+
+        self.max_lines: int = SCROLLBACK_LINES
+        self.text = self.load_text(MONO_FONT, 18)
 
-        self.max_lines: int = 200
-        self.font = pygame.font.Font("fonts/DMMono.ttf", 18)
+        # Viewport anchor: sequence number of the line at the bottom and how
+        # many of its wrapped rows are hidden below it; None follows output
+        self.scroll_seq: Optional[int] = None
+        self.scroll_row: int = 0
+        self.view_rows: int = 1
+        # Wrapped rows of long lines at the current width, by sequence number
+        self.wrap_cols: int = 0
+        self.wrap_cache: Dict[int, List[str]] = {}
         self.bg = (0, 0, 0)
 
         self.cursor_time: int = 0
         self.cursor_state: bool = True
+        # No blinking while the window is hidden, so it stops waking the kernel
+        self.blinking = True
+
+    def write(self, line: str) -> None:
+        for part in str(line).split("\n"):
+            self.lines.append(part)
+        if self.scroll_seq is None:
+            self.invalidate()
+
+    def wrap(self, line: str) -> Sequence[str]:
+        cols = self.wrap_cols
+        if len(line) <= cols:
+            return (line,)
+        return [line[i : i + cols] for i in range(0, len(line), cols)]
+
+    def wrapped(self, seq: int) -> Sequence[str]:
+        line = self.lines.get_seq(seq)
+        if len(line) <= self.wrap_cols:
+            return (line,)
+
+        rows = self.wrap_cache.get(seq)
+        if rows is None:
+            if len(self.wrap_cache) > 4 * self.view_rows + 64:
+                self.wrap_cache.clear()
+            rows = self.wrap_cache[seq] = list(self.wrap(line))
+        return rows
+
+    def move(self, seq: int, row: int, rows: int) -> Tuple[int, int]:
+        """
+        Move a (line, hidden rows) position by rows, up when positive,
+        clamped to the history. Costs O(rows), not O(history).
+        """
+        first = self.lines.first_seq
+        last = self.lines.total - 1
+        seq = max(seq, first)
+
+        while rows > 0:
+            height = len(self.wrapped(seq))
+            if row + rows < height:
+                return seq, row + rows
+            if seq == first:
+                return seq, height - 1
+            rows -= height - row
+            seq -= 1
+            row = 0
+
+        while rows < 0:
+            if row + rows >= 0:
+                return seq, row + rows
+            if seq == last:
+                return seq, 0
+            rows += row + 1
+            seq += 1
+            row = len(self.wrapped(seq)) - 1
+
+        return seq, row
+
+    def scroll(self, rows: int) -> None:
+        """
+        Scroll the viewport up (positive) or down by wrapped rows.
+        """
+        if not self.lines:
+            return
+
+        last = self.lines.total - 1
+        if self.scroll_seq is None:
+            seq, row = last, 0
+        else:
+            seq, row = self.scroll_seq, self.scroll_row
+        seq, row = self.move(seq, row, rows)
+
+        if rows > 0:
+            # Stop once the oldest line reaches the top of the viewport, which
+            # has one row less while scrolled for the "more lines" marker
+            first = self.lines.first_seq
+            top = self.move(first, len(self.wrapped(first)) - 1, 2 - self.view_rows)
+            if (seq, -row) < (top[0], -top[1]):
+                seq, row = top
+
+        if seq >= last and row == 0:
+            self.scroll_seq = None
+        else:
+            self.scroll_seq, self.scroll_row = seq, row
+        self.invalidate()
+
+    def scroll_to_end(self) -> None:
+        if self.scroll_seq is not None:
+            self.scroll_seq = None
+            self.invalidate()
 
     def send(self) -> None:
+        if self.foreground is not None:
+            self.typeahead.append(self.current)
+            self.current = ""
+            return
+
         text = self.current.strip()
         self.inp_history.append(text)
         self.inp_history_idx = None
-        self.lines.append(self.current_prefix + " " + text)
+        self.write(self.current_prefix + " " + text)
         self.current = ""
-        if len(self.lines) > self.max_lines:
-            self.lines = self.lines[-self.max_lines :]
 
-        output = self.kernel.execute_command(text)
-        if output:
-            for line in output:
-                self.lines.append(str(line))
+        background = text.endswith("&")
+        if background:
+            text = text[:-1].strip()
+        if not text:
+            return
+
+        job = self.kernel.run_command(
+            text, self.write, owner=self, on_done=self.job_done
+        )
+        if background:
+            self.write(f"[{job.id}] started")
+        else:
+            self.foreground = job
+
+    def job_done(self, job: "Job") -> None:
+        if job is self.foreground:
+            self.foreground = None
+            self.invalidate()
+            if self.typeahead:
+                self.current = self.typeahead.pop(0)
+                self.send()
+        else:
+            self.write(f"[{job.id}] done  {job.command}")
+
+    def on_close(self) -> None:
+        # Cancelling the foreground job would otherwise start the next line
+        self.typeahead.clear()
+
+    def interrupt(self) -> None:
+        if self.foreground is not None:
+            self.write("^C")
+            self.typeahead.clear()
+            self.kernel.jobs.cancel(self.foreground.id)
+        else:
+            self.write(self.current_prefix + " " + self.current + "^C")
+            self.current = ""
 
     def handle_event(self, event: Event) -> None:
+        if event.type == pygame.MOUSEWHEEL:
+            self.scroll(event.y * self.wheel_rows)
+            return
         if event.type != pygame.KEYDOWN:
             return
 
+        if event.key == pygame.K_c and event.mod & pygame.KMOD_CTRL:
+            self.interrupt()
+            return
+
+        match event.key:
+            case pygame.K_PAGEUP:
+                self.scroll(max(1, self.view_rows - 1))
+                return
+            case pygame.K_PAGEDOWN:
+                self.scroll(-max(1, self.view_rows - 1))
+                return
+            case pygame.K_END if not self.current:
+                self.scroll_to_end()
+                return
+
+        self.scroll_to_end()
         if event.unicode and len(event.unicode) == 1 and event.unicode.isprintable():
             self.current += event.unicode
             self.inp_history_idx = None
+            self.invalidate()
             return
 
         match event.key:
@@ -78,26 +243,66 @@ class TerminalApp(BaseApp):
             case _:
                 return
 
-    def draw(self, surface: pygame.Surface) -> None:
-        surface.fill(self.bg)
-        font_height = self.font.get_height()
-        y = surface.get_height() - font_height - 4
+        self.invalidate()
 
-        self.cursor_time += pygame.time.get_ticks() % 50
+    def on_visibility_changed(self, visible: bool) -> None:
+        self.blinking = visible
+        self.cursor_time = 0
+        self.cursor_state = True
+
+    def update(self, dt: float) -> None:
+        if not self.blinking:
+            return
+        self.cursor_time += int(dt * 1000)
         if self.cursor_time > 500:
             self.cursor_state = not self.cursor_state
             self.cursor_time = 0
-        display_current = (
-            self.current_prefix
-            + " "
-            + self.current
-            + ("|" if self.cursor_state else "")
-        )
+            if self.scroll_seq is None:
+                self.invalidate()
 
-        for line in reversed(self.lines + [display_current]):
-            surf = self.font.render(line, True, (220, 220, 220))
-            surface.blit(surf, (4, y))
+    def next_tick(self) -> Optional[float]:
+        if not self.blinking:
+            return None
+        return max(0, 500 - self.cursor_time) / 1000.0
 
-            y -= font_height + 4
-            if y < 0:
+    def draw(self, surface: pygame.Surface) -> None:
+        surface.fill(self.bg)
+        font_height = self.text.line_height
+        step = font_height + 4
+        y = surface.get_height() - font_height - 4
+        self.view_rows = max(1, y // step + 1)
+
+        cols = max(1, (surface.get_width() - 8) // self.text.char_width)
+        if cols != self.wrap_cols:
+            self.wrap_cols = cols
+            self.wrap_cache.clear()
+
+        runs = []
+        if self.scroll_seq is None:
+            # No prompt while a foreground command runs, typed text still shows
+            prompt = "" if self.foreground is not None else self.current_prefix + " "
+            display_current = prompt + self.current + ("|" if self.cursor_state else "")
+            rows = list(self.wrap(display_current))
+            seq, skip = self.lines.total - 1, 0
+        else:
+            below = self.lines.total - 1 - self.scroll_seq
+            rows = [f"-- {below} more lines below, End to return --"]
+            seq, skip = max(self.scroll_seq, self.lines.first_seq), self.scroll_row
+
+        # Walk up from the anchor only as far as the viewport reaches
+        first = self.lines.first_seq
+        while True:
+            for row in reversed(rows):
+                runs.append((row, (4, y)))
+                y -= step
+                if y < 0:
+                    break
+            if y < 0 or seq < first:
                 break
+
+            wrapped = self.wrapped(seq)
+            rows = wrapped[: len(wrapped) - skip] if skip else wrapped
+            skip = 0
+            seq -= 1
+
+        self.text.draw_many(surface, runs, (220, 220, 220))
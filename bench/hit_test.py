@@ -0,0 +1,86 @@
+"""
+Hit-testing micro-benchmark: linear z-order scan vs the spatial grid.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.hit_test
+"""
+
+import os
+import time
+import random
+import argparse
+from typing import Optional, Tuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from kernel import Kernel
+from window import Window
+from constants import SCREEN_SIZE
+
+
+def linear_hit(kernel: Kernel, pos: Tuple[int, int]) -> Optional[Window]:
+    for win in reversed(kernel.windows):
+        if win.visible and win.contains_point(pos):
+            return win
+    return None
+
+
+def run(count: int, queries: int) -> None:
+    kernel = Kernel(SCREEN_SIZE)
+    rng = random.Random(count)
+    w, h = SCREEN_SIZE
+
+    for _ in range(count):
+        size = (rng.randrange(120, 400), rng.randrange(90, 300))
+        pos = (rng.randrange(0, w - size[0]), rng.randrange(0, h - size[1]))
+        kernel.launch_app("counter", size=size, pos=pos)
+
+    # Shuffle z-order and geometry so the index is exercised incrementally
+    ids = [win.id for win in kernel.windows]
+    for i in range(count):
+        win = kernel.windows.order[rng.choice(ids)]
+        if i % 3 == 0:
+            win.rect.topleft = (
+                rng.randrange(0, w - win.rect.w),
+                rng.randrange(0, h - win.rect.h),
+            )
+            kernel.window_moved(win)
+        elif i % 3 == 1:
+            kernel.bring_to_front(win.id)
+        else:
+            kernel.send_to_back(win.id)
+
+    points = [(rng.randrange(0, w), rng.randrange(0, h)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    expected = [linear_hit(kernel, p) for p in points]
+    t_linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [kernel.window_at(p) for p in points]
+    t_grid = time.perf_counter() - start
+
+    assert expected == actual, "spatial grid disagrees with linear scan"
+    print(
+        f"{count:>5} windows: linear {t_linear / queries * 1e6:8.2f} us/hit"
+        f"  grid {t_grid / queries * 1e6:8.2f} us/hit"
+        f"  ({t_linear / t_grid:5.1f}x)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hit-testing benchmark.")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode(SCREEN_SIZE)
+    for count in args.counts:
+        run(count, args.queries)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
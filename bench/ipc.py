@@ -0,0 +1,89 @@
+"""
+Frame times of a kernel serving IPC, idle and while ipc_client floods it
+with messages from another process.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.ipc --messages 200000 --batch 1000
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from ipc import IPCServer
+from kernel import Kernel
+from logger import Logger
+from scheduler import percentiles
+from constants import FPS, SCREEN_SIZE
+
+SOCKET = "/tmp/pkzos-bench.sock"
+
+
+def frame(kernel: Kernel, screen: pygame.Surface) -> float:
+    start = time.perf_counter()
+    pygame.event.get()
+    kernel.update(1 / FPS)
+    kernel.draw(screen)
+    work = time.perf_counter() - start
+    time.sleep(max(0.0, 1 / FPS - work))
+    return work * 1000
+
+
+def report(name: str, samples: list[float]) -> None:
+    stats = percentiles(samples)
+    print(
+        f"{name:6} {len(samples):5} frames  p50 {stats[50]:6.2f}"
+        f"  p90 {stats[90]:6.2f}  p99 {stats[99]:6.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="IPC throughput benchmark.")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=120)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    kernel = Kernel(SCREEN_SIZE)
+    kernel.launch_app("logger", size=(640, 480), pos=(0, 0))
+    Logger.set_rate("ipc", None)
+    server = IPCServer(kernel, SOCKET)
+    server.start()
+    kernel.ipc = server
+
+    try:
+        report("idle", [frame(kernel, screen) for _ in range(args.frames)])
+
+        client = subprocess.Popen(
+            [
+                sys.executable,
+                "ipc_client.py",
+                "--socket",
+                SOCKET,
+                "--flood",
+                str(args.messages),
+                "--batch",
+                str(args.batch),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        flooded = []
+        while client.poll() is None:
+            flooded.append(frame(kernel, screen))
+        report("flood", flooded)
+        print(client.communicate()[0].strip())
+    finally:
+        server.stop()
+        kernel.ipc = None
+
+
+if __name__ == "__main__":
+    main()
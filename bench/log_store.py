@@ -0,0 +1,87 @@
+"""
+Persistent log store: logging cost, write throughput and query latency
+over millions of records.
+
+Run from the repository root:
+    python -m bench.log_store --records 2000000
+"""
+
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import resource
+from typing import Callable
+
+from log_store import LogStore
+
+CHANNELS = ["kernel", "appmng", "terminal", "counter", "system", "bench"]
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+
+def timed(label: str, fn: Callable[[], object]) -> None:
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    size = len(result) if isinstance(result, list) else result
+    print(f"{label:<36} {elapsed * 1000:9.2f} ms  ({size} records)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Log store benchmark.")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="pkzos-logs-")
+    rng = random.Random(0)
+    try:
+        # Room for the whole burst: this measures throughput, not shedding
+        store = LogStore(directory, backlog=args.records)
+        now = time.time()
+
+        start = time.perf_counter()
+        for i in range(args.records):
+            store.append(
+                now,
+                rng.choice(LEVELS),
+                rng.choice(CHANNELS),
+                "request %d handled in %.2fms",
+                (i, rng.random() * 10),
+            )
+        logged = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+
+        stats = store.stats()
+        print(
+            f"logged {args.records} records: {logged / args.records * 1e6:.2f} us"
+            f" each on the caller, {args.records / written:,.0f} records/s on disk"
+            f" ({stats['segments']} segments, {stats['bytes'] // 2**20} MiB)"
+        )
+
+        timed("tail 50", lambda: store.tail(50))
+        timed("tail 50 -c terminal", lambda: store.tail(50, channel="terminal"))
+        timed("tail 50 -l ERROR", lambda: store.tail(50, levels=["ERROR"]))
+        timed(
+            "search oldest 'request 12345 '",
+            lambda: next(store.query(text="request 12345 "), None) and 1,
+        )
+        timed(
+            "count ERROR on 'counter'",
+            lambda: sum(1 for _ in store.query("counter", ["ERROR"])),
+        )
+        timed(
+            "count text 'in 9.99'",
+            lambda: sum(1 for _ in store.query(text="in 9.99")),
+        )
+
+        store.close()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"peak RSS {rss // 1024} MiB")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
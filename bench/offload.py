@@ -0,0 +1,81 @@
+"""
+Frame pacing while a CPU-bound command runs, in-process vs offloaded.
+
+The command burns CPU for --chunk ms between yields, as naive CPU-bound
+code does. In-process, each resume stalls the frame for a whole chunk
+whatever the command budget; in the worker pool the frame rate stays flat.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.offload
+"""
+
+import os
+import time
+import argparse
+from typing import Any, Generator, List
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from kernel import Kernel
+from offload import OffloadPool
+from commands import offload
+from scheduler import percentiles
+from constants import SCREEN_SIZE, FPS
+
+
+@offload()
+def cmd_burn(kernel: Any, args: List[Any]) -> Generator[str, None, None]:
+    chunks, chunk_ms = int(args[0]), float(args[1])
+    for i in range(chunks):
+        end = time.perf_counter() + chunk_ms / 1000
+        n = 0
+        while time.perf_counter() < end:
+            n += 1
+        yield f"chunk {i}: {n} spins"
+
+
+def run(kernel: Kernel, screen: pygame.Surface, args: argparse.Namespace) -> None:
+    out: List[str] = []
+    job = kernel.run_command(f"burn {args.chunks} {args.chunk}", out.append)
+    clock = pygame.time.Clock()
+    intervals: List[float] = []
+
+    start = time.perf_counter()
+    while kernel.jobs.get(job.id) is not None:
+        intervals.append(clock.tick(FPS) / 1000)
+        kernel.update(1 / FPS)
+        kernel.draw(screen)
+    elapsed = time.perf_counter() - start
+
+    pcts = percentiles(intervals[1:], (50, 99))
+    mode = "offloaded" if kernel.offload is not None else "in-process"
+    print(
+        f"{mode:<11} {len(intervals) / elapsed:6.1f} fps"
+        f"  frame p50 {pcts[50] * 1000:6.2f} ms  p99 {pcts[99] * 1000:6.2f} ms"
+        f"  ({len(out)} lines in {elapsed:.2f}s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offloaded command benchmark.")
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--chunk", type=float, default=50.0, help="ms per chunk")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    kernel = Kernel(SCREEN_SIZE)
+    kernel.register_command("burn", cmd_burn)
+    kernel.launch_app("counter", size=(400, 300), pos=(20, 20))
+
+    run(kernel, screen, args)
+    kernel.offload = OffloadPool(args.workers)
+    run(kernel, screen, args)
+    kernel.offload.shutdown()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
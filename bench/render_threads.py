@@ -0,0 +1,84 @@
+"""
+Draw many uncovered windows every frame on the main thread and on a
+render thread pool, and check both produce the same screen.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.render_threads --counts 4 16 64
+"""
+
+import os
+import time
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from kernel import Kernel
+from scheduler import percentiles
+from constants import SCREEN_SIZE
+
+APPS = ["terminal", "logger", "counter"]
+
+
+def spawn(kernel: Kernel, count: int) -> None:
+    """
+    Tile count windows over the screen so that none covers another.
+    """
+    cols = 1
+    while cols * cols < count:
+        cols += 1
+    rows = -(-count // cols)
+    width, height = SCREEN_SIZE[0] // cols, SCREEN_SIZE[1] // rows
+    for i in range(count):
+        pos = ((i % cols) * width, (i // cols) * height)
+        wid = kernel.launch_app(APPS[i % len(APPS)], size=(width, height), pos=pos)
+        win = kernel.find_window_by_id(wid) if wid is not None else None
+        if win is not None and hasattr(win.app, "write"):
+            for line in range(200):
+                win.app.write(f"{i}:{line} the quick brown fox jumps over the dog")
+
+
+def run(kernel: Kernel, screen: pygame.Surface, frames: int) -> list[float]:
+    samples = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        kernel.draw(screen)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render thread pool benchmark.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    print(f"{os.cpu_count()} CPUs, {args.threads} render threads")
+
+    for count in args.counts:
+        kernel = Kernel(SCREEN_SIZE)
+        spawn(kernel, count)
+        kernel.update(0.0)
+
+        results = {}
+        images = {}
+        for threads in (0, args.threads):
+            kernel.set_render_threads(threads)
+            results[threads] = percentiles(run(kernel, screen, args.frames))
+            images[threads] = pygame.image.tobytes(screen, "RGB")
+        kernel.set_render_threads(0)
+
+        serial, threaded = results[0], results[args.threads]
+        same = "identical" if images[0] == images[args.threads] else "DIFFERENT"
+        print(
+            f"{count:3} windows  serial p50 {serial[50]:7.2f} p99 {serial[99]:7.2f} ms"
+            f"  threaded p50 {threaded[50]:7.2f} p99 {threaded[99]:7.2f} ms"
+            f"  x{serial[50] / max(threaded[50], 1e-9):.2f}  {same}"
+        )
+
+
+if __name__ == "__main__":
+    main()
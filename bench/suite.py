@@ -0,0 +1,433 @@
+"""
+Headless end-to-end benchmarks driving the Kernel frame by frame.
+
+Each scenario is timed per frame (update and draw separately) over a few
+passes keeping the best, then run again under tracemalloc for allocation figures. Results are written as
+JSON and optionally compared against a stored baseline; any metric that
+regresses past the threshold makes the run exit non-zero.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.suite
+    SDL_VIDEODRIVER=dummy python -m bench.suite --baseline bench/baseline.json
+    SDL_VIDEODRIVER=dummy python -m bench.suite --save-baseline bench/baseline.json
+    SDL_VIDEODRIVER=dummy python -m bench.suite --backend renderer --render-driver software
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import itertools
+import tracemalloc
+from typing import Any, Callable, Dict, Generator, List
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from kernel import Kernel
+from logger import Logger
+from scheduler import percentiles
+from render_backend import BACKENDS, TextureBackend
+from constants import SCREEN_SIZE, FLAGS, TITLEBAR_HEIGHT
+
+Step = Callable[[Kernel, int], List[pygame.event.Event]]
+Target = "pygame.Surface | TextureBackend"
+
+# Metrics where a larger value is a regression; everything else the reverse
+LOWER_IS_BETTER = (
+    "update_p50_ms",
+    "update_p99_ms",
+    "draw_p50_ms",
+    "draw_p99_ms",
+    "frame_p50_ms",
+    "frame_p99_ms",
+    "alloc_frame_kib",
+    "alloc_retained_kib",
+)
+HIGHER_IS_BETTER = ("messages_per_sec",)
+
+# Differences below these are noise whatever the ratio says
+ABSOLUTE_SLACK = {"ms": 0.05, "kib": 4.0, "messages_per_sec": 1000.0}
+
+
+class Scenario:
+    """
+    A named workload: setup() prepares a fresh kernel and returns the step
+    callback producing each frame's synthetic events.
+    """
+
+    def __init__(self, name: str, setup: Callable[[Kernel, argparse.Namespace], Step]):
+        self.name = name
+        self.setup = setup
+
+
+def spawn_counters(kernel: Kernel, args: argparse.Namespace) -> Step:
+    rng = random.Random(0)
+    w, h = SCREEN_SIZE
+    for _ in range(args.windows):
+        pos = (rng.randrange(0, w - 200), rng.randrange(0, h - 150))
+        kernel.launch_app("counter", size=(200, 150), pos=pos)
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        # Click a different window each frame so something is always dirty
+        win = kernel.windows[frame % len(kernel.windows)]
+        pos = (win.rect.x + 10, win.rect.y + TITLEBAR_HEIGHT + 10)
+        return [
+            pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=pos),
+            pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=pos),
+        ]
+
+    return step
+
+
+def logger_flood(kernel: Kernel, args: argparse.Namespace) -> Step:
+    # Measures the logging pipeline itself, so without storm protection
+    Logger.set_rate("bench", None)
+    kernel.launch_app("logger", size=SCREEN_SIZE, pos=(0, 0), flags=FLAGS.EMBEDDED)
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        for i in range(args.messages):
+            Logger.info("flood %d/%d", "bench", frame, i)
+        return []
+
+    return step
+
+
+def log_storm(kernel: Kernel, args: argparse.Namespace) -> Step:
+    """
+    A misbehaving app: the same warning over and over plus a flood of
+    distinct records, left to the default rate limit and dedup.
+    """
+    kernel.launch_app("logger", size=SCREEN_SIZE, pos=(0, 0), flags=FLAGS.EMBEDDED)
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        for i in range(args.messages // 2):
+            Logger.warn("connection lost, retrying", "storm")
+            Logger.info("storm %d/%d", "storm", frame, i)
+        return []
+
+    return step
+
+
+def count_broadcast(kernel: Kernel, args: argparse.Namespace) -> Step:
+    for i in range(args.windows):
+        kernel.launch_app("counter", size=(200, 150), pos=(i * 7 % 900, i * 5 % 500))
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        for _ in kernel.execute_command("count; count; count"):
+            pass
+        return []
+
+    return step
+
+
+def drag_windows(kernel: Kernel, args: argparse.Namespace) -> Step:
+    for i in range(args.windows):
+        kernel.launch_app("counter", size=(200, 150), pos=(i * 7 % 900, i * 5 % 500))
+    win = kernel.windows[-1]
+    grab = (win.rect.x + 40, win.rect.y + TITLEBAR_HEIGHT // 2)
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        events = []
+        if frame == 0:
+            events.append(
+                pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=grab)
+            )
+        # Several motion events per frame, as a fast mouse would deliver
+        for i in range(4):
+            t = frame * 4 + i
+            pos = (grab[0] + (t * 3) % 600, grab[1] + (t * 2) % 300)
+            events.append(
+                pygame.event.Event(
+                    pygame.MOUSEMOTION, pos=pos, rel=(3, 2), buttons=(1, 0, 0)
+                )
+            )
+        return events
+
+    return step
+
+
+def terminal_scrollback(kernel: Kernel, args: argparse.Namespace) -> Step:
+    wid = kernel.launch_app("terminal", size=SCREEN_SIZE, pos=(0, 0))
+    term = kernel.find_window_by_id(wid).app  # type: ignore[union-attr]
+    rng = random.Random(0)
+    for i in range(term.max_lines):
+        term.lines.append(f"{i:05d} " + "x" * rng.randrange(10, 120))
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        key = pygame.K_a + frame % 26
+        return [pygame.event.Event(pygame.KEYDOWN, key=key, unicode=chr(key), mod=0)]
+
+    return step
+
+
+def command_stream(kernel: Kernel, args: argparse.Namespace) -> Step:
+    def spam(kernel: Kernel, args: list) -> Generator[str, None, None]:
+        for i in itertools.count():
+            yield f"{i:08d} " + "y" * 60
+
+    kernel.register_command("spam", spam)
+    wid = kernel.launch_app("terminal", size=SCREEN_SIZE, pos=(0, 0))
+    term = kernel.find_window_by_id(wid).app  # type: ignore[union-attr]
+    term.current = "spam &"
+    term.send()
+
+    def step(kernel: Kernel, frame: int) -> List[pygame.event.Event]:
+        return []
+
+    return step
+
+
+SCENARIOS = [
+    Scenario("spawn_counters", spawn_counters),
+    Scenario("logger_flood", logger_flood),
+    Scenario("log_storm", log_storm),
+    Scenario("count_broadcast", count_broadcast),
+    Scenario("drag_windows", drag_windows),
+    Scenario("terminal_scrollback", terminal_scrollback),
+    Scenario("command_stream", command_stream),
+]
+
+
+def make_kernel(args: argparse.Namespace) -> Kernel:
+    Logger.buffer.clear()
+    Logger.reset_limits()
+    kernel = Kernel(SCREEN_SIZE, compositor=args.compositor)
+    Logger.kernel = kernel
+    return kernel
+
+
+def dispatched(kernel: Kernel) -> int:
+    return sum(q.dispatched for q in kernel.bus.queues.values())
+
+
+def time_scenario(
+    scenario: Scenario, screen: Target, args: argparse.Namespace
+) -> Dict[str, float]:
+    kernel = make_kernel(args)
+    step = scenario.setup(kernel, args)
+    dt = 1 / 60
+
+    for i in range(args.warmup):
+        kernel.handle_events(step(kernel, i))
+        kernel.update(dt)
+        kernel.draw(screen)
+
+    updates: List[float] = []
+    draws: List[float] = []
+    sent = dispatched(kernel)
+    total = 0.0
+
+    for i in range(args.warmup, args.warmup + args.frames):
+        events = step(kernel, i)
+        start = time.perf_counter()
+        kernel.handle_events(events)
+        kernel.update(dt)
+        mid = time.perf_counter()
+        kernel.draw(screen)
+        end = time.perf_counter()
+
+        updates.append(mid - start)
+        draws.append(end - mid)
+        total += end - start
+
+    messages = dispatched(kernel) - sent
+    frames = [u + d for u, d in zip(updates, draws)]
+    result: Dict[str, float] = {}
+    for label, samples in (("update", updates), ("draw", draws), ("frame", frames)):
+        pcts = percentiles(samples, (50, 99))
+        result[f"{label}_p50_ms"] = round(pcts[50] * 1000, 4)
+        result[f"{label}_p99_ms"] = round(pcts[99] * 1000, 4)
+    result["messages_per_sec"] = round(messages / total) if total else 0
+
+    for wid in [win.id for win in kernel.windows]:
+        kernel.close_window(wid)
+    return result
+
+
+def alloc_scenario(
+    scenario: Scenario, screen: Target, args: argparse.Namespace
+) -> Dict[str, float]:
+    """
+    Separate pass, since tracing slows every allocation down.
+    """
+    kernel = make_kernel(args)
+    step = scenario.setup(kernel, args)
+    dt = 1 / 60
+
+    for i in range(args.warmup):
+        kernel.handle_events(step(kernel, i))
+        kernel.update(dt)
+        kernel.draw(screen)
+
+    peaks: List[float] = []
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(args.warmup, args.warmup + args.alloc_frames):
+        events = step(kernel, i)
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        kernel.handle_events(events)
+        kernel.update(dt)
+        kernel.draw(screen)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for wid in [win.id for win in kernel.windows]:
+        kernel.close_window(wid)
+    return {
+        "alloc_frame_kib": round(percentiles(peaks, (50,))[50] / 1024, 2),
+        "alloc_retained_kib": round((current - baseline) / 1024, 2),
+    }
+
+
+def slack(metric: str) -> float:
+    if metric.endswith("_ms"):
+        return ABSOLUTE_SLACK["ms"]
+    if metric.endswith("_kib"):
+        return ABSOLUTE_SLACK["kib"]
+    return ABSOLUTE_SLACK.get(metric, 0.0)
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    tail_threshold: float,
+) -> List[str]:
+    """
+    Lines describing every metric that got worse than the baseline by more
+    than the relative threshold (and the absolute noise floor). Tail
+    latencies are far noisier than medians and get their own threshold.
+    """
+    regressions = []
+    for name, metrics in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        for metric, value in metrics.items():
+            if metric not in old:
+                continue
+            before = old[metric]
+            if metric in LOWER_IS_BETTER:
+                worse = value - before
+            elif metric in HIGHER_IS_BETTER:
+                worse = before - value
+            else:
+                continue
+            limit = tail_threshold if "_p99_" in metric else threshold
+            if worse > slack(metric) and worse > abs(before) * limit:
+                regressions.append(
+                    f"{name}.{metric}: {before} -> {value}"
+                    f" ({worse / before * 100 if before else 100:+.0f}%)"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless kernel benchmarks.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--alloc-frames", type=int, default=60)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--windows", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--compositor", action="store_true")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="surface")
+    parser.add_argument("--render-driver", help="SDL render driver for renderer")
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument("--save-baseline", help="Also write results here")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown counted as a regression (default 0.25)",
+    )
+    parser.add_argument(
+        "--tail-threshold",
+        type=float,
+        default=1.0,
+        help="Same for p99 metrics (default 1.0)",
+    )
+    args = parser.parse_args()
+
+    pygame.init()
+    screen: Target
+    if args.backend == TextureBackend.name:
+        screen = TextureBackend(SCREEN_SIZE, "bench", args.render_driver)
+    else:
+        screen = pygame.display.set_mode(SCREEN_SIZE)
+    Logger.set_level("INFO")
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "compositor": args.compositor,
+            "backend": args.backend,
+            "frames": args.frames,
+            "windows": args.windows,
+            "messages": args.messages,
+        },
+        "scenarios": {},
+    }
+
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        # Best of several passes: scheduling noise only ever adds time
+        runs = [time_scenario(scenario, screen, args) for _ in range(args.repeat)]
+        metrics = {
+            key: (max if key in HIGHER_IS_BETTER else min)(r[key] for r in runs)
+            for key in runs[0]
+        }
+        metrics.update(alloc_scenario(scenario, screen, args))
+        results["scenarios"][scenario.name] = metrics
+        m = metrics
+        print(
+            f"{scenario.name:<20}"
+            f" update p50 {m['update_p50_ms']:7.3f} p99 {m['update_p99_ms']:7.3f}"
+            f"  draw p50 {m['draw_p50_ms']:7.3f} p99 {m['draw_p99_ms']:7.3f} ms"
+            f"  alloc {m['alloc_frame_kib']:8.2f} KiB/frame"
+            f"  {m['messages_per_sec']:>9} msg/s"
+        )
+
+    if isinstance(screen, TextureBackend):
+        screen.close()
+    pygame.quit()
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+
+    if not args.baseline:
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    for key in ("compositor", "windows", "messages"):
+        if baseline.get("meta", {}).get(key) != results["meta"][key]:
+            print(f"warning: baseline was recorded with a different {key}")
+
+    regressions = compare(results, baseline, args.threshold, args.tail_threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
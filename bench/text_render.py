@@ -0,0 +1,83 @@
+"""
+Compare per-line font.render against the glyph-atlas TextEngine.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.text_render
+"""
+
+import os
+import time
+import random
+import string
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from constants import MONO_FONT
+from text_engine import TextEngine
+
+
+def make_lines(count: int, width: int) -> list[str]:
+    rng = random.Random(0)
+    chars = string.ascii_letters + string.digits + string.punctuation + " " * 8
+    return ["".join(rng.choice(chars) for _ in range(width)) for _ in range(count)]
+
+
+def bench_font_render(
+    surface: pygame.Surface, lines: list[str], size: int, frames: int
+) -> float:
+    font = pygame.font.Font(MONO_FONT, size)
+    step = font.get_height() + 4
+    start = time.perf_counter()
+    for _ in range(frames):
+        surface.fill((0, 0, 0))
+        y = 4
+        for line in lines:
+            surface.blit(font.render(line, True, (220, 220, 220)), (4, y))
+            y += step
+    return (time.perf_counter() - start) / frames
+
+
+def bench_text_engine(
+    surface: pygame.Surface, lines: list[str], size: int, frames: int
+) -> float:
+    engine = TextEngine(MONO_FONT, size)
+    step = engine.line_height + 4
+    start = time.perf_counter()
+    for _ in range(frames):
+        surface.fill((0, 0, 0))
+        engine.draw_many(
+            surface,
+            ((line, (4, 4 + i * step)) for i, line in enumerate(lines)),
+            (220, 220, 220),
+        )
+    return (time.perf_counter() - start) / frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Text rendering benchmark.")
+    parser.add_argument("--lines", type=int, default=30)
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--size", type=int, default=18)
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1280, 720))
+    surface = pygame.Surface((1280, 720)).convert()
+    lines = make_lines(args.lines, args.width)
+
+    t_font = bench_font_render(surface, lines, args.size, args.frames)
+    t_engine = bench_text_engine(surface, lines, args.size, args.frames)
+
+    print(f"{args.lines} lines x {args.width} cols, {args.frames} frames")
+    print(f"font.render : {t_font * 1000:8.3f} ms/frame")
+    print(f"TextEngine  : {t_engine * 1000:8.3f} ms/frame")
+    print(f"speedup     : {t_font / t_engine:8.2f}x")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
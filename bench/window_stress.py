@@ -0,0 +1,82 @@
+"""
+Spawn thousands of windows and time the window-manager operations.
+
+Run from the repository root:
+    SDL_VIDEODRIVER=dummy python -m bench.window_stress --windows 5000
+"""
+
+import os
+import time
+import random
+import argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from kernel import Kernel
+from constants import SCREEN_SIZE
+
+
+def timed(label: str, count: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<24} {elapsed * 1000:9.2f} ms total {elapsed / count * 1e6:9.2f} us/op"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Window manager stress test.")
+    parser.add_argument("--windows", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=20000)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode(SCREEN_SIZE)
+    kernel = Kernel(SCREEN_SIZE)
+    rng = random.Random(0)
+    ids: list[int] = []
+
+    def spawn() -> None:
+        for _ in range(args.windows):
+            pos = (rng.randrange(0, 900), rng.randrange(0, 500))
+            wid = kernel.launch_app("counter", size=(200, 150), pos=pos)
+            if wid is not None:
+                ids.append(wid)
+
+    def lookup() -> None:
+        for _ in range(args.ops):
+            kernel.find_window_by_id(rng.choice(ids))
+
+    def raise_windows() -> None:
+        for _ in range(args.ops):
+            kernel.bring_to_front(rng.choice(ids))
+
+    def lower_windows() -> None:
+        for _ in range(args.ops):
+            kernel.send_to_back(rng.choice(ids))
+
+    def raise_lower() -> None:
+        for i in range(args.ops):
+            if i % 2:
+                kernel.bring_to_front(rng.choice(ids))
+            else:
+                kernel.send_to_back(rng.choice(ids))
+
+    def close() -> None:
+        for wid in ids:
+            kernel.close_window(wid)
+
+    timed("launch", args.windows, spawn)
+    timed("find_window_by_id", args.ops, lookup)
+    timed("bring_to_front", args.ops, raise_windows)
+    timed("send_to_back", args.ops, lower_windows)
+    timed("bring_to_front/back", args.ops, raise_lower)
+    timed("close", len(ids), close)
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
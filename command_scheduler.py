@@ -0,0 +1,164 @@
+import time
+from collections import OrderedDict
+from logger import Logger
+from constants import COMMAND_BUDGET
+from typing import Any, Callable, Generator, Optional
+
+# A command may yield None to give up the rest of its slice without output
+CommandGenerator = Generator[Optional[str], None, None]
+OutputSink = Callable[[str], None]
+
+
+class Job:
+    __slots__ = (
+        "id",
+        "command",
+        "gen",
+        "output",
+        "owner",
+        "on_done",
+        "started",
+        "lines",
+        "cancelled",
+    )
+
+    def __init__(
+        self,
+        jid: int,
+        command: str,
+        gen: CommandGenerator,
+        output: OutputSink,
+        owner: Any = None,
+        on_done: Optional[Callable[["Job"], None]] = None,
+    ) -> None:
+        self.id = jid
+        self.command = command
+        self.gen = gen
+        self.output = output
+        self.owner = owner
+        self.on_done = on_done
+        self.started = time.perf_counter()
+        self.lines = 0
+        # Cancelled from inside its own generator, closed once it yields
+        self.cancelled = False
+
+    @property
+    def runtime(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class CommandScheduler:
+    """
+    Runs command generators cooperatively: each frame step() resumes the
+    active jobs round-robin until the time budget is spent, so a command
+    producing lots of output can never stall the frame for longer than a
+    single resume takes.
+    """
+
+    def __init__(self, budget: float = COMMAND_BUDGET) -> None:
+        self.budget = budget
+        self.active: "OrderedDict[int, Job]" = OrderedDict()
+        self.next_id = 1
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def __bool__(self) -> bool:
+        return bool(self.active)
+
+    def start(
+        self,
+        command: str,
+        gen: CommandGenerator,
+        output: OutputSink,
+        owner: Any = None,
+        on_done: Optional[Callable[[Job], None]] = None,
+    ) -> Job:
+        job = Job(self.next_id, command, gen, output, owner, on_done)
+        self.next_id += 1
+        self.active[job.id] = job
+        return job
+
+    def get(self, jid: int) -> Optional[Job]:
+        return self.active.get(jid)
+
+    def finish(self, job: Job) -> None:
+        if self.active.pop(job.id, None) is None:
+            return
+        if job.on_done is not None:
+            job.on_done(job)
+
+    def cancel(self, jid: int) -> bool:
+        """
+        Stop a job, raising GeneratorExit inside it so its cleanup runs.
+        A job cancelling itself is stopped by step() once it yields.
+        """
+        job = self.active.get(jid)
+        if job is None:
+            return False
+        if job.gen.gi_running:
+            job.cancelled = True
+            return True
+
+        try:
+            job.gen.close()
+        except Exception as e:
+            Logger.error(f"Job {jid} '{job.command}' cleanup error: {e}", "jobs")
+        self.finish(job)
+        return True
+
+    def cancel_owned(self, owner: Any) -> None:
+        # on_done callbacks may start new jobs for the same owner
+        while True:
+            owned = [
+                j for j in self.active.values() if j.owner is owner and not j.cancelled
+            ]
+            if not owned:
+                return
+            for job in owned:
+                self.cancel(job.id)
+
+    def step(self) -> int:
+        """
+        Resume jobs until the budget runs out or none has output ready.
+        Returns the number of lines produced.
+        """
+        if not self.active:
+            return 0
+
+        deadline = time.perf_counter() + self.budget
+        ready = list(self.active.values())
+        produced = 0
+
+        while ready:
+            for job in list(ready):
+                try:
+                    line = next(job.gen)
+                except StopIteration:
+                    ready.remove(job)
+                    self.finish(job)
+                    continue
+                except Exception as e:
+                    ready.remove(job)
+                    job.output(f"Error in '{job.command}': {e}")
+                    self.finish(job)
+                    continue
+
+                if job.cancelled:
+                    ready.remove(job)
+                    self.cancel(job.id)
+                    continue
+
+                # Move to the back so the next frame starts with someone else
+                self.active.move_to_end(job.id)
+                if line is None:
+                    ready.remove(job)
+                else:
+                    job.lines += 1
+                    produced += 1
+                    job.output(line)
+
+                if time.perf_counter() >= deadline:
+                    return produced
+
+        return produced
@@ -1,9 +1,116 @@
-from typing import TYPE_CHECKING, Any, Dict, Callable, Generator, Tuple, TypeAlias
+import re
+import time
+import shlex
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    Callable,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeAlias,
+)
+
+from logger import Logger, LEVELS, SUPPRESS_REASONS, Rate
+from log_store import StoredRecord
+from constants import OFFLOAD_TIMEOUT
 
 if TYPE_CHECKING:
     from kernel import Kernel
 
-CommandType: TypeAlias = Callable[["Kernel", list[Any]], Generator[str, None, None]]
+# Commands yield output lines, or None to pause until the next frame
+CommandType: TypeAlias = Callable[
+    ["Kernel", list[Any]], Generator[Optional[str], None, None]
+]
+# Pipeline filters also get the previous stage's output, pauses included
+FilterType: TypeAlias = Callable[
+    ["Kernel", list[Any], Iterator[Optional[str]]],
+    Generator[Optional[str], None, None],
+]
+
+
+class CommandError(Exception):
+    """
+    A pipeline stage failed; the message names the stage.
+    """
+
+
+def split_command_line(raw: str) -> List[List[List[str]]]:
+    """
+    Split a command line into ';'-separated commands, each a list of
+    '|'-separated stages, each an argument list. Separators inside quotes
+    or escaped with a backslash are kept. Raises ValueError on unbalanced
+    quotes or an empty stage.
+    """
+    commands: List[List[List[str]]] = []
+    stages: List[str] = []
+    start, quote, escaped = 0, "", False
+
+    def end_stage(end: int) -> None:
+        stages.append(raw[start:end])
+
+    def end_command() -> None:
+        argvs = [shlex.split(stage) for stage in stages]
+        stages.clear()
+        if len(argvs) == 1 and not argvs[0]:
+            return
+        if not all(argvs):
+            raise ValueError("empty pipeline stage")
+        commands.append(argvs)
+
+    for i, char in enumerate(raw):
+        if escaped:
+            escaped = False
+        elif char == "\\" and quote != "'":
+            escaped = True
+        elif quote:
+            if char == quote:
+                quote = ""
+        elif char in "'\"":
+            quote = char
+        elif char in ";|":
+            end_stage(i)
+            start = i + 1
+            if char == ";":
+                end_command()
+
+    end_stage(len(raw))
+    end_command()
+    return commands
+
+
+def offload(
+    timeout: Optional[float] = OFFLOAD_TIMEOUT,
+) -> Callable[[CommandType], CommandType]:
+    """
+    Mark a CPU-bound command to run in the kernel's worker processes, where
+    it gets kernel=None and its lines are streamed back. It must be
+    picklable: a module-level function or a classmethod, not a staticmethod.
+    Without a worker pool it runs in-process like any other command.
+    """
+
+    def mark(command: CommandType) -> CommandType:
+        command.offload = True  # type: ignore[attr-defined]
+        command.offload_timeout = timeout  # type: ignore[attr-defined]
+        return command
+
+    return mark
+
+
+def reads_input(command: FilterType) -> FilterType:
+    """
+    Mark a command as a pipeline filter, called with the previous stage's
+    output as a third argument. It should pass None through, so a slow
+    producer still pauses the job between frames. Apply it above
+    @staticmethod.
+    """
+    command.reads_input = True  # type: ignore[attr-defined]
+    return command
 
 
 @staticmethod
@@ -16,6 +123,383 @@ def cmd_echo(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
     yield " ".join(args)
 
 
+@staticmethod
+def cmd_fonts(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    fonts = kernel.fonts
+    for stat in fonts.stats():
+        yield (
+            f"{stat['font']:<20} style={stat['style']} refs={stat['refs']}"
+            f" hits={stat['hits']} mem={stat['memory'] // 1024}KiB"
+            + (" pinned" if stat["pinned"] else "")
+        )
+    yield (
+        f"hit rate {fonts.hit_rate:.0%} ({fonts.hits} hits, {fonts.misses} loads,"
+        f" {fonts.evictions} evictions)"
+    )
+
+
+@staticmethod
+def cmd_surfaces(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    surfaces = kernel.surfaces
+    for window in kernel.windows:
+        w, h = window.surface.get_size()
+        yield (
+            f"[{window.id}] {window.title:<16} {w}x{h}"
+            f" mem={window.memory // 1024}KiB"
+        )
+    stats = surfaces.stats()
+    yield (
+        f"{stats['in_use'] // 1024} KiB in use, {stats['pooled']} pooled"
+        f" ({stats['pooled_bytes'] // 1024} KiB), hit rate {surfaces.hit_rate:.0%}"
+        f" ({stats['hits']} reused, {stats['misses']} allocated,"
+        f" {stats['evictions']} evictions)"
+    )
+
+
+@staticmethod
+def cmd_frames(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    scheduler = kernel.scheduler
+    if scheduler is None:
+        yield "Frame scheduler not running"
+        return
+
+    for name, values in scheduler.stats().items():
+        yield f"{name:<8} " + "  ".join(f"p{p}={v:.2f}ms" for p, v in values.items())
+    yield f"{scheduler.frames} active frames, {scheduler.idle_frames} idle waits"
+
+
+@staticmethod
+def cmd_apps(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    for namespace, registry in kernel.app_registry.items():
+        manifest = registry["manifest"]
+        state = "loaded" if registry["app"] is not None else "not loaded"
+        yield (
+            f"{namespace:<12} {manifest['title']:<16} {state:<10}"
+            f" running={len(registry['running'])}"
+            + (
+                f" commands: {', '.join(manifest['commands'])}"
+                if manifest["commands"]
+                else ""
+            )
+        )
+
+
+@staticmethod
+def cmd_top(kernel: "Kernel", args: list[Any]) -> Generator[Optional[str], None, None]:
+    """
+    top [count] prints a report every second until cancelled or count
+    reports were shown. Profiling stays on while any top runs or the
+    overlay is shown.
+    """
+    count = int(args[0]) if args else None
+    if kernel.profiler is None:
+        yield "Profiling enabled while top runs"
+    kernel.profile_users += 1
+    kernel.update_profiling()
+    try:
+        next_report = time.perf_counter() + 1.0
+        while count is None or count > 0:
+            if time.perf_counter() < next_report:
+                yield None
+                continue
+
+            next_report += 1.0
+            if count is not None:
+                count -= 1
+            profiler = kernel.profiler
+            if profiler is None:
+                return
+            yield from profiler.report()
+    finally:
+        kernel.profile_users -= 1
+        kernel.update_profiling()
+
+
+@staticmethod
+def cmd_jobs(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    for job in list(kernel.jobs.active.values()):
+        owner = job.owner.namespace if job.owner is not None else "-"
+        yield (
+            f"[{job.id}] {job.runtime:7.1f}s {job.lines:>6} lines"
+            f"  {owner:<10} {job.command}"
+        )
+
+
+@staticmethod
+def cmd_kill(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    for arg in args:
+        jid = int(arg.lstrip("%"))
+        if kernel.jobs.cancel(jid):
+            yield f"[{jid}] cancelled"
+        else:
+            yield f"kill: no such job {arg}"
+
+
+@staticmethod
+def cmd_logs(kernel: "Kernel", args: list[Any]) -> Generator[Optional[str], None, None]:
+    """
+    logs [-n COUNT] [-c CHANNEL] [-l MIN_LEVEL] [-s | -a] [TEXT...]
+    Last COUNT stored records matching the filters, or the first COUNT with
+    -s (search from the oldest). -a streams every match from the oldest,
+    for pipelines such as 'logs -a | grep timeout | head'. 'logs stats'
+    describes the store.
+    """
+    store = Logger.store
+    if store is None:
+        yield "Log store not enabled"
+        return
+
+    if args[:1] == ["stats"]:
+        stats = store.stats()
+        yield (
+            f"{stats['segments']} segments, {stats['bytes'] // 1024} KiB,"
+            f" {stats['written']} written this run, {stats['pending']} pending,"
+            f" {stats['lost']} lost"
+        )
+        return
+
+    count: Optional[int] = 20
+    channel, levels, oldest_first = None, None, False
+    words = []
+    rest = iter(args)
+    try:
+        for arg in rest:
+            if arg == "-n":
+                count = int(next(rest))
+            elif arg == "-c":
+                channel = next(rest)
+            elif arg == "-l":
+                floor = LEVELS[next(rest).upper()]
+                levels = [name for name, value in LEVELS.items() if value >= floor]
+            elif arg == "-s":
+                oldest_first = True
+            elif arg == "-a":
+                count, oldest_first = None, True
+            else:
+                words.append(arg)
+    except (StopIteration, ValueError, KeyError):
+        # A flag missing its value, or a bad count or level
+        yield "usage: logs [-n COUNT] [-c CHANNEL] [-l MIN_LEVEL] [-s | -a] [TEXT...]"
+        return
+    text = " ".join(words) or None
+
+    store.flush()
+    query = store.query(channel, levels, text, reverse=not oldest_first)
+    if oldest_first:
+        # Already in display order, so stream without holding any records
+        matches: Iterator[StoredRecord] = query
+    else:
+        newest = []
+        for i, record in enumerate(query):
+            newest.append(record)
+            if count is not None and len(newest) >= count:
+                break
+            if i % 1000 == 999:
+                # Long searches span frames instead of stalling one
+                yield None
+        matches = reversed(newest)
+
+    shown = 0
+    for ts, level, channel, message in matches:
+        stamp = time.strftime("%m-%d %H:%M:%S", time.localtime(ts))
+        yield f"{stamp} [{level}] {channel}: {message}"
+        shown += 1
+        if shown == count:
+            break
+        if shown % 1000 == 0:
+            yield None
+    if not shown:
+        yield "No matching records"
+
+
+def _describe_rate(rate: Rate) -> str:
+    return "unlimited" if rate is None else f"{rate[0]:g}/s burst {rate[1]:g}"
+
+
+@staticmethod
+def cmd_logctl(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
+    """
+    logctl: limits and suppressed record counts per channel.
+    logctl rate CHANNEL|* RATE|off [BURST]: per-channel token bucket.
+    logctl sample N: keep 1 in N DEBUG records. logctl dedup on|off:
+    collapse repeated records. logctl reset: clear the counters.
+    """
+    usage = (
+        "usage: logctl [rate CHANNEL|* RATE|off [BURST] | sample N"
+        " | dedup on|off | reset]"
+    )
+    action = args[0] if args else "show"
+    if action == "rate" and len(args) in (3, 4):
+        rate = None if args[2] == "off" else float(args[2])
+        burst = float(args[3]) if len(args) == 4 else None
+        Logger.set_rate(args[1], rate, burst)
+        yield f"{args[1]}: {_describe_rate(Logger.rates[args[1]])}"
+    elif action == "sample" and len(args) == 2:
+        Logger.debug_sample = max(1, int(args[1]))
+        yield f"Keeping 1 in {Logger.debug_sample} DEBUG records"
+    elif action == "dedup" and len(args) == 2 and args[1] in ("on", "off"):
+        Logger.dedup = args[1] == "on"
+        yield f"Duplicate collapsing {args[1]}"
+    elif action == "reset" and len(args) == 1:
+        Logger.reset_limits()
+        yield "Suppression counters cleared"
+    elif action == "show" and len(args) <= 1:
+        for channel, rate in Logger.rates.items():
+            yield f"{'default' if channel == '*' else channel}: {_describe_rate(rate)}"
+        yield (
+            f"DEBUG sampling 1 in {Logger.debug_sample},"
+            f" dedup {'on' if Logger.dedup else 'off'},"
+            f" {Logger.dropped} dropped from a full buffer"
+        )
+        counts = Logger.suppressed
+        channels = sorted(set().union(*counts.values()))
+        if not channels:
+            yield "Nothing suppressed"
+            return
+        yield f"{'channel':<12}" + "".join(f"{r:>10}" for r in SUPPRESS_REASONS)
+        for channel in channels:
+            yield f"{channel:<12}" + "".join(
+                f"{counts[r].get(channel, 0):>10}" for r in SUPPRESS_REASONS
+            )
+    else:
+        yield usage
+
+
+@offload()
+def cmd_primes(
+    kernel: Optional["Kernel"], args: list[Any]
+) -> Generator[Optional[str], None, None]:
+    limit = int(args[0]) if args else 1_000_000
+    step = max(1, limit // 20)
+    primes: list[int] = []
+    for n in range(2, limit + 1):
+        for p in primes:
+            if p * p > n:
+                primes.append(n)
+                break
+            if n % p == 0:
+                break
+        else:
+            primes.append(n)
+
+        if n % step == 0:
+            yield f"{n:>10}: {len(primes)} primes"
+        elif n % 10_000 == 0:
+            # Lets the scheduler or worker check the budget and cancellation
+            yield None
+    yield f"{len(primes)} primes up to {limit}, largest {primes[-1] if primes else '-'}"
+
+
+@reads_input
+@staticmethod
+def cmd_grep(
+    kernel: "Kernel", args: list[Any], lines: Iterator[Optional[str]]
+) -> Generator[Optional[str], None, None]:
+    """
+    grep [-i] [-v] PATTERN: lines matching the regular expression, or not
+    matching it with -v.
+    """
+    flags, invert = 0, False
+    words = []
+    for arg in args:
+        if arg == "-i":
+            flags |= re.IGNORECASE
+        elif arg == "-v":
+            invert = True
+        else:
+            words.append(arg)
+    if len(words) != 1:
+        yield "usage: grep [-i] [-v] PATTERN"
+        return
+
+    search = re.compile(words[0], flags).search
+    for line in lines:
+        if line is None or (search(line) is None) == invert:
+            yield line
+
+
+def _line_count(args: list[Any], usage: str) -> int:
+    if args[:1] == ["-n"]:
+        args = args[1:]
+    if len(args) > 1:
+        raise ValueError(usage)
+    return int(args[0]) if args else 10
+
+
+@reads_input
+@staticmethod
+def cmd_head(
+    kernel: "Kernel", args: list[Any], lines: Iterator[Optional[str]]
+) -> Generator[Optional[str], None, None]:
+    """
+    head [-n] [N]: the first N lines (10 by default). Stops the stages
+    before it once they have been read.
+    """
+    remaining = _line_count(args, "usage: head [-n] [N]")
+    if remaining <= 0:
+        return
+    for line in lines:
+        yield line
+        if line is not None:
+            remaining -= 1
+            if remaining == 0:
+                return
+
+
+@reads_input
+@staticmethod
+def cmd_tail(
+    kernel: "Kernel", args: list[Any], lines: Iterator[Optional[str]]
+) -> Generator[Optional[str], None, None]:
+    """
+    tail [-n] [N]: the last N lines (10 by default).
+    """
+    last: Deque[str] = deque(maxlen=_line_count(args, "usage: tail [-n] [N]"))
+    for line in lines:
+        if line is None:
+            yield None
+        else:
+            last.append(line)
+    yield from last
+
+
+@reads_input
+@staticmethod
+def cmd_wc(
+    kernel: "Kernel", args: list[Any], lines: Iterator[Optional[str]]
+) -> Generator[Optional[str], None, None]:
+    """
+    wc: line, word and character counts.
+    """
+    line_count = words = chars = 0
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        line_count += 1
+        words += len(line.split())
+        chars += len(line)
+    yield f"{line_count} lines, {words} words, {chars} chars"
+
+
+@reads_input
+@staticmethod
+def cmd_lines(
+    kernel: "Kernel", args: list[Any], lines: Iterator[Optional[str]]
+) -> Generator[Optional[str], None, None]:
+    """
+    lines [TEXT...]: number of lines, or of lines containing TEXT.
+    """
+    text = " ".join(args)
+    total = 0
+    for line in lines:
+        if line is None:
+            yield None
+        elif text in line:
+            total += 1
+    yield str(total)
+
+
 @staticmethod
 def cmd_exit(kernel: "Kernel", args: list[Any]) -> Generator[str, None, None]:
     kernel.close_window(kernel.windows[-1].id)
@@ -29,6 +513,21 @@ class InternalCmds:
             "help": cmd_help,
             "echo": cmd_echo,
             "exit": cmd_exit,
+            "fonts": cmd_fonts,
+            "surfaces": cmd_surfaces,
+            "frames": cmd_frames,
+            "apps": cmd_apps,
+            "top": cmd_top,
+            "jobs": cmd_jobs,
+            "kill": cmd_kill,
+            "primes": cmd_primes,
+            "logs": cmd_logs,
+            "logctl": cmd_logctl,
+            "grep": cmd_grep,
+            "head": cmd_head,
+            "tail": cmd_tail,
+            "wc": cmd_wc,
+            "lines": cmd_lines,
         }
         for name, cmd in cmds.items():
             yield name, cmd
@@ -1,15 +1,116 @@
-from enum import IntFlag, auto
+from enum import Enum, IntFlag, auto
+from typing import Optional
 
 # Main
 SCREEN_SIZE = (1280, 720)
 FPS = 60
+IDLE_MAX_WAIT = 1.0
+FRAME_HISTORY = 600
+PROFILE_HISTORY = 120
+OVERLAY_REFRESH = 0.5
+# Hz that the bundled apps get update() and messages at while inactive
+BACKGROUND_UPDATE_RATE = 5.0
+# Lines of terminal history kept
+SCROLLBACK_LINES = 100_000
+# Seconds per frame spent resuming running commands
+COMMAND_BUDGET = 0.004
+# Worker processes for commands marked with commands.offload()
+OFFLOAD_WORKERS = 2
+OFFLOAD_TIMEOUT = 30.0
+# Threads drawing apps with threaded_draw; 0 draws everything on the main
+# thread
+RENDER_THREADS = 0
+# "surface" blits onto the display surface, "renderer" composites textures
+# with an SDL2 Renderer using RENDER_DRIVER (None = SDL's choice, "software"
+# works without a GPU)
+RENDER_BACKEND = "surface"
+RENDER_DRIVER: Optional[str] = None
 SCREEN_CAPTION = "PKZOS"
+# Unix socket that main.py --ipc serves commands and messages on
+IPC_SOCKET = "/tmp/pkzos.sock"
+# Largest batch frame accepted, in bytes
+IPC_MAX_FRAME = 16 * 1024 * 1024
+# Batches waiting for the main thread before connections stop being read
+IPC_BACKLOG = 256
+# Per frame, batches are applied for up to IPC_BUDGET seconds and until
+# IPC_FRAME_MESSAGES messages were queued, the rest wait for the next frame
+# (apps pay for every message delivered, so the cap is what keeps frames short)
+IPC_BUDGET = 0.004
+IPC_FRAME_MESSAGES = 1000
+# Clients not reading their replies are dropped past this many unsent bytes
+IPC_OUTPUT_LIMIT = 8 * 1024 * 1024
+
+# Logging
+LOG_LEVEL = "INFO"
+LOG_BUFFER_SIZE = 1024
+# Per-channel token bucket: LOG_RATE records/s sustained with bursts of up
+# to LOG_BURST (None = unlimited); the logctl command changes them at runtime
+LOG_RATE: Optional[float] = 100.0
+LOG_BURST = 200
+# Keep 1 in LOG_DEBUG_SAMPLE DEBUG records of each channel
+LOG_DEBUG_SAMPLE = 1
+# A run of identical records is summarised at least this often (seconds)
+LOG_REPEAT_INTERVAL = 1.0
+# Persistent log store: segment files rotate at LOG_SEGMENT_SIZE bytes and
+# the oldest are deleted past LOG_MAX_SEGMENTS
+LOG_DIR = "logs"
+LOG_SEGMENT_SIZE = 8 * 1024 * 1024
+LOG_MAX_SEGMENTS = 64
+LOG_FLUSH_INTERVAL = 0.25
+# Records waiting for the writer thread before the oldest are dropped
+LOG_STORE_BACKLOG = 262144
+
+# Messages
+MESSAGE_QUEUE_SIZE = 4096
 
 # Window
 TITLEBAR_HEIGHT = 28
 BORDER = 2
+BORDER_COLOR = (20, 20, 20)
 FONT_SIZE = 18
+GRID_CELL_SIZE = 64
+# Occlusion culling subtracts at most this many windows above each window,
+# and keeps its exposed area as at most this many rects (else their
+# bounding box)
+EXPOSED_RECTS_MAX = 4
+# Window surfaces are allocated in SURFACE_BUCKET pixel steps, and up to
+# SURFACE_POOL_BYTES of released ones are kept for reuse
+SURFACE_BUCKET = 64
+SURFACE_POOL_BYTES = 32 * 1024 * 1024
+
+# Text
+TITLE_FONT = "fonts/TikTokSans.ttf"
+MONO_FONT = "fonts/DMMono.ttf"
+CACHE_DIR = ".cache"
+PRELOAD_FONTS = [
+    (TITLE_FONT, FONT_SIZE),
+    (MONO_FONT, 16),
+    (MONO_FONT, 18),
+    (None, 20),
+]
 
 
 class FLAGS(IntFlag):
     EMBEDDED = auto()
+
+
+class HIT(Enum):
+    NONE = auto()
+    CONTENT = auto()
+    TITLEBAR = auto()
+    CLOSE = auto()
+    MAXIMIZE = auto()
+    MINIMIZE = auto()
+
+
+class BACKPRESSURE(Enum):
+    DROP_OLDEST = auto()
+    COALESCE = auto()
+    REJECT = auto()
+
+
+class TEXT_STYLE(IntFlag):
+    BOLD = auto()
+    UNDERLINE = auto()
+    STRIKETHROUGH = auto()
+    ITALIC = auto()
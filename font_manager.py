@@ -0,0 +1,168 @@
+import os
+import pygame
+import threading
+from logger import Logger
+from text_engine import TextEngine
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from constants import TEXT_STYLE
+
+FontKey = Tuple[Optional[str], int, TEXT_STYLE]
+
+
+class FontEntry:
+    __slots__ = (
+        "key",
+        "font",
+        "lock",
+        "text",
+        "refs",
+        "pinned",
+        "hits",
+        "file_bytes",
+    )
+
+    def __init__(self, key: FontKey, font: pygame.font.Font) -> None:
+        self.key = key
+        self.font = font
+        # Font.render releases the GIL, and FreeType faces are not safe to
+        # render from two threads at once
+        self.lock = threading.Lock()
+        self.text: Optional[TextEngine] = None
+        self.refs = 0
+        self.pinned = False
+        self.hits = 0
+
+        path = key[0]
+        self.file_bytes = os.path.getsize(path) if path else 0
+
+    @property
+    def memory(self) -> int:
+        """
+        Rough footprint: font file held by FreeType plus any glyph atlas.
+        """
+        size = self.file_bytes
+        if self.text is not None:
+            atlas = self.text.atlas
+            size += atlas.get_width() * atlas.get_height() * atlas.get_bytesize()
+        return size
+
+
+class FontManager:
+    """
+    Kernel-owned registry of shared pygame fonts and text engines, keyed by
+    (path, size, style) and reference counted. Pinned (preloaded) fonts are
+    kept even when unreferenced.
+    """
+
+    def __init__(self) -> None:
+        self.entries: Dict[FontKey, FontEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _acquire(self, path: Optional[str], size: int, style: TEXT_STYLE) -> FontEntry:
+        key = (path, size, TEXT_STYLE(style))
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            font = pygame.font.Font(path, size)
+            font.set_bold(bool(TEXT_STYLE.BOLD & style))
+            font.set_italic(bool(TEXT_STYLE.ITALIC & style))
+            font.set_underline(bool(TEXT_STYLE.UNDERLINE & style))
+            font.set_strikethrough(bool(TEXT_STYLE.STRIKETHROUGH & style))
+            entry = FontEntry(key, font)
+            self.entries[key] = entry
+            Logger.debug(
+                "Loaded font %s@%d (%r)", "fonts", path or "default", size, style
+            )
+        else:
+            entry.hits += 1
+            self.hits += 1
+
+        entry.refs += 1
+        return entry
+
+    def acquire(
+        self,
+        path: Optional[str],
+        size: int,
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> pygame.font.Font:
+        return self._acquire(path, size, style).font
+
+    def acquire_text(self, path: str, size: int) -> TextEngine:
+        entry = self._acquire(path, size, TEXT_STYLE(0))
+        if entry.text is None:
+            entry.text = TextEngine(path, size, font=entry.font, lock=entry.lock)
+        return entry.text
+
+    def lock(
+        self,
+        path: Optional[str],
+        size: int,
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> threading.Lock:
+        """
+        Lock to hold around render() calls on a shared font from apps that
+        draw on render threads.
+        """
+        return self.entries[(path, size, TEXT_STYLE(style))].lock
+
+    def release(
+        self,
+        path: Optional[str],
+        size: int,
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> None:
+        key = (path, size, TEXT_STYLE(style))
+        entry = self.entries.get(key)
+        if entry is None or entry.refs == 0:
+            Logger.warn(f"Released unknown font {path or 'default'}@{size}", "fonts")
+            return
+
+        entry.refs -= 1
+        if entry.refs == 0 and not entry.pinned:
+            if entry.text is not None:
+                entry.text.save_cache()
+            del self.entries[key]
+            self.evictions += 1
+
+    def preload(self, specs: Iterable[Tuple[Optional[str], int]]) -> None:
+        for path, size in specs:
+            try:
+                entry = self._acquire(path, size, TEXT_STYLE(0))
+            except (OSError, pygame.error) as e:
+                Logger.error(f"Failed to preload font {path}@{size}: {e}", "fonts")
+                continue
+
+            entry.refs -= 1
+            entry.hits = 0
+            entry.pinned = True
+
+    def save_caches(self) -> None:
+        for entry in self.entries.values():
+            if entry.text is not None:
+                entry.text.save_cache()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        result: List[Dict[str, Any]] = []
+        for entry in self.entries.values():
+            path, size, style = entry.key
+            result.append(
+                {
+                    "font": f"{os.path.basename(path) if path else 'default'}@{size}",
+                    "style": int(style),
+                    "refs": entry.refs,
+                    "pinned": entry.pinned,
+                    "hits": entry.hits,
+                    "memory": entry.memory,
+                }
+            )
+        return result
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import pygame
+import itertools
+import threading
+from collections import deque
+from logger import Logger
+from command_scheduler import Job
+from ipc_client import HEADER_SIZE, encode_frame
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set, Tuple
+
+from constants import (
+    IPC_SOCKET,
+    IPC_MAX_FRAME,
+    IPC_BACKLOG,
+    IPC_BUDGET,
+    IPC_FRAME_MESSAGES,
+    IPC_OUTPUT_LIMIT,
+)
+
+if TYPE_CHECKING:
+    from kernel import Kernel
+
+# Posted when batches arrive, so an idle main loop wakes up for them
+WAKE_EVENT = pygame.event.custom_type()
+# How often a connection checks again while the backlog is full
+BACKLOG_POLL = 0.002
+STOP_TIMEOUT = 2.0
+
+Reply = Dict[str, Any]
+
+
+class Connection:
+    __slots__ = ("id", "writer", "replies", "jobs", "closed", "overflowed")
+
+    def __init__(self, cid: int, writer: asyncio.StreamWriter) -> None:
+        self.id = cid
+        self.writer = writer
+        # Main thread only: replies sent at the end of the frame, and the
+        # jobs to cancel if the client goes away
+        self.replies: List[Reply] = []
+        self.jobs: Set[int] = set()
+        # Set by the loop thread
+        self.closed = False
+        self.overflowed = False
+
+
+class IPCServer:
+    """
+    Serves command lines and messages to local tools on a Unix socket, see
+    ipc_client for the protocol.
+
+    An asyncio loop on a background thread reads and parses batches and
+    appends them to a deque, which the main thread drains at the start of
+    the frame, so the kernel is only ever touched from the main thread and
+    the two threads share no lock. Command output and acknowledgements are
+    sent back after the frame's jobs ran, one write per connection.
+    """
+
+    def __init__(self, kernel: "Kernel", path: str = IPC_SOCKET) -> None:
+        self.kernel = kernel
+        self.path = path
+        # (connection, batch) appended by the loop thread
+        self.inbox: Deque[Tuple[Connection, Any]] = deque()
+        # Connections the loop thread saw end, for the main thread to clean up
+        self.closed: Deque[Connection] = deque()
+        self.outgoing: Set[Connection] = set()
+        # Cleared by the main thread before it drains, so a batch arriving
+        # after that posts a new WAKE_EVENT
+        self.awake = False
+        self.ids = itertools.count(1)
+        self.batches = 0
+        self.messages = 0
+        self.commands = 0
+
+        self.loop = asyncio.new_event_loop()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.live: Set[Connection] = set()
+        self.started = threading.Event()
+        self.error: Optional[OSError] = None
+        self.thread = threading.Thread(target=self._run, name="ipc", daemon=True)
+
+    def start(self) -> None:
+        self._remove_stale()
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+
+        refs = self.kernel.event_refs
+        refs[WAKE_EVENT] = refs.get(WAKE_EVENT, 0) + 1
+        self.kernel.update_event_filter()
+        Logger.info(f"Serving commands and messages on '{self.path}'", "ipc")
+
+    def stop(self) -> None:
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self._close)
+            self.thread.join(STOP_TIMEOUT)
+        self.drain_closed()
+        self.inbox.clear()
+        self.outgoing.clear()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        refs = self.kernel.event_refs
+        refs[WAKE_EVENT] = refs.get(WAKE_EVENT, 1) - 1
+        self.kernel.update_event_filter()
+        Logger.info(
+            f"IPC stopped after {self.batches} batches, {self.messages} messages"
+            f" and {self.commands} commands",
+            "ipc",
+        )
+
+    def _remove_stale(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            # Left behind by a kernel that did not shut down
+            os.unlink(self.path)
+            return
+        except OSError:
+            return
+        finally:
+            probe.close()
+        raise OSError(f"'{self.path}' is already served by another kernel")
+
+    # Loop thread
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_unix_server(self._serve, self.path)
+            )
+        except OSError as e:
+            self.error = e
+        self.started.set()
+        if self.server is None:
+            self.loop.close()
+            return
+
+        self.loop.run_forever()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+    def _close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        for conn in self.live:
+            conn.writer.close()
+        self.loop.stop()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        conn = Connection(next(self.ids), writer)
+        self.live.add(conn)
+        try:
+            while True:
+                size = int.from_bytes(await reader.readexactly(HEADER_SIZE), "big")
+                if size > IPC_MAX_FRAME:
+                    self._write(
+                        conn,
+                        encode_frame(
+                            {"id": None, "error": f"frame over {IPC_MAX_FRAME} bytes"}
+                        ),
+                    )
+                    break
+
+                payload = await reader.readexactly(size)
+                try:
+                    batch = json.loads(payload)
+                except ValueError as e:
+                    self._write(conn, encode_frame({"id": None, "error": str(e)}))
+                    continue
+
+                # Backpressure: stop reading, and so the client's writes,
+                # until the main thread catches up
+                while len(self.inbox) >= IPC_BACKLOG:
+                    await asyncio.sleep(BACKLOG_POLL)
+                self.inbox.append((conn, batch))
+                if not self.awake:
+                    self.awake = True
+                    try:
+                        pygame.event.post(pygame.event.Event(WAKE_EVENT))
+                    except pygame.error:
+                        pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.live.discard(conn)
+            conn.closed = True
+            self.closed.append(conn)
+            writer.close()
+
+    def _write(self, conn: Connection, data: bytes) -> None:
+        if conn.closed or conn.writer.is_closing():
+            return
+        conn.writer.write(data)
+        if conn.writer.transport.get_write_buffer_size() > IPC_OUTPUT_LIMIT:
+            conn.overflowed = True
+            conn.writer.close()
+
+    # Main thread
+
+    def pending(self) -> bool:
+        return bool(self.inbox) or bool(self.closed)
+
+    def drain(self) -> None:
+        """
+        Apply the batches received since the last frame, within IPC_BUDGET
+        and IPC_FRAME_MESSAGES. A batch is always applied whole.
+        """
+        self.awake = False
+        self.drain_closed()
+
+        inbox = self.inbox
+        deadline = time.perf_counter() + IPC_BUDGET
+        limit = self.messages + IPC_FRAME_MESSAGES
+        while inbox and self.messages < limit and time.perf_counter() < deadline:
+            conn, batch = inbox.popleft()
+            self.batches += 1
+            for operation in batch if isinstance(batch, list) else (batch,):
+                self._apply(conn, operation)
+
+    def drain_closed(self) -> None:
+        while self.closed:
+            conn = self.closed.popleft()
+            for jid in list(conn.jobs):
+                self.kernel.jobs.cancel(jid)
+            if conn.overflowed:
+                Logger.warn(
+                    f"Dropped IPC client {conn.id}: over {IPC_OUTPUT_LIMIT} bytes"
+                    " of replies unread",
+                    "ipc",
+                )
+
+    def flush(self) -> None:
+        """
+        Send the replies produced this frame.
+        """
+        if not self.outgoing:
+            return
+
+        for conn in self.outgoing:
+            if not conn.closed:
+                data = b"".join(encode_frame(reply) for reply in conn.replies)
+                self.loop.call_soon_threadsafe(self._write, conn, data)
+            conn.replies = []
+        self.outgoing.clear()
+
+    def _reply(self, conn: Connection, reply: Reply) -> None:
+        conn.replies.append(reply)
+        self.outgoing.add(conn)
+
+    def _apply(self, conn: Connection, operation: Any) -> None:
+        if not isinstance(operation, dict):
+            self._reply(conn, {"id": None, "error": "operation is not an object"})
+            return
+
+        rid = operation.get("id")
+        if "cmd" in operation:
+            self._command(conn, rid, operation["cmd"])
+        elif "ns" in operation:
+            self._queue(conn, rid, operation)
+        else:
+            self._reply(conn, {"id": rid, "error": "operation needs 'cmd' or 'ns'"})
+
+    def _command(self, conn: Connection, rid: Any, raw: Any) -> None:
+        if not isinstance(raw, str):
+            self._reply(conn, {"id": rid, "error": "'cmd' is not a string"})
+            return
+        if conn.closed:
+            return
+
+        def output(line: str) -> None:
+            replies = conn.replies
+            if replies and replies[-1]["id"] == rid and "out" in replies[-1]:
+                replies[-1]["out"].append(line)
+            else:
+                self._reply(conn, {"id": rid, "out": [line]})
+
+        def done(job: Job) -> None:
+            conn.jobs.discard(job.id)
+            if not conn.closed:
+                self._reply(conn, {"id": rid, "done": True, "lines": job.lines})
+
+        job = self.kernel.run_command(raw, output, on_done=done)
+        conn.jobs.add(job.id)
+        self.commands += 1
+
+    def _queue(self, conn: Connection, rid: Any, operation: Dict[str, Any]) -> None:
+        namespace = operation["ns"]
+        messages = operation["msgs"] if "msgs" in operation else [operation.get("msg")]
+        if not isinstance(namespace, str):
+            self._reply(conn, {"id": rid, "error": "'ns' is not a string"})
+            return
+        if not isinstance(messages, list) or not all(
+            isinstance(message, dict) for message in messages
+        ):
+            self._reply(conn, {"id": rid, "error": "messages must be objects"})
+            return
+
+        queued = self.kernel.queue_messages(namespace, messages)
+        self.messages += len(messages)
+        if rid is not None:
+            self._reply(
+                conn, {"id": rid, "queued": queued, "dropped": len(messages) - queued}
+            )
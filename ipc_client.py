@@ -0,0 +1,163 @@
+"""
+Client for the kernel's IPC socket, and its wire format. Standard library
+only, so external tools can use it without pygame.
+
+Every frame is a 4-byte big-endian length followed by that many bytes of
+UTF-8 JSON. Clients send batches, a JSON list of operations:
+    {"id": 1, "cmd": "logs -n 5"}           run a command line
+    {"id": 2, "ns": "logger", "msgs": [...]} queue messages (or "msg": {...})
+The kernel answers with one object per frame:
+    {"id": 1, "out": ["line", ...]}          command output, as it comes
+    {"id": 1, "done": true, "lines": 5}      command finished
+    {"id": 2, "queued": 10, "dropped": 0}    only for messages sent with an id
+    {"id": 3, "error": "..."}                a malformed operation
+
+Run from the repository root, with main.py started with --ipc:
+    python ipc_client.py "help" "frames"
+    python ipc_client.py --message logger '{"type": "log", "message": "hi"}'
+    python ipc_client.py --flood 200000 --batch 1000
+"""
+
+import json
+import time
+import socket
+import argparse
+from typing import Any, Dict, Iterator, List
+
+from constants import IPC_SOCKET
+
+HEADER_SIZE = 4
+
+
+def encode_frame(payload: Any) -> bytes:
+    data = json.dumps(payload, separators=(",", ":")).encode()
+    return len(data).to_bytes(HEADER_SIZE, "big") + data
+
+
+class IPCClient:
+    """
+    Blocking client: send() batches of operations, then read replies with
+    recv() or run() for a single command.
+    """
+
+    def __init__(self, path: str = IPC_SOCKET) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.buffer = b""
+        self.next_id = 1
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def send(self, operations: List[Dict[str, Any]]) -> None:
+        self.sock.sendall(encode_frame(operations))
+
+    def _read(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("connection closed by kernel")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def recv(self) -> Dict[str, Any]:
+        size = int.from_bytes(self._read(HEADER_SIZE), "big")
+        return json.loads(self._read(size))
+
+    def run(self, command: str) -> Iterator[str]:
+        """
+        Output lines of a command as the kernel produces them.
+        """
+        rid = self.next_id
+        self.next_id += 1
+        self.send([{"id": rid, "cmd": command}])
+        while True:
+            reply = self.recv()
+            if reply.get("id") != rid:
+                continue
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            yield from reply.get("out", ())
+            if reply.get("done"):
+                return
+
+    def queue(self, namespace: str, messages: List[Dict[str, Any]]) -> int:
+        """
+        Queue messages and wait for the count the kernel accepted.
+        """
+        rid = self.next_id
+        self.next_id += 1
+        self.send([{"id": rid, "ns": namespace, "msgs": messages}])
+        while True:
+            reply = self.recv()
+            if reply.get("id") == rid:
+                if "error" in reply:
+                    raise RuntimeError(reply["error"])
+                return reply["queued"]
+
+
+def flood(client: IPCClient, namespace: str, total: int, batch: int) -> None:
+    """
+    Push total log messages in batches without waiting between them, then
+    collect the acknowledgements, so the timing covers the kernel taking
+    every batch.
+    """
+    start = time.perf_counter()
+    ids = set()
+    sent = 0
+    while sent < total:
+        count = min(batch, total - sent)
+        messages = [
+            {"type": "log", "channel": "ipc", "message": f"flood {sent + i}"}
+            for i in range(count)
+        ]
+        ids.add(client.next_id)
+        client.send([{"id": client.next_id, "ns": namespace, "msgs": messages}])
+        client.next_id += 1
+        sent += count
+
+    queued = dropped = 0
+    while ids:
+        reply = client.recv()
+        if reply.get("id") in ids:
+            ids.discard(reply["id"])
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            queued += reply["queued"]
+            dropped += reply["dropped"]
+    elapsed = time.perf_counter() - start
+    print(
+        f"{sent} messages in {elapsed:.2f}s: {sent / elapsed:,.0f} msg/s,"
+        f" {queued} queued, {dropped} dropped"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Talk to a running kernel.")
+    parser.add_argument("commands", nargs="*", help="Command lines to run")
+    parser.add_argument("--socket", default=IPC_SOCKET)
+    parser.add_argument(
+        "--message", nargs=2, metavar=("NAMESPACE", "JSON"), action="append"
+    )
+    parser.add_argument("--flood", type=int, metavar="COUNT")
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--namespace", default="logger")
+    args = parser.parse_args()
+
+    client = IPCClient(args.socket)
+    try:
+        for namespace, payload in args.message or ():
+            queued = client.queue(namespace, [json.loads(payload)])
+            print(f"{namespace}: {'queued' if queued else 'dropped'}")
+        for command in args.commands:
+            for line in client.run(command):
+                print(line)
+        if args.flood:
+            flood(client, args.namespace, args.flood, args.batch)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,173 @@
 import os
+import time
 import pygame
 import itertools
 import importlib
+from concurrent.futures import ThreadPoolExecutor
 from logger import Logger
 from window import Window
-from constants import FLAGS
+from window_stack import WindowStack
+from spatial_index import SpatialGrid, subtract_rect
+from font_manager import FontManager
+from surface_pool import SurfacePool
+from render_backend import TextureBackend
+from message_bus import MessageBus, MessageLike
+from profiler import Profiler, PhaseTimer
+from app_manifest import (
+    AppManifest,
+    ManifestCache,
+    manifest_for,
+    package_mtime,
+    policy_of,
+)
+from constants import (
+    FLAGS,
+    PRELOAD_FONTS,
+    MONO_FONT,
+    OVERLAY_REFRESH,
+    EXPOSED_RECTS_MAX,
+)
 from app_base import BaseApp
 from typing import (
     TypedDict,
     Type,
     List,
+    Set,
     Tuple,
     Optional,
-    Any,
     Dict,
     Generator,
+    Iterable,
+    FrozenSet,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+)
+from commands import CommandType, CommandError, InternalCmds, split_command_line
+from command_scheduler import CommandScheduler, CommandGenerator, Job, OutputSink
+from offload import OffloadPool
+
+if TYPE_CHECKING:
+    from scheduler import FrameScheduler
+    from recording import Recorder, ReplayScheduler
+    from ipc import IPCServer
+
+# Events the kernel and main loop handle themselves, never blocked
+KERNEL_EVENTS: FrozenSet[int] = frozenset(
+    {
+        pygame.QUIT,
+        pygame.KEYDOWN,
+        pygame.MOUSEBUTTONDOWN,
+        pygame.MOUSEBUTTONUP,
+        pygame.VIDEOEXPOSE,
+        pygame.WINDOWEXPOSED,
+    }
 )
-from commands import CommandType, InternalCmds
 
 
 class AppRegistry(TypedDict):
-    app: Type[BaseApp]
-    running: List[int]
-    message_queue: List[Dict[str, Any]]
+    # None until the app is first launched or one of its commands is run
+    app: Optional[Type[BaseApp]]
+    manifest: AppManifest
+    running: Set[int]
 
 
 class Kernel:
-    def __init__(self, screen_size: Tuple[int, int]) -> None:
-        self.windows: list[Window] = []
+    def __init__(self, screen_size: Tuple[int, int], compositor: bool = False) -> None:
+        self.windows = WindowStack()
+        self.active_window: Optional[Window] = None
         self.id_counter = itertools.count(1)
         self.screen_width, self.screen_height = screen_size
+        self.spatial = SpatialGrid(
+            self.screen_width, self.screen_height, self.windows.z
+        )
+        # Window id -> exposed screen area, None until recomputed after
+        # windows move, restack or close
+        self.regions: Optional[Dict[int, List[pygame.Rect]]] = None
+
+        # Compositor mode: retained window surfaces + damage-rect presentation
+        self.compositor = compositor
+        self.screen_rect = pygame.Rect(0, 0, self.screen_width, self.screen_height)
+        self.damage: List[pygame.Rect] = [self.screen_rect.copy()]
+        self.redraw_pending = True
+        self.scheduler: Optional["FrameScheduler"] = None
+
+        # Per-window instrumentation, None (and free) while disabled
+        self.profiler: Optional[Profiler] = None
+        # Running 'top' commands, which keep profiling on like the overlay
+        self.profile_users = 0
+        self.overlay_visible = False
+        self.overlay: Optional[pygame.Surface] = None
+        self.overlay_rect = pygame.Rect(8, 8, 0, 0)
+        self.overlay_timer = 0.0
+        self.background: Tuple[int, int, int] = (0, 0, 0)
+
+        # Event subscriptions: type -> number of running apps that want it
+        self.event_refs: Dict[int, int] = {}
+        self.unmasked_apps = 0
+        self.raw_motion_apps = 0
+        self.dragging = False
+        self.allowed_events: Optional[FrozenSet[int]] = None
+        self.coalesced_events = 0
+
+        self.startup = PhaseTimer()
+
+        Logger.info("Preloading fonts", "kernel")
+        with self.startup.phase("kernel: preload fonts"):
+            self.fonts = FontManager()
+            self.fonts.preload(PRELOAD_FONTS)
+        self.surfaces = SurfacePool()
 
         self.app_registry: dict[str, AppRegistry] = {}
         self.command_registry: Dict[str, CommandType] = {}
+        # Command name -> namespace, for placeholders of not yet imported apps
+        self.lazy_commands: Dict[str, str] = {}
+        self.bus = MessageBus()
+        self.jobs = CommandScheduler()
+        # Worker processes for offloaded commands, started by main()
+        self.offload: Optional[OffloadPool] = None
+        # Threads drawing apps with threaded_draw, see set_render_threads()
+        self.render_pool: Optional[ThreadPoolExecutor] = None
+        # Told about each launched window while a session is recorded or
+        # replayed, set by main()
+        self.recorder: Optional["Recorder | ReplayScheduler"] = None
+        # Commands and messages from local tools, started by main() with --ipc
+        self.ipc: Optional["IPCServer"] = None
 
         Logger.info("Initializing app registry", "kernel")
-        self.load_apps()
+        with self.startup.phase("kernel: discover apps"):
+            self.load_apps()
 
         Logger.info("Initializing command registry", "kernel")
-        for name, cmd in InternalCmds.get_cmds():
-            self.register_command(name, cmd)
-
-        Logger.info("Loading custom app commands", "kernel")
-        for registry in self.app_registry.values():
-            cmd_count = registry["app"].register_commands()
-            if cmd_count == 0:
-                continue
-
-            Logger.info(
-                f"Loaded {cmd_count} commands from app {registry['app'].__name__}",
-                "kernel",
-            )
-
-            for name, callback in registry["app"].commands.items():
-                self.register_command(name, callback)
+        with self.startup.phase("kernel: register commands"):
+            for name, cmd in InternalCmds.get_cmds():
+                self.register_command(name, cmd)
+
+            Logger.info("Loading custom app commands", "kernel")
+            for namespace, registry in self.app_registry.items():
+                app = registry["app"]
+                if app is not None:
+                    self.register_app_commands(namespace, app)
+                    continue
+
+                for name in registry["manifest"]["commands"]:
+                    for alias in self.app_command_names(namespace, name):
+                        self.lazy_commands[alias] = namespace
+                        self.command_registry[alias] = self._lazy_command(
+                            namespace, alias
+                        )
 
     def load_apps(self) -> None:
+        """
+        Register every app package from its cached manifest. Only apps that
+        are new or changed since the manifest was written get imported now;
+        the rest are imported by get_app() on first use.
+        """
         apps_dir: str = "apps"
+        cache = ManifestCache()
+        found: List[str] = []
 
-        for name in os.listdir(apps_dir):
+        for name in sorted(os.listdir(apps_dir)):
             path = os.path.join(apps_dir, name)
 
             if not os.path.isdir(path) or not os.path.isfile(
@@ -66,22 +175,121 @@ class Kernel:
             ):
                 continue
 
-            try:
-                module = importlib.import_module(f"{apps_dir}.{name}")
-                if hasattr(module, "APP"):
-                    # if not issubclass(module.APP, BaseApp):
-                    #     raise TypeError("App is not a subclass of AppBase")
-
-                    self.app_registry[name] = {
-                        "app": module.APP,
-                        "running": [],
-                        "message_queue": [],
-                    }
-                    Logger.info(f"App loaded: '{name}'", "appmng")
-                else:
-                    Logger.warn(f"No APP found in '{name}'", "appmng")
-            except Exception as e:
-                Logger.error(f"Failed to load app '{name}': {e}", "appmng")
+            found.append(name)
+            mtime = package_mtime(path)
+            manifest = cache.get(name, mtime)
+            app: Optional[Type[BaseApp]] = None
+            if manifest is None:
+                app = self.import_app(name)
+                if app is None:
+                    continue
+                manifest = manifest_for(name, app)
+                cache.put(name, mtime, manifest)
+
+            self.app_registry[name] = {
+                "app": app,
+                "manifest": manifest,
+                "running": set(),
+            }
+            self.bus.add_queue(
+                name, manifest["message_queue_size"], policy_of(manifest)
+            )
+            Logger.info(f"App registered: '{name}'", "appmng")
+
+        cache.prune(found)
+        cache.save()
+
+    def import_app(self, namespace: str) -> Optional[Type[BaseApp]]:
+        try:
+            module = importlib.import_module(f"apps.{namespace}")
+        except Exception as e:
+            Logger.error(f"Failed to load app '{namespace}': {e}", "appmng")
+            return None
+
+        app = getattr(module, "APP", None)
+        if app is None:
+            Logger.warn(f"No APP found in '{namespace}'", "appmng")
+            return None
+
+        # Give each app its own table instead of mutating BaseApp.commands
+        if "commands" not in vars(app):
+            app.commands = {}
+        try:
+            app.register_commands()
+        except Exception as e:
+            Logger.error(f"App '{namespace}' register_commands error: {e}", "appmng")
+
+        Logger.info(f"App loaded: '{namespace}'", "appmng")
+        return app
+
+    def get_app(self, namespace: str) -> Optional[Type[BaseApp]]:
+        """
+        The app class for a namespace, importing it on first use.
+        """
+        registry = self.app_registry.get(namespace)
+        if registry is None:
+            return None
+        if registry["app"] is not None:
+            return registry["app"]
+
+        app = self.import_app(namespace)
+        if app is None:
+            return None
+
+        registry["app"] = app
+        self.register_app_commands(namespace, app)
+        return app
+
+    def app_command_names(self, namespace: str, name: str) -> List[str]:
+        """
+        Names an app command is registered under: always namespace.name,
+        and the bare name as well unless another command already has it.
+        """
+        names = [f"{namespace}.{name}"]
+        if name not in self.command_registry or (
+            self.lazy_commands.get(name) == namespace
+        ):
+            names.append(name)
+        else:
+            Logger.info(
+                f"Command '{name}' of app '{namespace}' is shadowed,"
+                f" run it as '{namespace}.{name}'",
+                "kernel",
+            )
+        return names
+
+    def register_app_commands(self, namespace: str, app: Type[BaseApp]) -> None:
+        if app.commands:
+            Logger.info(
+                f"Loaded {len(app.commands)} commands from app {app.__name__}",
+                "kernel",
+            )
+
+        for name, callback in app.commands.items():
+            for alias in self.app_command_names(namespace, name):
+                self.lazy_commands.pop(alias, None)
+                self.command_registry[alias] = callback
+
+    def _lazy_command(self, namespace: str, name: str) -> CommandType:
+        """
+        Placeholder for an app command that imports the app and then runs
+        the real handler, which replaces this one in the registry.
+        """
+
+        def run(kernel: "Kernel", args: List[Any]) -> Generator[str, None, None]:
+            if self.get_app(namespace) is None:
+                yield f"App '{namespace}' failed to load"
+                return
+
+            handler = self.command_registry.get(name)
+            if handler is None or handler is run:
+                self.command_registry.pop(name, None)
+                self.lazy_commands.pop(name, None)
+                yield f"Command not found: {name}"
+                return
+            yield from handler(kernel, args)
+
+        return run
 
     def launch_app(
         self,
@@ -91,14 +299,13 @@ class Kernel:
         pos: tuple[int, int] = (100, 100),
         flags: FLAGS = FLAGS(0),
     ) -> Optional[int]:
-        Logger.debug(f"Launching app '{namespace}'", "kernel")
+        Logger.debug("Launching app '%s'", "kernel", namespace)
 
-        app_registry = self.app_registry.get(namespace)
-        if app_registry is None:
+        app_class = self.get_app(namespace)
+        if app_class is None:
             Logger.error(f"App '{namespace}' not found", "kernel")
             return
 
-        app_class = app_registry.get("app")
         app = app_class(self, namespace)
 
         rect = pygame.Rect(pos[0], pos[1], size[0], size[1])
@@ -116,41 +323,85 @@ class Kernel:
             app.on_launch()
         except Exception as e:
             Logger.error(f"App '{namespace}' launch error: {e}", "kernel")
+            window.release()
             return
 
-        self.windows.append(window)
+        self.windows.push(window)
+        self.window_moved(window)
         self.bring_to_front(window.id)
-        Logger.debug(f"App '{namespace}' launched with id {window.id}", "kernel")
-        self.app_registry[namespace]["running"].append(window.id)
+        window.damage()
+        self.bus.subscribe(app, namespace)
+        self.track_events(app, 1)
+        if self.profiler is not None:
+            self.profiler.names[window.id] = namespace
+        Logger.debug("App '%s' launched with id %d", "kernel", namespace, window.id)
+        self.app_registry[namespace]["running"].add(window.id)
+        if self.recorder is not None:
+            self.recorder.launch(window)
         return window.id
 
     def find_window_by_id(self, wid: Optional[int]) -> Optional[Window]:
-        if wid is None:
-            Logger.warn("find_window_by_id called with None", "kernel")
-            return None
+        return self.windows.get(wid)
+
+    def window_moved(self, win: Window) -> None:
+        """
+        Called by windows after their rect or visibility changed.
+        """
+        self.regions = None
+        if win.visible:
+            self.spatial.update(win.id, win.rect)
+        else:
+            self.spatial.remove(win.id)
+
+    def window_at(self, pos: Tuple[int, int]) -> Optional[Window]:
+        """
+        Topmost visible window under pos, via the spatial grid.
+        """
+        for wid in reversed(self.spatial.at(pos)):
+            win = self.windows.order[wid]
+            if win.contains_point(pos):
+                return win
+        return None
 
-        for w in self.windows:
-            if w.id == wid:
-                return w
+    def set_active(self, win: Optional[Window]) -> None:
+        if self.active_window is win:
+            return
 
-        Logger.warn(f"Window with id {wid} not found", "kernel")
-        return None
+        if self.active_window is not None:
+            self.active_window.active = False
+        self.active_window = win
+        if win is not None:
+            win.active = True
 
     def bring_to_front(self, wid: int) -> None:
-        Logger.debug(f"Bringing window {wid} to front", "kernel")
+        Logger.debug("Bringing window %d to front", "kernel", wid)
         w = self.find_window_by_id(wid)
         if not w:
             Logger.error(f"Cannot bring to front: no window {wid}", "kernel")
             return
 
-        self.windows = [x for x in self.windows if x.id != wid]
-        self.windows.append(w)
+        self.windows.raise_to_top(wid)
+        self.spatial.restack(wid)
+        self.regions = None
+        w.damage()
+        self.set_active(w)
 
-        for win in self.windows:
-            win.active = win.id == wid
+    def send_to_back(self, wid: int) -> None:
+        Logger.debug("Sending window %d to back", "kernel", wid)
+        w = self.find_window_by_id(wid)
+        if not w:
+            Logger.error(f"Cannot send to back: no window {wid}", "kernel")
+            return
+
+        self.windows.lower_to_bottom(wid)
+        self.spatial.restack(wid)
+        self.regions = None
+        w.damage()
+        if self.active_window is w:
+            self.set_active(self.windows.top)
 
     def close_window(self, wid: int) -> None:
-        Logger.debug(f"Closing window {wid}", "kernel")
+        Logger.debug("Closing window %d", "kernel", wid)
         w = self.find_window_by_id(wid)
         if not w:
             Logger.error(f"Cannot close: window {wid} not found", "kernel")
@@ -162,95 +413,473 @@ class Kernel:
             Logger.error(f"App {wid} close error: {e}", "kernel")
             return
 
-        self.windows = [x for x in self.windows if x.id != wid]
-        self.app_registry[w.app.namespace]["running"].remove(w.id)
+        self.windows.remove(wid)
+        self.spatial.remove(wid)
+        self.regions = None
+        self.app_registry[w.app.namespace]["running"].discard(w.id)
+        self.bus.unsubscribe_all(w.app)
+        self.track_events(w.app, -1)
+        self.jobs.cancel_owned(w.app)
+        if self.profiler is not None:
+            self.profiler.forget(wid)
+        w.release()
+        w.damage()
+
+        if self.active_window is w:
+            self.active_window = None
+        top = self.windows.top
+        if top is not None:
+            self.set_active(top)
+            Logger.debug("Window %d is now active", "kernel", top.id)
+
+    def track_events(self, app: BaseApp, delta: int) -> None:
+        if app.event_mask is None:
+            self.unmasked_apps += delta
+        else:
+            for event_type in app.event_mask:
+                self.event_refs[event_type] = self.event_refs.get(event_type, 0) + delta
+        if app.raw_motion:
+            self.raw_motion_apps += delta
+        self.update_event_filter()
+
+    def update_event_filter(self) -> None:
+        """
+        Block, at the SDL queue, every event type no running app or the
+        kernel itself wants, so it never reaches Python.
+        """
+        allowed: Optional[FrozenSet[int]] = None
+        if not self.unmasked_apps:
+            wanted = set(KERNEL_EVENTS)
+            wanted.update(t for t, n in self.event_refs.items() if n > 0)
+            if self.dragging:
+                wanted.add(pygame.MOUSEMOTION)
+            allowed = frozenset(wanted)
+
+        if allowed == self.allowed_events:
+            return
+        self.allowed_events = allowed
+
+        if not pygame.display.get_init():
+            return
+        if allowed is None:
+            pygame.event.set_allowed(None)
+        else:
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(list(allowed))
+
+    def handle_events(self, events: Iterable[pygame.event.Event]) -> None:
+        """
+        Handle a frame's worth of events, merging each run of consecutive
+        MOUSEMOTION events into one unless the focused app wants raw motion.
+        """
+        top = self.windows.top
+        raw = top is not None and top.app.raw_motion
+        motion: Optional[pygame.event.Event] = None
+        rel_x = rel_y = 0
+
+        for event in events:
+            if event.type == pygame.MOUSEMOTION and not raw:
+                if motion is not None:
+                    self.coalesced_events += 1
+                motion = event
+                rel_x += event.rel[0]
+                rel_y += event.rel[1]
+                continue
+
+            if motion is not None:
+                self.handle_event(self._merged_motion(motion, rel_x, rel_y))
+                motion = None
+                rel_x = rel_y = 0
+            self.handle_event(event)
 
-        if self.windows:
-            self.windows[-1].active = True
-            Logger.debug(f"Window {self.windows[-1].id} is now active", "kernel")
+        if motion is not None:
+            self.handle_event(self._merged_motion(motion, rel_x, rel_y))
+
+    @staticmethod
+    def _merged_motion(
+        last: pygame.event.Event, rel_x: int, rel_y: int
+    ) -> pygame.event.Event:
+        if last.rel == (rel_x, rel_y):
+            return last
+        return pygame.event.Event(pygame.MOUSEMOTION, last.dict, rel=(rel_x, rel_y))
 
     def handle_event(self, event: pygame.event.Event) -> None:
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            self.add_damage(self.screen_rect)
+            return
+
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            for win in reversed(self.windows):
-                if win.contains_point(event.pos):
-                    if win != self.windows[-1]:
-                        Logger.debug(
-                            f"Window {win.id} clicked, bringing to front", "kernel"
-                        )
-                        self.bring_to_front(win.id)
-                    win.handle_event(event)
-                    return
+            win = self.window_at(event.pos)
+            if win is not None:
+                if win is not self.windows.top:
+                    Logger.debug(
+                        "Window %d clicked, bringing to front", "kernel", win.id
+                    )
+                    self.bring_to_front(win.id)
+                win.handle_event(event)
+                self.sync_dragging()
+                return
 
             Logger.debug("Click on empty space, clearing active windows", "kernel")
-            for win in self.windows:
-                win.active = False
+            self.set_active(None)
             return
 
-        if self.windows:
-            top = self.windows[-1]
-            top.handle_event(event)
+        top = self.windows.top
+        if top is None:
+            return
+        if (
+            event.type == pygame.MOUSEMOTION
+            and not top.dragging
+            and not top.app.wants_event(event.type)
+        ):
+            return
 
-    def update(self, dt: float) -> None:
-        broadcast_queue: Dict[str, List[Dict[str, Any]]] = {}
+        top.handle_event(event)
+        if event.type == pygame.MOUSEBUTTONUP:
+            self.sync_dragging()
+
+    def sync_dragging(self) -> None:
+        top = self.windows.top
+        dragging = top is not None and top.dragging
+        if dragging != self.dragging:
+            self.dragging = dragging
+            self.update_event_filter()
 
+    def set_profiling(self, enabled: bool) -> None:
+        if not enabled:
+            self.profiler = None
+            return
+        if self.profiler is not None:
+            return
+
+        self.profiler = Profiler()
         for win in self.windows:
-            namespace = win.app.namespace
-            registry = self.app_registry.get(namespace)
+            self.profiler.names[win.id] = win.app.namespace
+
+    def update_profiling(self) -> None:
+        """
+        Profile while the overlay is shown or a 'top' command runs.
+        """
+        self.set_profiling(self.overlay_visible or self.profile_users > 0)
+
+    def toggle_overlay(self) -> None:
+        self.overlay_visible = not self.overlay_visible
+        self.update_profiling()
+        self.overlay_timer = 0.0
+        self.add_damage(self.overlay_rect)
+        if not self.overlay_visible:
+            self.overlay = None
+
+    def tick_interval(self, win: Window) -> float:
+        """
+        Seconds between the window's updates at its app's current rate.
+        """
+        app = win.app
+        rate = app.update_rate if win is self.active_window else app.background_rate
+        return 1.0 / rate if rate else 0.0
 
-            if registry and registry["message_queue"]:
-                msg_count = len(registry["message_queue"])
+    def update(self, dt: float) -> None:
+        Logger.flush()
+        profiler = self.profiler
 
-                while registry["message_queue"]:
-                    message = registry["message_queue"].pop(0)
+        due: List[Window] = []
+        for win in self.windows:
+            win.pending_dt += dt
+            # Tick on the frame closest to the interval, not the one after
+            if win.pending_dt + dt / 2 >= self.tick_interval(win):
+                due.append(win)
+        ready = {id(win.app) for win in due}
+        ipc = self.ipc
+        if ipc is not None:
+            ipc.drain()
+        self.bus.dispatch(profiler, lambda app: id(app) in ready)
+        self.jobs.step()
+        if ipc is not None:
+            ipc.flush()
+
+        for win in due:
+            if win not in self.windows:
+                continue
+            elapsed, win.pending_dt = win.pending_dt, 0.0
+            start = time.perf_counter() if profiler is not None else 0.0
+            try:
+                win.update(elapsed)
+            except Exception as e:
+                Logger.error(f"App '{win.app.namespace}' update() error: {e}", "kernel")
+            if profiler is not None:
+                profiler.record(win.id, "update", time.perf_counter() - start)
+
+        if self.overlay_visible:
+            self.overlay_timer -= dt
+            if self.overlay_timer <= 0:
+                self.overlay_timer = OVERLAY_REFRESH
+                self.render_overlay()
+
+    def render_overlay(self) -> None:
+        if self.profiler is None:
+            return
 
-                    mode = message.get("mode")
+        lines = self.profiler.report()
+        if self.scheduler is not None:
+            stats = self.scheduler.stats()["work"]
+            lines.append(
+                "frame work: " + "  ".join(f"p{p}={v:.2f}ms" for p, v in stats.items())
+            )
 
-                    if namespace != "logger":
-                        Logger.debug(
-                            ("Broadcasting" if mode == "broadcast" else "Dispatching")
-                            + f" {msg_count} messages to {namespace}",
-                            "kernel",
-                        )
+        text = self.fonts.acquire_text(MONO_FONT, 16)
+        self.fonts.release(MONO_FONT, 16)
+        width = max(len(line) for line in lines) * text.char_width + 8
+        height = len(lines) * text.line_height + 8
+
+        self.add_damage(self.overlay_rect)
+        self.overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 200))
+        text.draw_many(
+            self.overlay,
+            ((line, (4, 4 + i * text.line_height)) for i, line in enumerate(lines)),
+            (120, 255, 120),
+        )
+        self.overlay_rect.size = (width, height)
+        self.add_damage(self.overlay_rect)
+
+    def has_pending_work(self) -> bool:
+        """
+        True when the next frame has something to do: buffered logs,
+        deliverable messages, running commands, IPC batches or windows
+        waiting to be redrawn.
+        """
+        return (
+            self.redraw_pending
+            or self.overlay_visible
+            or bool(self.jobs)
+            or bool(Logger.buffer)
+            or self.bus.deliverable()
+            or (self.ipc is not None and self.ipc.pending())
+        )
 
-                    if mode == "broadcast":
-                        broadcast_queue.setdefault(namespace, []).append(message)
-                    else:
-                        try:
-                            win.app.listen(message)
-                        except Exception as e:
-                            Logger.error(
-                                f"App '{namespace}' listen() error: {e}", "kernel"
-                            )
+    def next_deadline(self) -> Optional[float]:
+        """
+        Seconds until the soonest app wants update() again, None if none do.
+        Apps at a reduced tick rate are not woken before their next tick.
+        """
+        deadline: Optional[float] = None
+        for win in self.windows:
+            tick = win.app.next_tick() if win.visible else None
+            if tick is None and self.bus.has_deferred(win.app):
+                # Deferred messages are delivered on the window's next tick
+                tick = 0.0
+            if tick is None:
+                continue
+            tick = max(tick, self.tick_interval(win) - win.pending_dt)
+            if deadline is None or tick < deadline:
+                deadline = tick
+                if deadline <= 0:
+                    break
+        return deadline
+
+    def add_damage(self, rect: pygame.Rect) -> None:
+        self.redraw_pending = True
+        if not self.compositor:
+            return
 
-            try:
-                win.update(dt)
-            except Exception as e:
-                Logger.error(f"App '{namespace}' update() error: {e}", "kernel")
-
-        if broadcast_queue:
-            for source_ns, messages in broadcast_queue.items():
-                for msg in messages:
-                    for win in self.windows:
-                        if win.app.namespace != source_ns:
-                            continue
-
-                        try:
-                            win.app.listen(msg)
-                        except Exception as e:
-                            Logger.error(
-                                f"Broadcast to '{win.app.namespace}' failed: {e}",
-                                "kernel",
-                            )
-
-    def draw(self, surface: pygame.Surface) -> None:
+        rect = rect.clip(self.screen_rect)
+        if rect.w > 0 and rect.h > 0:
+            self.damage.append(rect)
+
+    def take_damage(self) -> List[pygame.Rect]:
+        """
+        Return the pending damage with overlapping rects merged.
+        """
+        pending, self.damage = self.damage, []
+        if len(pending) > 32:
+            return [pending[0].unionall(pending[1:])]
+
+        merged: List[pygame.Rect] = []
+        for rect in pending:
+            rect = rect.copy()
+            i = 0
+            while i < len(merged):
+                if rect.colliderect(merged[i]):
+                    rect.union_ip(merged.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            merged.append(rect)
+        return merged
+
+    def visible_regions(self) -> Dict[int, List[pygame.Rect]]:
+        """
+        Exposed screen area of each window as disjoint rects, found by
+        subtracting the rects above it from the top of the stack down.
+        Fully covered and minimized windows get an empty list.
+        """
+        if self.regions is not None:
+            return self.regions
+
+        regions: Dict[int, List[pygame.Rect]] = {}
+        covers: List[pygame.Rect] = []
+        for win in reversed(self.windows):
+            region: List[pygame.Rect] = []
+            rect = win.rect.clip(self.screen_rect)
+            if win.visible and rect:
+                overlaps = [covers[i] for i in rect.collidelistall(covers)]
+                if not any(cover.contains(rect) for cover in overlaps):
+                    region = [rect]
+                    # Only the topmost covers are subtracted; the rest can
+                    # only shrink the region further, and windows are painted
+                    # bottom to top, so a larger region just costs overdraw
+                    for cover in overlaps[:EXPOSED_RECTS_MAX]:
+                        for j in reversed(cover.collidelistall(region)):
+                            region[j : j + 1] = subtract_rect(region[j], cover)
+                        if not region:
+                            break
+                        if len(region) > EXPOSED_RECTS_MAX:
+                            region = [region[0].unionall(region[1:])]
+                            break
+                covers.append(rect)
+            regions[win.id] = region
+
+        self.regions = regions
+        for win in self.windows:
+            win.set_exposed(bool(regions[win.id]))
+        return regions
+
+    def set_render_threads(self, threads: int) -> None:
+        """
+        Draw apps with threaded_draw on this many threads, 0 to draw every
+        app on the main thread.
+        """
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
+        if threads > 0:
+            self.render_pool = ThreadPoolExecutor(threads, "render")
+            Logger.info(f"Rendering on {threads} threads", "kernel")
+
+    def render_windows(self, force: bool = False) -> None:
+        """
+        Bring the surfaces of every exposed window up to date. With render
+        threads, apps with threaded_draw draw concurrently while this thread
+        waits, then the others draw here in z-order, so those never run
+        alongside anything else.
+        """
+        regions = self.visible_regions()
+        profiler = self.profiler
+        pool = self.render_pool
+        threaded: List[Window] = []
+        serial: List[Window] = []
         for win in self.windows:
-            win.draw(surface)
+            if regions[win.id] and win.prepare(force, profiler):
+                if pool is not None and win.app.threaded_draw:
+                    threaded.append(win)
+                else:
+                    serial.append(win)
+
+        if pool is not None and len(threaded) > 1:
+            futures = [pool.submit(win.render_content, profiler) for win in threaded]
+            for future in futures:
+                future.result()
+        else:
+            serial = threaded + serial
+        for win in serial:
+            win.render_content(profiler)
+
+    def _composite(
+        self, win: Window, surface: pygame.Surface, profiler: Optional[Profiler]
+    ) -> None:
+        if profiler is None:
+            win.composite(surface)
+        else:
+            start = time.perf_counter()
+            win.composite(surface)
+            profiler.record(win.id, "blit", time.perf_counter() - start)
+
+    def draw_textures(self, backend: TextureBackend) -> List[pygame.Rect]:
+        """
+        Assemble the frame from window textures. In compositor mode windows
+        only re-render when invalidated, so unchanged ones are not uploaded
+        again, and frames without damage are skipped; without it every
+        window redraws each frame, as with a surface.
+        """
+        self.redraw_pending = False
+        profiler = self.profiler
+        regions = self.visible_regions()
+        self.render_windows(force=not self.compositor)
+        if self.compositor and not self.damage:
+            return []
+        self.damage = []
+
+        backend.clear(self.background)
+        for win in self.windows:
+            region = regions[win.id]
+            if not region:
+                continue
+            start = time.perf_counter() if profiler is not None else 0.0
+            for rect in region:
+                backend.draw_window(win, rect)
+            if profiler is not None:
+                profiler.record(win.id, "blit", time.perf_counter() - start)
+        if self.overlay_visible and self.overlay is not None:
+            backend.draw_overlay(self.overlay, self.overlay_rect)
+        backend.prune(regions)
+
+        return [self.screen_rect]
+
+    def draw(self, target: "pygame.Surface | TextureBackend") -> List[pygame.Rect]:
+        """
+        Draw all windows, each clipped to its exposed area and skipped when
+        fully covered. In compositor mode only the damaged areas are
+        repainted and returned, for pygame.display.update(). A
+        TextureBackend target is drawn by draw_textures() instead.
+        """
+        if isinstance(target, TextureBackend):
+            return self.draw_textures(target)
+
+        surface = target
+        self.redraw_pending = False
+        profiler = self.profiler
+        overlay = self.overlay if self.overlay_visible else None
+        regions = self.visible_regions()
+        clip = surface.get_clip()
+
+        if not self.compositor:
+            self.render_windows(force=True)
+            for win in self.windows:
+                for rect in regions[win.id]:
+                    surface.set_clip(rect)
+                    self._composite(win, surface, profiler)
+            surface.set_clip(clip)
+            if overlay is not None:
+                surface.blit(overlay, self.overlay_rect)
+            return [self.screen_rect]
+
+        self.render_windows()
+
+        if not self.damage:
+            return []
+
+        rects = self.take_damage()
+        for rect in rects:
+            surface.set_clip(rect)
+            surface.fill(self.background, rect)
+            for win in self.windows:
+                for exposed in regions[win.id]:
+                    exposed = exposed.clip(rect)
+                    if exposed.w and exposed.h:
+                        surface.set_clip(exposed)
+                        self._composite(win, surface, profiler)
+            if overlay is not None and self.overlay_rect.colliderect(rect):
+                surface.set_clip(rect)
+                surface.blit(overlay, self.overlay_rect)
+        surface.set_clip(clip)
 
-    def queue_message(self, namespace: str, data: dict[str, Any]) -> None:
-        if namespace not in self.app_registry:
-            return
+        return rects
 
-        self.app_registry[namespace]["message_queue"].append(data)
+    def queue_message(self, namespace: str, data: MessageLike) -> bool:
+        return self.bus.push(namespace, data)
+
+    def queue_messages(self, namespace: str, messages: Iterable[MessageLike]) -> int:
+        return self.bus.push_many(namespace, messages)
 
     def register_command(
         self,
@@ -265,24 +894,74 @@ class Kernel:
 
         self.command_registry[name] = handler
 
-    def execute_command(self, raw: str) -> Generator[str, None, None]:
-        if ";" in raw:
-            for snippet in raw.strip().split(";"):
-                yield from self.execute_command(snippet)
-            return
+    def run_command(
+        self,
+        raw: str,
+        output: OutputSink,
+        owner: Optional[BaseApp] = None,
+        on_done: Optional[Callable[[Job], None]] = None,
+    ) -> Job:
+        """
+        Start a command as a job resumed a slice at a time each frame, with
+        its output lines passed to output as they are produced. Jobs owned
+        by an app are cancelled when its window closes.
+        """
+        return self.jobs.start(
+            raw.strip(), self.execute_command(raw), output, owner, on_done
+        )
 
-        parts = raw.strip().split()
-        if not parts:
+    def execute_command(self, raw: str) -> CommandGenerator:
+        """
+        Run a command line: ';' runs commands in turn and '|' feeds each
+        stage's output lazily into the next, so nothing is buffered between
+        stages and a stage that finishes early stops the ones before it.
+        """
+        try:
+            commands = split_command_line(raw)
+        except ValueError as e:
+            yield f"Parse error: {e}"
             return
 
-        name, *args = parts
-        handler = self.command_registry.get(name)
+        for stages in commands:
+            yield from self.run_pipeline(stages)
 
-        if handler is None:
-            yield f"Command not found: {name}"
-            return
+    def run_pipeline(self, stages: List[List[str]]) -> CommandGenerator:
+        streams: List[CommandGenerator] = []
+        try:
+            for name, *args in stages:
+                handler = self.command_registry.get(name)
+                if handler is None:
+                    yield f"Command not found: {name}"
+                    return
+
+                if getattr(handler, "reads_input", False):
+                    # A filter at the start of a pipeline reads nothing
+                    upstream = streams[-1] if streams else iter(())
+                    stage = handler(self, args, upstream)  # type: ignore[call-arg]
+                elif not streams:
+                    if self.offload is not None and getattr(handler, "offload", False):
+                        stage = self.offload.stream(
+                            handler, args, getattr(handler, "offload_timeout", None)
+                        )
+                    else:
+                        stage = handler(self, args)
+                else:
+                    yield f"{name}: does not read piped input"
+                    return
+                streams.append(self._pipeline_stage(name, stage))
+
+            yield from streams[-1]
+        except CommandError as e:
+            yield str(e)
+        finally:
+            # Downstream first: each stage closes before the one it reads from
+            for stream in reversed(streams):
+                stream.close()
 
+    def _pipeline_stage(self, name: str, stage: CommandGenerator) -> CommandGenerator:
         try:
-            yield from handler(self, args)
+            yield from stage
+        except CommandError:
+            raise
         except Exception as e:
-            yield f"Error executing {name}: {e}"
+            raise CommandError(f"Error executing {name}: {e}") from e
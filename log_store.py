@@ -0,0 +1,508 @@
+import os
+import json
+import mmap
+import heapq
+import threading
+from array import array
+from collections import deque
+from constants import (
+    LOG_DIR,
+    LOG_SEGMENT_SIZE,
+    LOG_MAX_SEGMENTS,
+    LOG_FLUSH_INTERVAL,
+    LOG_STORE_BACKLOG,
+)
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (epoch seconds, level, channel, message)
+StoredRecord = Tuple[float, str, str, str]
+# (epoch seconds, level, channel, message, args) as handed over by Logger
+PendingRecord = Tuple[float, str, str, str, Tuple[Any, ...]]
+
+INDEX_VERSION = 1
+# Wake the writer early once this many records are waiting
+WRITE_BATCH = 2048
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace("\t", "\\t")
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    out = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and i + 1 < len(text):
+            i += 1
+            ch = {"n": "\n", "t": "\t"}.get(text[i], text[i])
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _key(channel: str, level: str) -> str:
+    return f"{channel}\x00{level}"
+
+
+class Segment:
+    """
+    One append-only file of tab-separated records, one per line. Sealed
+    segments have an .idx file: a JSON header line, padded to 8 bytes, and
+    the uint32 record offsets of each (channel, level) key back to back.
+    The active segment keeps that index in memory instead.
+    """
+
+    def __init__(self, directory: str, number: int) -> None:
+        self.number = number
+        self.path = os.path.join(directory, f"{number:08d}.log")
+        self.index_path = os.path.join(directory, f"{number:08d}.idx")
+        # Only used while active, guarded by LogStore.lock
+        self.offsets: Dict[str, array] = {}
+        self.size = 0
+        self.records = 0
+
+    @property
+    def sealed(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def add(self, key: str, offset: int) -> None:
+        offsets = self.offsets.get(key)
+        if offsets is None:
+            offsets = self.offsets[key] = array("I")
+        offsets.append(offset)
+        self.records += 1
+
+    def rebuild(self) -> None:
+        """
+        Recreate the in-memory index of an unsealed segment after a crash,
+        cutting off a torn last record so appends start on a line boundary.
+        """
+        self.offsets = {}
+        self.records = 0
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                parts = line.split(b"\t", 3)
+                if len(parts) == 4:
+                    channel = _unescape(parts[2].decode(errors="replace"))
+                    self.add(_key(channel, parts[1].decode(errors="replace")), offset)
+                offset += len(line)
+        if os.path.getsize(self.path) > offset:
+            os.truncate(self.path, offset)
+        self.size = offset
+
+    def seal(self) -> None:
+        keys: Dict[str, List[int]] = {}
+        start = 0
+        for key, offsets in self.offsets.items():
+            keys[key] = [start, len(offsets)]
+            start += len(offsets)
+
+        header = json.dumps(
+            {"version": INDEX_VERSION, "records": self.records, "keys": keys}
+        ).encode()
+        header += b" " * (-(len(header) + 1) % 8) + b"\n"
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for offsets in self.offsets.values():
+                offsets.tofile(f)
+        os.replace(tmp, self.index_path)
+        self.offsets = {}
+
+    def remove(self) -> None:
+        for path in (self.path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class SegmentReader:
+    """
+    Memory-mapped view of a segment, valid up to its size when opened.
+    """
+
+    def __init__(self, segment: Segment, size: int, offsets: Dict[str, array]):
+        self.segment = segment
+        self.file = open(segment.path, "rb")
+        self.map: Optional[mmap.mmap] = None
+        if size:
+            self.map = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        self.size = size
+        self.offsets = offsets
+        self.index_map: Optional[mmap.mmap] = None
+        self.index_file = None
+        self.keys: Dict[str, List[int]] = {}
+        self.views: List[memoryview] = []
+        self.records = sum(len(o) for o in offsets.values())
+
+        if not offsets and segment.sealed:
+            self.index_file = open(segment.index_path, "rb")
+            self.index_map = mmap.mmap(
+                self.index_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+            end = self.index_map.find(b"\n")
+            header = json.loads(self.index_map[:end])
+            self.keys = header["keys"]
+            self.records = header["records"]
+            self.base = end + 1
+
+    def close(self) -> None:
+        for view in self.views:
+            view.release()
+        for handle in (self.map, self.index_map, self.file, self.index_file):
+            if handle is not None:
+                handle.close()
+
+    def __enter__(self) -> "SegmentReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def key_names(self) -> Iterable[str]:
+        return self.offsets.keys() if self.offsets else self.keys.keys()
+
+    def key_offsets(self, key: str) -> "array | memoryview":
+        if self.offsets:
+            return self.offsets.get(key, array("I"))
+        span = self.keys.get(key)
+        if span is None or self.index_map is None:
+            return array("I")
+        start = self.base + span[0] * 4
+        with memoryview(self.index_map) as whole:
+            view = whole[start : start + span[1] * 4].cast("I")
+        self.views.append(view)
+        return view
+
+    def record_at(self, offset: int) -> Optional[StoredRecord]:
+        """
+        The record at offset, None if the line there does not parse.
+        """
+        assert self.map is not None
+        end = self.map.find(b"\n", offset)
+        try:
+            return self.parse(self.map[offset : end if end >= 0 else self.size])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def parse(line: bytes) -> StoredRecord:
+        ts, level, channel, message = line.decode(errors="replace").split("\t", 3)
+        return float(ts), level, _unescape(channel), _unescape(message)
+
+    def matching(self, keys: Optional[List[str]], reverse: bool) -> Iterator[int]:
+        """
+        Offsets of records with the given keys (all records if None).
+        """
+        if keys is None:
+            yield from (self.scan_reverse() if reverse else self.scan())
+            return
+
+        lists = [self.key_offsets(k) for k in keys]
+        if reverse:
+            yield from heapq.merge(*(reversed(o) for o in lists), reverse=True)
+        else:
+            yield from heapq.merge(*lists)
+
+    def scan(self) -> Iterator[int]:
+        if self.map is None:
+            return
+        offset = 0
+        while offset < self.size:
+            yield offset
+            offset = self.map.find(b"\n", offset) + 1
+            if offset == 0:
+                return
+
+    def scan_reverse(self) -> Iterator[int]:
+        if self.map is None:
+            return
+        end = self.size - 1
+        while end > 0:
+            start = self.map.rfind(b"\n", 0, end) + 1
+            yield start
+            end = start - 1
+
+    def find(self, text: bytes, reverse: bool) -> Iterator[int]:
+        """
+        Offsets of records containing text anywhere in the line.
+        """
+        if self.map is None or not text:
+            return
+        mm = self.map
+        if reverse:
+            end = self.size
+            while True:
+                hit = mm.rfind(text, 0, end)
+                if hit < 0:
+                    return
+                start = mm.rfind(b"\n", 0, hit) + 1
+                yield start
+                end = start
+        else:
+            pos = 0
+            while True:
+                hit = mm.find(text, pos)
+                if hit < 0:
+                    return
+                yield mm.rfind(b"\n", 0, hit) + 1
+                pos = mm.find(b"\n", hit) + 1
+                if pos == 0:
+                    return
+
+
+class LogStore:
+    """
+    Append-only segmented log on disk. Logger hands records over without
+    blocking; a background thread formats and writes them in batches,
+    starts a new segment once the current one reaches segment_size and
+    drops the oldest beyond max_segments. Queries read the segments through
+    mmap and the per-(channel, level) offset index, so nothing is loaded
+    into memory wholesale.
+    """
+
+    def __init__(
+        self,
+        directory: str = LOG_DIR,
+        segment_size: int = LOG_SEGMENT_SIZE,
+        max_segments: int = LOG_MAX_SEGMENTS,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        backlog: int = LOG_STORE_BACKLOG,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+
+        self.pending: Deque[PendingRecord] = deque(maxlen=backlog)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        # Notified by the writer after each batch, for flush()
+        self.progress = threading.Condition(self.lock)
+        self.closed = False
+        # appended and dropped belong to the logging thread, the rest to the
+        # writer
+        self.appended = 0
+        self.dropped = 0
+        self.written = 0
+        self.lost = 0
+        self.errors = 0
+
+        numbers = sorted(
+            int(name[:-4])
+            for name in os.listdir(directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+        self.segments: List[Segment] = [Segment(directory, n) for n in numbers]
+        if self.segments and not self.segments[-1].sealed:
+            self.segments[-1].rebuild()
+        else:
+            self.segments.append(Segment(directory, numbers[-1] + 1 if numbers else 1))
+        # Earlier segments left unsealed by a crash get their index now
+        for segment in self.segments[:-1]:
+            if not segment.sealed:
+                segment.rebuild()
+                segment.seal()
+
+        self.file = open(self.active.path, "ab")
+        self.thread = threading.Thread(target=self._run, name="log-store", daemon=True)
+        self.thread.start()
+
+    @property
+    def active(self) -> Segment:
+        return self.segments[-1]
+
+    def append(
+        self,
+        timestamp: float,
+        level: str,
+        channel: str,
+        message: str,
+        args: Tuple[Any, ...] = (),
+    ) -> None:
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append((timestamp, level, channel, message, args))
+        self.appended += 1
+        if len(self.pending) >= WRITE_BATCH:
+            self.wake.set()
+
+    def _run(self) -> None:
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self._write_pending()
+        self._write_pending()
+
+    def _write_pending(self) -> None:
+        while self.pending:
+            chunks: List[bytes] = []
+            keys: List[Tuple[str, int]] = []
+            segment = self.active
+            offset = segment.size
+
+            while self.pending and offset < self.segment_size:
+                ts, level, channel, message, args = self.pending.popleft()
+                if args:
+                    try:
+                        message = message % args
+                    except Exception as e:
+                        message = f"{message} {args!r} (format error: {e})"
+                data = f"{ts:.3f}\t{level}\t{_escape(channel)}\t{_escape(message)}\n"
+                chunk = data.encode()
+                chunks.append(chunk)
+                keys.append((_key(channel, level), offset))
+                offset += len(chunk)
+
+            try:
+                self.file.write(b"".join(chunks))
+                self.file.flush()
+            except OSError as e:
+                # Nowhere sensible to log this; count it for 'logs stats'
+                print(f"[LOGSTORE] Write failed, {len(chunks)} records lost: {e}")
+                with self.progress:
+                    self.errors += 1
+                    self.lost += len(chunks)
+                    self.progress.notify_all()
+                continue
+
+            with self.lock:
+                for key, at in keys:
+                    segment.add(key, at)
+                segment.size = offset
+                self.written += len(chunks)
+                if offset >= self.segment_size:
+                    self._rotate()
+                self.progress.notify_all()
+
+    def _rotate(self) -> None:
+        self.file.close()
+        self.active.seal()
+        self.segments.append(Segment(self.directory, self.active.number + 1))
+        self.file = open(self.active.path, "ab")
+
+        while len(self.segments) > self.max_segments:
+            self.segments.pop(0).remove()
+
+    def flush(self) -> None:
+        """
+        Block until everything appended so far is on disk.
+        """
+        target = self.appended
+        self.wake.set()
+        with self.progress:
+            while (
+                self.written + self.lost + self.dropped < target
+                and self.thread.is_alive()
+            ):
+                # The timeout only guards against the writer dying meanwhile
+                self.progress.wait(self.flush_interval)
+
+    def close(self) -> None:
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.file.close()
+
+    def readers(self, reverse: bool = False) -> Iterator[SegmentReader]:
+        """
+        Open each segment in turn, oldest first or newest first.
+        """
+        with self.lock:
+            snapshot = [
+                (seg, seg.size if seg is self.active else None, seg is self.active)
+                for seg in self.segments
+            ]
+            active_offsets = {k: array("I", v) for k, v in self.active.offsets.items()}
+
+        if reverse:
+            snapshot.reverse()
+        for seg, size, is_active in snapshot:
+            try:
+                if size is None:
+                    size = os.path.getsize(seg.path)
+                reader = SegmentReader(seg, size, active_offsets if is_active else {})
+            except (OSError, ValueError):
+                # Rotated away since the snapshot
+                continue
+            with reader:
+                yield reader
+
+    @staticmethod
+    def matching_keys(
+        reader: SegmentReader, channel: Optional[str], levels: Optional[List[str]]
+    ) -> Optional[List[str]]:
+        if channel is None and levels is None:
+            return None
+        keys = []
+        for key in reader.key_names():
+            ch, level = key.split("\x00", 1)
+            if (channel is None or ch == channel) and (
+                levels is None or level in levels
+            ):
+                keys.append(key)
+        return keys
+
+    def query(
+        self,
+        channel: Optional[str] = None,
+        levels: Optional[List[str]] = None,
+        text: Optional[str] = None,
+        reverse: bool = False,
+    ) -> Iterator[StoredRecord]:
+        """
+        Records matching every given filter, oldest first or newest first.
+        Channel and level use the index; text is searched in the mapped
+        segment directly when it is the only filter.
+        """
+        for reader in self.readers(reverse):
+            keys = self.matching_keys(reader, channel, levels)
+            if keys is None and text:
+                for offset in reader.find(_escape(text).encode(), reverse):
+                    record = reader.record_at(offset)
+                    if record is not None and (text in record[3] or text in record[2]):
+                        yield record
+                continue
+
+            for offset in reader.matching(keys, reverse):
+                record = reader.record_at(offset)
+                if record is not None and (not text or text in record[3]):
+                    yield record
+
+    def tail(
+        self,
+        count: int,
+        channel: Optional[str] = None,
+        levels: Optional[List[str]] = None,
+        text: Optional[str] = None,
+    ) -> List[StoredRecord]:
+        records = []
+        for record in self.query(channel, levels, text, reverse=True):
+            records.append(record)
+            if len(records) >= count:
+                break
+        records.reverse()
+        return records
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            sizes = [
+                seg.size if seg is self.active else os.path.getsize(seg.path)
+                for seg in self.segments
+            ]
+        return {
+            "segments": len(sizes),
+            "bytes": sum(sizes),
+            "written": self.written,
+            "pending": len(self.pending),
+            "lost": self.lost + self.dropped,
+            "errors": self.errors,
+        }
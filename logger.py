@@ -1,18 +1,191 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional, List, Dict, Any
+from collections import deque
+from typing import TYPE_CHECKING, Optional, Deque, Dict, Tuple, Any
 import time
 
+from constants import (
+    LOG_BUFFER_SIZE,
+    LOG_LEVEL,
+    LOG_RATE,
+    LOG_BURST,
+    LOG_DEBUG_SAMPLE,
+    LOG_REPEAT_INTERVAL,
+)
+
 if TYPE_CHECKING:
     from kernel import Kernel
+    from log_store import LogStore
+
+LEVELS: Dict[str, int] = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+DEBUG_LEVEL = LEVELS["DEBUG"]
+# Severity of level names outside LEVELS
+DEFAULT_LEVEL = LEVELS["INFO"]
+
+
+def severity(level: str) -> int:
+    """
+    Numeric level of a level name; unknown names, such as "TRACE", count
+    as INFO.
+    """
+    value = LEVELS.get(level)
+    if value is None:
+        value = LEVELS.get(level.upper(), DEFAULT_LEVEL)
+    return value
+
+
+# (timestamp, level, channel, message, args)
+LogRecord = Tuple[str, str, str, str, Tuple[Any, ...]]
+# (level, channel, message, args) of the last record, for duplicates
+RecordKey = Tuple[str, str, str, Tuple[Any, ...]]
+# (records per second, burst), None for no limit
+Rate = Optional[Tuple[float, float]]
+# Why records were suppressed, the keys of Logger.suppressed
+SUPPRESS_REASONS = ("rate", "sampled", "repeated")
+
+
+class TokenBucket:
+    """
+    Holds up to burst tokens, refilled at rate per second; each record
+    that passes takes one.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def take(self, now: float) -> bool:
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < 1:
+            self.tokens = tokens
+            return False
+        self.tokens = tokens - 1
+        return True
 
 
 class Logger:
     kernel: Optional["Kernel"] = None
-    buffer: List[Dict[str, Any]] = []
+    # Persistent copy of every record that passes the level filter
+    store: Optional["LogStore"] = None
+    level: int = LEVELS[LOG_LEVEL]
+    # Records wait here until the next per-frame flush; bounded so nothing
+    # grows without limit before the kernel exists.
+    buffer: Deque[LogRecord] = deque(maxlen=LOG_BUFFER_SIZE)
+    dropped: int = 0
 
-    @staticmethod
-    def format_timestamp() -> str:
-        return time.strftime("%H:%M:%S")
+    # Storm protection, applied before records reach the store or buffer.
+    # rates maps channels to their limit, "*" being the default
+    rates: Dict[str, Rate] = {"*": (LOG_RATE, LOG_BURST) if LOG_RATE else None}
+    buckets: Dict[str, Optional[TokenBucket]] = {}
+    debug_sample: int = LOG_DEBUG_SAMPLE
+    dedup: bool = True
+    # Reason -> channel -> records suppressed for it
+    suppressed: Dict[str, Dict[str, int]] = {r: {} for r in SUPPRESS_REASONS}
+    # Channel -> records rate limited since its last one got through
+    _limited: Dict[str, int] = {}
+    _debug_seen: Dict[str, int] = {}
+    _last: Optional[RecordKey] = None
+    _repeats: int = 0
+    _repeat_since: float = 0.0
+
+    _ts_second: int = -1
+    _ts_text: str = ""
+
+    @classmethod
+    def set_level(cls, level: str) -> None:
+        cls.level = LEVELS[level.upper()]
+
+    @classmethod
+    def enabled(cls, level: str) -> bool:
+        return severity(level) >= cls.level
+
+    @classmethod
+    def format_timestamp(cls) -> str:
+        now = int(time.time())
+        if now != cls._ts_second:
+            cls._ts_second = now
+            cls._ts_text = time.strftime("%H:%M:%S", time.localtime(now))
+        return cls._ts_text
+
+    @classmethod
+    def set_rate(
+        cls, channel: str, rate: Optional[float], burst: Optional[float] = None
+    ) -> None:
+        """
+        Limit channel ("*" for the default) to rate records per second with
+        bursts of burst (default 2 seconds' worth); None removes the limit.
+        """
+        if rate is None:
+            cls.rates[channel] = None
+        else:
+            cls.rates[channel] = (rate, burst if burst is not None else rate * 2)
+        if channel == "*":
+            cls.buckets.clear()
+        else:
+            cls.buckets.pop(channel, None)
+
+    @classmethod
+    def reset_limits(cls) -> None:
+        """
+        Forget bucket levels, pending repeats and the suppression counters.
+        """
+        cls.buckets.clear()
+        cls.suppressed = {r: {} for r in SUPPRESS_REASONS}
+        cls._limited.clear()
+        cls._debug_seen.clear()
+        cls._last = None
+        cls._repeats = 0
+
+    @classmethod
+    def _suppress(cls, reason: str, channel: str) -> None:
+        counts = cls.suppressed[reason]
+        counts[channel] = counts.get(channel, 0) + 1
+
+    @classmethod
+    def _admit(cls, channel: str) -> bool:
+        try:
+            bucket = cls.buckets[channel]
+        except KeyError:
+            rate = cls.rates.get(channel, cls.rates.get("*"))
+            bucket = None if rate is None else TokenBucket(*rate, time.monotonic())
+            cls.buckets[channel] = bucket
+        if bucket is None:
+            return True
+
+        if not bucket.take(time.monotonic()):
+            cls._limited[channel] = cls._limited.get(channel, 0) + 1
+            cls._suppress("rate", channel)
+            return False
+        if channel in cls._limited:
+            cls._report_limited(channel)
+        return True
+
+    @classmethod
+    def _report_limited(cls, channel: str) -> None:
+        missed = cls._limited.pop(channel)
+        cls._emit("WARN", channel, "%d messages suppressed by rate limit", (missed,))
+
+    @classmethod
+    def _flush_repeats(cls) -> None:
+        if cls._repeats and cls._last is not None:
+            level, channel = cls._last[:2]
+            repeats, cls._repeats = cls._repeats, 0
+            cls._emit(level, channel, "last message repeated %d times", (repeats,))
+
+    @classmethod
+    def _emit(
+        cls, level: str, channel: str, message: str, args: Tuple[Any, ...]
+    ) -> None:
+        if cls.store is not None:
+            cls.store.append(time.time(), level, channel, message, args)
+
+        if len(cls.buffer) == cls.buffer.maxlen:
+            cls.dropped += 1
+        cls.buffer.append((cls.format_timestamp(), level, channel, message, args))
 
     @classmethod
     def log(
@@ -20,39 +193,104 @@ class Logger:
         message: str,
         channel: str,
         level: str = "INFO",
+        *args: Any,
     ) -> None:
-        text = f"{cls.format_timestamp()} [{level}] {message}"
+        if severity(level) < cls.level:
+            return
 
-        cls.buffer.append({"type": "log", "message": text, "channel": channel})
+        key = (level, channel, message, args)
+        if cls.dedup and key == cls._last:
+            if not cls._repeats:
+                cls._repeat_since = time.monotonic()
+            cls._repeats += 1
+            cls._suppress("repeated", channel)
+            return
 
-        cls.flush(channel)
+        if level == "DEBUG" and cls.debug_sample > 1:
+            seen = cls._debug_seen.get(channel, 0)
+            cls._debug_seen[channel] = seen + 1
+            if seen % cls.debug_sample:
+                cls._suppress("sampled", channel)
+                return
 
-    @classmethod
-    def flush(cls, channel: str) -> None:
-        if cls.kernel is None:
+        if cls.dedup:
+            # Before _admit, so the repeat count follows the record it counts
+            # and not a rate limit summary
+            cls._flush_repeats()
+        if not cls._admit(channel):
             return
+        if cls.dedup:
+            # Only an emitted record can be the one later ones repeat
+            cls._last = key
+        cls._emit(level, channel, message, args)
 
-        while cls.buffer:
-            entry = cls.buffer.pop(0)
+    @staticmethod
+    def format_record(record: LogRecord) -> str:
+        timestamp, level, _, message, args = record
+        if args:
             try:
-                cls.kernel.queue_message("logger", entry)
-            except Exception as e:
-                print(f"[LOGGER] Failed to send to kernel ({channel}): {e}")
-                cls.buffer.insert(0, entry)
-                break
+                message = message % args
+            except (TypeError, ValueError) as e:
+                message = f"{message} {args!r} (format error: {e})"
+        return f"{timestamp} [{level}] {message}"
 
     @classmethod
-    def info(cls, msg: str, channel: str) -> None:
-        cls.log(msg, channel, "INFO")
+    def flush(cls) -> None:
+        """
+        Hand all buffered records to the kernel in one batch. Called once
+        per frame from the kernel loop.
+        """
+        if cls._repeats and time.monotonic() - cls._repeat_since >= LOG_REPEAT_INTERVAL:
+            cls._flush_repeats()
+        if cls._limited:
+            # Channels that went quiet while limited report once refilled
+            now = time.monotonic()
+            for channel in list(cls._limited):
+                bucket = cls.buckets.get(channel)
+                if bucket is None or bucket.take(now):
+                    cls._report_limited(channel)
+        if cls.kernel is None or not cls.buffer:
+            return
+
+        records = list(cls.buffer)
+        cls.buffer.clear()
+        try:
+            cls.kernel.queue_messages(
+                "logger",
+                (
+                    {
+                        "type": "log",
+                        "message": cls.format_record(r),
+                        "channel": r[2],
+                        "level": r[1],
+                    }
+                    for r in records
+                ),
+            )
+        except Exception as e:
+            print(f"[LOGGER] Failed to send {len(records)} records to kernel: {e}")
+            # Put them back in front of anything logged meanwhile, dropping
+            # the oldest if they no longer all fit
+            free = cls.buffer.maxlen - len(cls.buffer)  # type: ignore[operator]
+            if free < len(records):
+                cls.dropped += len(records) - free
+                records = records[len(records) - free :]
+            cls.buffer.extendleft(reversed(records))
 
     @classmethod
-    def warn(cls, msg: str, channel: str) -> None:
-        cls.log(msg, channel, "WARN")
+    def info(cls, msg: str, channel: str, *args: Any) -> None:
+        cls.log(msg, channel, "INFO", *args)
 
     @classmethod
-    def error(cls, msg: str, channel: str) -> None:
-        cls.log(msg, channel, "ERROR")
+    def warn(cls, msg: str, channel: str, *args: Any) -> None:
+        cls.log(msg, channel, "WARN", *args)
 
     @classmethod
-    def debug(cls, msg: str, channel: str) -> None:
-        cls.log(msg, channel, "DEBUG")
+    def error(cls, msg: str, channel: str, *args: Any) -> None:
+        cls.log(msg, channel, "ERROR", *args)
+
+    @classmethod
+    def debug(cls, msg: str, channel: str, *args: Any) -> None:
+        if cls.level > DEBUG_LEVEL:
+            return
+        cls.log(msg, channel, "DEBUG", *args)
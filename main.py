@@ -1,34 +1,105 @@
+import os
+import time
 import pygame
 import argparse
+from typing import Optional
 from logger import Logger
 from kernel import Kernel
+from scheduler import FrameScheduler
+from profiler import PhaseTimer
+from offload import OffloadPool
+from log_store import LogStore
+from render_backend import BACKENDS, create_backend
+from recording import Recorder, ReplayScheduler
+from ipc import IPCServer
 
-from constants import SCREEN_SIZE, SCREEN_CAPTION, FPS, FLAGS
+from constants import (
+    SCREEN_SIZE,
+    SCREEN_CAPTION,
+    FPS,
+    FLAGS,
+    OFFLOAD_WORKERS,
+    RENDER_THREADS,
+    RENDER_BACKEND,
+    RENDER_DRIVER,
+    IPC_SOCKET,
+)
 
 
-def main(app: str) -> None:
+def main(
+    app: str,
+    compositor: bool = False,
+    idle: bool = True,
+    busy_loop: bool = False,
+    profile_startup: bool = False,
+    offload_workers: int = OFFLOAD_WORKERS,
+    log_store: bool = True,
+    render_threads: int = RENDER_THREADS,
+    backend: str = RENDER_BACKEND,
+    render_driver: Optional[str] = RENDER_DRIVER,
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    replay_fast: bool = False,
+    timings: Optional[str] = None,
+    ipc: Optional[str] = None,
+) -> None:
+    startup = PhaseTimer()
+
+    replayer: Optional[ReplayScheduler] = None
+    if replay is not None:
+        # Replays are perf runs: no real display unless explicitly asked for
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        replayer = ReplayScheduler(replay, realtime=not replay_fast, timings=timings)
+        app = replayer.app
+
+    if log_store:
+        with startup.phase("log store"):
+            Logger.store = LogStore()
+        Logger.info(f"Writing logs to '{Logger.store.directory}'", "system")
+
     Logger.info("Initializing Pygame", "system")
-    pygame.init()
+    with startup.phase("pygame.init"):
+        pygame.init()
     Logger.info(f"Display mode set to {SCREEN_SIZE}", "system")
-    screen = pygame.display.set_mode(SCREEN_SIZE)
-    Logger.info(f"Window caption = '{SCREEN_CAPTION}'", "system")
-    pygame.display.set_caption(SCREEN_CAPTION)
-    clock = pygame.time.Clock()
-    Logger.info("Initializing clock", "system")
+    with startup.phase("display"):
+        Logger.info(f"Render backend = '{backend}'", "system")
+        display = create_backend(backend, SCREEN_SIZE, SCREEN_CAPTION, render_driver)
+        Logger.info(f"Window caption = '{SCREEN_CAPTION}'", "system")
+    Logger.info("Initializing frame scheduler", "system")
+    scheduler = replayer or FrameScheduler(FPS, idle=idle, busy_loop=busy_loop)
     Logger.warn("Disabling pygame.mixer (audio disabled)", "system")
     pygame.mixer.quit()
 
     Logger.info("Initializing Kernel", "kernel")
-    kernel = Kernel(SCREEN_SIZE)
+    with startup.phase("kernel"):
+        kernel = Kernel(SCREEN_SIZE, compositor=compositor)
     Logger.kernel = kernel
+    kernel.scheduler = scheduler
+    recorder = Recorder(record, app, compositor) if record is not None else None
+    kernel.recorder = replayer or recorder
     Logger.info("Kernel successfully started", "kernel")
 
+    if offload_workers > 0:
+        Logger.info("Starting offload workers", "system")
+        with startup.phase("offload pool"):
+            kernel.offload = OffloadPool(offload_workers)
+    kernel.set_render_threads(render_threads)
+
+    if ipc is not None:
+        server = IPCServer(kernel, ipc)
+        try:
+            server.start()
+            kernel.ipc = server
+        except OSError as e:
+            Logger.error(f"Failed to serve IPC on '{ipc}': {e}", "ipc")
+
     running = True
 
     Logger.info(f"Launching main app '{app}' (embedded mode)", "kernel")
-    embedded = kernel.launch_app(
-        app, size=SCREEN_SIZE, pos=(0, 0), flags=FLAGS.EMBEDDED
-    )
+    with startup.phase(f"launch '{app}'"):
+        embedded = kernel.launch_app(
+            app, size=SCREEN_SIZE, pos=(0, 0), flags=FLAGS.EMBEDDED
+        )
 
     if embedded is None:
         Logger.error(f"Failed to launch embedded app '{app}'", "kernel")
@@ -40,17 +111,17 @@ def main(app: str) -> None:
         Logger.info("Starting event loop", "system")
 
     while running:
-        dt = clock.tick(FPS) / 1000.0
-
-        if kernel.find_window_by_id(embedded) is None:
-            Logger.warn("Embedded app terminated by user", "kernel")
-            running = False
+        dt, frame_events = scheduler.next_frame(kernel)
+        if replayer is not None and replayer.finished:
+            Logger.info("End of replay", "system")
+            break
 
-        for event in pygame.event.get():
+        events = []
+        for event in frame_events:
             if event.type == pygame.QUIT:
                 Logger.warn("Quit request received", "system")
                 if len(kernel.windows) > 0 and kernel.windows[-1].active:
-                    Logger.debug(f"Closing topmost window", "kernel")
+                    Logger.debug("Closing topmost window", "kernel")
                     kernel.close_window(kernel.windows[-1].id)
                     continue
                 running = False
@@ -59,20 +130,62 @@ def main(app: str) -> None:
                 if event.key == pygame.K_F1:
                     Logger.debug("Launching 'counter' via F1", "kernel")
                     kernel.launch_app("counter", size=(400, 300), pos=(20, 20))
+                elif event.key == pygame.K_F3:
+                    Logger.debug("Toggling performance overlay via F3", "kernel")
+                    kernel.toggle_overlay()
                 elif event.key == pygame.K_F2:
                     Logger.debug("Launching 'terminal' via F2", "kernel")
                     kernel.launch_app(
                         "terminal", size=(800, 500), pos=(SCREEN_SIZE[0] - 800 - 20, 20)
                     )
 
-            kernel.handle_event(event)
+            events.append(event)
+
+        kernel.handle_events(events)
 
         kernel.update(dt)
 
-        screen.fill((0, 0, 0))
-        kernel.draw(screen)
+        display.present(kernel)
 
-        pygame.display.flip()
+        scheduler.end_frame()
+        if recorder is not None:
+            recorder.frame(scheduler.frame_start, dt, frame_events)
+
+        if profile_startup:
+            # First frame closes out startup: the time until something is shown
+            first = time.perf_counter() - scheduler.frame_start
+            startup.phases.append(("first frame", first))
+            print("Startup profile:")
+            for (name, _), line in zip(startup.phases, startup.report("  ")):
+                print(line)
+                if name == "kernel":
+                    for sub in kernel.startup.report("    "):
+                        print(sub)
+            print(f"  {'total':<28} {startup.total() * 1000:9.2f} ms")
+            profile_startup = False
+
+        if kernel.find_window_by_id(embedded) is None:
+            Logger.warn("Embedded app terminated by user", "kernel")
+            running = False
+
+    for name, values in scheduler.stats().items():
+        Logger.info(
+            "Frame %s time: p50 %.2fms, p90 %.2fms, p99 %.2fms",
+            "system",
+            name,
+            values[50],
+            values[90],
+            values[99],
+        )
+
+    for session in (recorder, replayer):
+        if session is not None:
+            session.close()
+    kernel.recorder = None
+
+    if kernel.ipc is not None:
+        kernel.ipc.stop()
+        kernel.ipc = None
 
     Logger.info("Stopping kernel", "kernel")
     Logger.info("Closing all apps", "kernel")
@@ -81,10 +194,23 @@ def main(app: str) -> None:
         Logger.info(f"Closing window {window.id}", "kernel")
         kernel.close_window(window.id)
 
+    if kernel.offload is not None:
+        Logger.info("Stopping offload workers", "system")
+        kernel.offload.shutdown()
+    kernel.set_render_threads(0)
+
+    Logger.info("Saving glyph cache", "system")
+    kernel.fonts.save_caches()
+
+    display.close()
     Logger.info("Shutting down Pygame", "system")
     pygame.quit()
     Logger.info("Shutdown complete", "system")
 
+    if Logger.store is not None:
+        Logger.store.close()
+        Logger.store = None
+
 
 if __name__ == "__main__":
     Logger.info("PKZ Kernel v0.1 Starting", "system")
@@ -94,6 +220,108 @@ if __name__ == "__main__":
         "--app", type=str, default="logger", help="The app to run on init."
     )
 
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        default=None,
+        choices=["DEBUG", "INFO", "WARN", "ERROR"],
+        help="Minimum level shown in the logger (default: constants.LOG_LEVEL).",
+    )
+    parser.add_argument(
+        "--no-idle",
+        action="store_true",
+        help="Run every frame at full rate instead of sleeping when idle.",
+    )
+    parser.add_argument(
+        "--busy-loop",
+        action="store_true",
+        help="Pace frames with Clock.tick_busy_loop for precise timing.",
+    )
+    parser.add_argument(
+        "--compositor",
+        action="store_true",
+        help="Only repaint and present damaged screen areas.",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Print the time spent in each startup phase.",
+    )
+    parser.add_argument(
+        "--offload-workers",
+        type=int,
+        default=OFFLOAD_WORKERS,
+        help="Worker processes for CPU-heavy commands, 0 to run them in-process.",
+    )
+    parser.add_argument(
+        "--render-threads",
+        type=int,
+        default=RENDER_THREADS,
+        help="Threads drawing apps that allow it, 0 to draw on the main thread.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        default=RENDER_BACKEND,
+        help="Composite with Surface.blit or with SDL2 Renderer textures.",
+    )
+    parser.add_argument(
+        "--render-driver",
+        type=str,
+        default=RENDER_DRIVER,
+        help="SDL render driver for --backend renderer, e.g. 'software'.",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Record input events and launched windows to FILE.",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Replay a recorded session (dummy video driver unless set).",
+    )
+    parser.add_argument(
+        "--replay-fast",
+        action="store_true",
+        help="Replay frames back to back instead of at the recorded pace.",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILE",
+        help="Per-frame replay timings CSV (default: the replay file + .timings.csv).",
+    )
+    parser.add_argument(
+        "--ipc",
+        nargs="?",
+        const=IPC_SOCKET,
+        metavar="PATH",
+        help=f"Accept commands and messages on a Unix socket (default: {IPC_SOCKET}).",
+    )
+    parser.add_argument(
+        "--no-log-store",
+        action="store_true",
+        help="Do not persist log records to disk.",
+    )
+
     args = parser.parse_args()
+    if args.log_level:
+        Logger.set_level(args.log_level)
 
-    main(args.app)
+    main(
+        args.app,
+        args.compositor,
+        not args.no_idle,
+        args.busy_loop,
+        args.profile_startup,
+        args.offload_workers,
+        not args.no_log_store,
+        args.render_threads,
+        args.backend,
+        args.render_driver,
+        args.record,
+        args.replay,
+        args.replay_fast,
+        args.timings,
+        args.ipc,
+    )
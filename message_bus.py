@@ -0,0 +1,377 @@
+import time
+from collections import deque
+from logger import Logger
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from constants import BACKPRESSURE, MESSAGE_QUEUE_SIZE
+
+if TYPE_CHECKING:
+    from app_base import BaseApp
+    from profiler import Profiler
+
+_MISSING = object()
+_FIELDS = frozenset(("type", "mode", "urgent"))
+
+
+class Message:
+    """
+    Compact message record. Exposes dict-style get()/[] so listen() code
+    written against plain dict messages keeps working. Urgent messages are
+    delivered at once even to apps whose update rate defers the rest.
+    """
+
+    __slots__ = ("type", "mode", "data", "urgent")
+
+    def __init__(
+        self,
+        type: Optional[str],
+        mode: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+        urgent: bool = False,
+    ) -> None:
+        self.type = type
+        self.mode = mode
+        self.data = data
+        self.urgent = urgent
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        extra = {k: v for k, v in data.items() if k not in _FIELDS}
+        return cls(
+            data.get("type"),
+            data.get("mode"),
+            extra or None,
+            bool(data.get("urgent", False)),
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "type":
+            return self.type if self.type is not None else default
+        if key == "mode":
+            return self.mode if self.mode is not None else default
+        if key == "urgent":
+            return self.urgent
+        if self.data is None:
+            return default
+        return self.data.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __repr__(self) -> str:
+        return f"Message(type={self.type!r}, mode={self.mode!r}, data={self.data!r}" + (
+            ", urgent=True)" if self.urgent else ")"
+        )
+
+
+MessageLike = Union[Message, Dict[str, Any]]
+
+
+class MessageQueue:
+    __slots__ = (
+        "namespace",
+        "items",
+        "maxlen",
+        "policy",
+        "latest",
+        "queued",
+        "dispatched",
+        "dropped",
+    )
+
+    def __init__(self, namespace: str, maxlen: int, policy: BACKPRESSURE) -> None:
+        self.namespace = namespace
+        self.items: Deque[Message] = deque()
+        self.maxlen = maxlen
+        self.policy = policy
+        # Newest pending message per type, only kept for COALESCE queues
+        self.latest: Dict[Optional[str], Message] = {}
+
+        self.queued = 0
+        self.dispatched = 0
+        self.dropped = 0
+
+    def push(self, message: Message) -> bool:
+        if len(self.items) >= self.maxlen:
+            if self.policy is BACKPRESSURE.REJECT:
+                self.dropped += 1
+                return False
+
+            if self.policy is BACKPRESSURE.COALESCE:
+                pending = self.latest.get(message.type)
+                if pending is not None:
+                    self.replace(pending, message)
+                    self.dropped += 1
+                    return True
+
+            self.pop()
+            self.dropped += 1
+
+        self.items.append(message)
+        if self.policy is BACKPRESSURE.COALESCE:
+            self.latest[message.type] = message
+        self.queued += 1
+        return True
+
+    def replace(self, pending: Message, message: Message) -> None:
+        """
+        Put message in the place of pending, keeping either one's urgency.
+        pending is replaced rather than updated, as it may be queued
+        elsewhere too.
+        """
+        if pending.urgent and not message.urgent:
+            message = Message(message.type, message.mode, message.data, True)
+        items = self.items
+        # The newest message of a type is usually near the end
+        for i in range(len(items) - 1, -1, -1):
+            if items[i] is pending:
+                items[i] = message
+                break
+        self.latest[message.type] = message
+
+    def pop(self) -> Message:
+        message = self.items.popleft()
+        if self.latest and self.latest.get(message.type) is message:
+            del self.latest[message.type]
+        return message
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class MessageBus:
+    """
+    Per-namespace bounded message queues with subscriptions indexed by
+    (namespace, message type). A type of None subscribes to every type.
+
+    Messages for an app that is not due for an update this frame wait in
+    that app's own inbox, bounded by its message_queue_size, until it is.
+    """
+
+    def __init__(self) -> None:
+        self.queues: Dict[str, MessageQueue] = {}
+        self.subscribers: Dict[Tuple[str, Optional[str]], List["BaseApp"]] = {}
+        self.subscriptions: Dict[int, List[Tuple[str, Optional[str]]]] = {}
+        self.listeners: Dict[str, int] = {}
+        # id(app) -> (app, deferred messages), oldest first
+        self.deferred: Dict[int, Tuple["BaseApp", Deque[Message]]] = {}
+        self.rejected = 0
+        self.deferred_dropped = 0
+
+    def add_queue(
+        self,
+        namespace: str,
+        maxlen: int = MESSAGE_QUEUE_SIZE,
+        policy: BACKPRESSURE = BACKPRESSURE.DROP_OLDEST,
+    ) -> None:
+        self.queues[namespace] = MessageQueue(namespace, maxlen, policy)
+
+    def configure(
+        self,
+        namespace: str,
+        maxlen: Optional[int] = None,
+        policy: Optional[BACKPRESSURE] = None,
+    ) -> None:
+        queue = self.queues[namespace]
+        if maxlen is not None:
+            queue.maxlen = maxlen
+        if policy is not None:
+            queue.policy = policy
+            queue.latest.clear()
+            if policy is BACKPRESSURE.COALESCE:
+                for message in queue.items:
+                    queue.latest[message.type] = message
+
+    def subscribe(
+        self, app: "BaseApp", namespace: str, type: Optional[str] = None
+    ) -> None:
+        key = (namespace, type)
+        subs = self.subscribers.setdefault(key, [])
+        if app in subs:
+            return
+
+        subs.append(app)
+        self.subscriptions.setdefault(id(app), []).append(key)
+        self.listeners[namespace] = self.listeners.get(namespace, 0) + 1
+
+    def unsubscribe(
+        self, app: "BaseApp", namespace: str, type: Optional[str] = None
+    ) -> None:
+        key = (namespace, type)
+        subs = self.subscribers.get(key)
+        if subs is None or app not in subs:
+            return
+
+        subs.remove(app)
+        if not subs:
+            del self.subscribers[key]
+        self.subscriptions[id(app)].remove(key)
+        self.listeners[namespace] -= 1
+
+    def unsubscribe_all(self, app: "BaseApp") -> None:
+        for namespace, type in list(self.subscriptions.get(id(app), [])):
+            self.unsubscribe(app, namespace, type)
+        self.subscriptions.pop(id(app), None)
+        self.deferred.pop(id(app), None)
+
+    def push(self, namespace: str, message: MessageLike) -> bool:
+        queue = self.queues.get(namespace)
+        if queue is None:
+            self.rejected += 1
+            return False
+
+        if not isinstance(message, Message):
+            message = Message.from_dict(message)
+        return queue.push(message)
+
+    def push_many(self, namespace: str, messages: Iterable[MessageLike]) -> int:
+        queue = self.queues.get(namespace)
+        if queue is None:
+            self.rejected += 1
+            return 0
+
+        accepted = 0
+        for message in messages:
+            if not isinstance(message, Message):
+                message = Message.from_dict(message)
+            accepted += queue.push(message)
+        return accepted
+
+    def _targets(self, namespace: str, message: Message) -> Iterator["BaseApp"]:
+        typed = self.subscribers.get((namespace, message.type))
+        wildcard = self.subscribers.get((namespace, None))
+
+        if message.mode != "broadcast":
+            first = typed or wildcard
+            if first:
+                yield first[0]
+            return
+
+        if typed:
+            yield from typed
+        if wildcard:
+            if typed:
+                yield from (app for app in wildcard if app not in typed)
+            else:
+                yield from wildcard
+
+    def dispatch(
+        self,
+        profiler: Optional["Profiler"] = None,
+        ready: Optional[Callable[["BaseApp"], bool]] = None,
+    ) -> int:
+        """
+        Deliver every message queued before this call. Messages queued by
+        listeners during dispatch wait for the next call. With ready given,
+        apps it rejects only get urgent messages; the rest are deferred
+        until a dispatch where they are ready.
+        """
+        total = 0
+
+        if self.deferred:
+            for key, (app, inbox) in list(self.deferred.items()):
+                if ready is None or ready(app):
+                    del self.deferred[key]
+                    for message in inbox:
+                        self._deliver(app, message, profiler)
+
+        for namespace, queue in self.queues.items():
+            count = len(queue.items)
+            if profiler is not None:
+                profiler.record_queue(namespace, count)
+            if not count or not self.listeners.get(namespace):
+                # Nobody listening yet: keep messages (bounded) until then
+                continue
+
+            if namespace != "logger":
+                Logger.debug(
+                    "Dispatching %d messages to %s", "kernel", count, namespace
+                )
+
+            for _ in range(count):
+                message = queue.pop()
+                for app in list(self._targets(namespace, message)):
+                    if ready is None or ready(app):
+                        self._deliver(app, message, profiler)
+                    elif message.urgent:
+                        # Still after anything deferred, to keep the order
+                        entry = self.deferred.pop(id(app), None)
+                        if entry is not None:
+                            for deferred in entry[1]:
+                                self._deliver(app, deferred, profiler)
+                        self._deliver(app, message, profiler)
+                    else:
+                        self._defer(app, message)
+            queue.dispatched += count
+            total += count
+
+        return total
+
+    def _deliver(
+        self, app: "BaseApp", message: Message, profiler: Optional["Profiler"]
+    ) -> None:
+        start = time.perf_counter() if profiler is not None else 0.0
+        try:
+            app.listen(message)
+        except Exception as e:
+            Logger.error(f"App '{app.namespace}' listen() error: {e}", "kernel")
+        if profiler is not None and app.window is not None:
+            profiler.record(app.window.id, "listen", time.perf_counter() - start)
+
+    def _defer(self, app: "BaseApp", message: Message) -> None:
+        entry = self.deferred.get(id(app))
+        if entry is None:
+            entry = (app, deque(maxlen=app.message_queue_size))
+            self.deferred[id(app)] = entry
+        inbox = entry[1]
+        if len(inbox) == inbox.maxlen:
+            self.deferred_dropped += 1
+        inbox.append(message)
+
+    def has_deferred(self, app: "BaseApp") -> bool:
+        return id(app) in self.deferred
+
+    def deliverable(self) -> bool:
+        """
+        True if any queue with at least one listener has messages waiting.
+        """
+        listeners = self.listeners
+        for namespace, queue in self.queues.items():
+            if queue.items and listeners.get(namespace):
+                return True
+        return False
+
+    def pending(self) -> int:
+        return sum(len(q.items) for q in self.queues.values()) + sum(
+            len(inbox) for _, inbox in self.deferred.values()
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            ns: {
+                "depth": len(q.items),
+                "maxlen": q.maxlen,
+                "queued": q.queued,
+                "dispatched": q.dispatched,
+                "dropped": q.dropped,
+            }
+            for ns, q in self.queues.items()
+        }
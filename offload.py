@@ -0,0 +1,178 @@
+import os
+import time
+import signal
+import itertools
+import multiprocessing
+from queue import Empty
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from logger import Logger
+from constants import OFFLOAD_WORKERS, OFFLOAD_TIMEOUT
+from typing import TYPE_CHECKING, Any, Deque, Dict, Generator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from commands import CommandType
+
+# Result kinds sent back from workers
+LINES, DONE, ERROR = range(3)
+# How often a worker hands over buffered output and checks for cancellation
+FLUSH_INTERVAL = 0.02
+FLUSH_LINES = 256
+CANCEL_SLOTS = 64
+
+Result = Tuple[int, int, Any]
+
+_results: Any = None
+_cancelled: Any = None
+
+
+def _init_worker(results: Any, cancelled: Any) -> None:
+    global _results, _cancelled
+    _results = results
+    _cancelled = cancelled
+    # Ctrl+C in the console belongs to the kernel, which cancels tasks itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+def _run(task: int, handler: "CommandType", args: List[Any], timeout: float) -> None:
+    """
+    Worker side: run the command and send its lines back in batches.
+    Offloaded commands get no kernel, since it lives in another process.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    batch: List[str] = []
+    last = time.monotonic()
+    try:
+        for line in handler(None, args):  # type: ignore[arg-type]
+            if line is not None:
+                batch.append(str(line))
+
+            now = time.monotonic()
+            if now - last < FLUSH_INTERVAL and len(batch) < FLUSH_LINES:
+                continue
+
+            last = now
+            if batch:
+                _results.put((task, LINES, batch))
+                batch = []
+            if task in _cancelled[:]:
+                return
+            if deadline is not None and now > deadline:
+                raise TimeoutError(f"timed out after {timeout:g}s")
+
+        if batch:
+            _results.put((task, LINES, batch))
+        _results.put((task, DONE, None))
+    except Exception as e:
+        if batch:
+            _results.put((task, LINES, batch))
+        _results.put((task, ERROR, f"{type(e).__name__}: {e}"))
+
+
+class OffloadPool:
+    """
+    Warm process pool for CPU-bound commands, so they run outside the GIL
+    the kernel renders under. Output comes back through a shared queue that
+    the invoking job drains each frame.
+    """
+
+    def __init__(self, workers: int = OFFLOAD_WORKERS) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        self.results = ctx.Queue()
+        self.cancelled = ctx.Array("q", [0] * CANCEL_SLOTS, lock=False)
+        self.cancel_index = 0
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.results, self.cancelled),
+        )
+        self.task_ids = itertools.count(1)
+        self.inbox: Dict[int, Deque[Result]] = {}
+
+        # Spawn every worker now rather than on the first command, without
+        # waiting for their imports to finish
+        for _ in range(workers):
+            self.pool.submit(_warm)
+        Logger.info(f"Offload pool started with {workers} workers", "offload")
+
+    def poll(self) -> None:
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except Empty:
+                return
+            inbox = self.inbox.get(result[0])
+            if inbox is not None:
+                inbox.append(result)
+
+    def cancel(self, task: int) -> None:
+        self.cancelled[self.cancel_index] = task
+        self.cancel_index = (self.cancel_index + 1) % CANCEL_SLOTS
+
+    def stream(
+        self,
+        handler: "CommandType",
+        args: List[Any],
+        timeout: Optional[float] = OFFLOAD_TIMEOUT,
+    ) -> Generator[Optional[str], None, None]:
+        """
+        Submit a command and yield its output as it arrives, None while
+        waiting. Closing the generator cancels the task.
+        """
+        task = next(self.task_ids)
+        inbox: Deque[Result] = deque()
+        self.inbox[task] = inbox
+        future: Future = self.pool.submit(_run, task, handler, args, timeout or 0)
+        # The worker enforces the timeout between yields; this catches
+        # commands stuck without yielding, silent for twice the timeout. The
+        # clock starts once the pool runs the task and restarts with every
+        # batch of output, so neither waiting in the queue nor a long but
+        # streaming command counts against it
+        silence = timeout * 2 if timeout else None
+        deadline: Optional[float] = None
+        finished = False
+
+        try:
+            while True:
+                self.poll()
+                while inbox:
+                    _, kind, data = inbox.popleft()
+                    if kind == LINES:
+                        if silence is not None:
+                            deadline = time.monotonic() + silence
+                        yield from data
+                    elif kind == ERROR:
+                        finished = True
+                        yield f"Error: {data}"
+                        return
+                    else:
+                        finished = True
+                        return
+
+                if future.done() and future.exception() is not None:
+                    finished = True
+                    yield f"Error: worker failed: {future.exception()}"
+                    return
+                if silence is not None:
+                    if deadline is None:
+                        if future.running():
+                            deadline = time.monotonic() + silence
+                    elif time.monotonic() > deadline:
+                        yield f"Error: no output for {silence:g}s, cancelled"
+                        return
+                yield None
+        finally:
+            if not finished:
+                future.cancel()
+                self.cancel(task)
+            del self.inbox[task]
+
+    def shutdown(self) -> None:
+        for task in self.inbox:
+            self.cancel(task)
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,133 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from constants import PROFILE_HISTORY
+
+PHASES = ("listen", "update", "draw", "chrome", "blit")
+
+
+class Histogram:
+    """
+    Fixed-size rolling window of samples. Recording is O(1) and allocation
+    free; statistics are computed on demand.
+    """
+
+    __slots__ = ("samples", "index", "count")
+
+    def __init__(self, size: int = PROFILE_HISTORY) -> None:
+        self.samples = [0.0] * size
+        self.index = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        if self.count < len(self.samples):
+            self.count += 1
+
+    def values(self) -> List[float]:
+        return self.samples[: self.count]
+
+    def last(self) -> float:
+        return self.samples[self.index - 1] if self.count else 0.0
+
+    def mean(self) -> float:
+        return sum(self.values()) / self.count if self.count else 0.0
+
+    def max(self) -> float:
+        return max(self.values()) if self.count else 0.0
+
+    def percentile(self, p: int) -> float:
+        if not self.count:
+            return 0.0
+        ordered = sorted(self.values())
+        return ordered[min(self.count - 1, round(p / 100 * (self.count - 1)))]
+
+
+class Profiler:
+    """
+    Per-window timings for each frame phase plus message-queue depths.
+    Only exists while profiling is on; the kernel checks for None.
+    """
+
+    def __init__(self) -> None:
+        self.windows: Dict[int, Dict[str, Histogram]] = {}
+        self.names: Dict[int, str] = {}
+        self.queues: Dict[str, Histogram] = {}
+
+    def record(self, wid: int, phase: str, seconds: float) -> None:
+        phases = self.windows.get(wid)
+        if phases is None:
+            phases = self.windows[wid] = {p: Histogram() for p in PHASES}
+        phases[phase].add(seconds)
+
+    def record_queue(self, namespace: str, depth: int) -> None:
+        hist = self.queues.get(namespace)
+        if hist is None:
+            hist = self.queues[namespace] = Histogram()
+        hist.add(depth)
+
+    def forget(self, wid: int) -> None:
+        self.windows.pop(wid, None)
+        self.names.pop(wid, None)
+
+    def rows(self) -> List[Tuple[int, str, Dict[str, float], float]]:
+        """
+        (window id, name, mean ms per phase, total mean ms), busiest first.
+        """
+        result = []
+        for wid, phases in self.windows.items():
+            means = {p: h.mean() * 1000 for p, h in phases.items()}
+            result.append((wid, self.names.get(wid, "?"), means, sum(means.values())))
+        result.sort(key=lambda row: row[3], reverse=True)
+        return result
+
+    def report(self, limit: int = 10) -> List[str]:
+        lines = [
+            f"{'WID':>4} {'APP':<12}"
+            + "".join(f"{p:>8}" for p in PHASES)
+            + f"{'TOTAL':>8}  (mean ms)"
+        ]
+        for wid, name, means, total in self.rows()[:limit]:
+            lines.append(
+                f"{wid:>4} {name[:12]:<12}"
+                + "".join(f"{means[p]:>8.3f}" for p in PHASES)
+                + f"{total:>8.3f}"
+            )
+
+        if self.queues:
+            lines.append(
+                "queues: "
+                + "  ".join(
+                    f"{ns}={int(h.last())}(max {int(h.max())})"
+                    for ns, h in self.queues.items()
+                )
+            )
+        return lines
+
+
+class PhaseTimer:
+    """
+    Wall time of named one-off phases, such as the steps of startup.
+    """
+
+    def __init__(self) -> None:
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self, indent: str = "") -> List[str]:
+        return [
+            f"{indent}{name:<28} {seconds * 1000:9.2f} ms"
+            for name, seconds in self.phases
+        ]
@@ -0,0 +1,204 @@
+import csv
+import gzip
+import json
+import time
+import pygame
+from logger import Logger
+from window import Window
+from scheduler import FrameScheduler
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from constants import FPS, SCREEN_SIZE
+
+if TYPE_CHECKING:
+    from kernel import Kernel
+
+RECORDING_VERSION = 1
+
+# [namespace, title, x, y, w, h] of a launched window
+Launch = List[Any]
+
+
+def encode_event(event: pygame.event.Event) -> List[Any]:
+    """
+    [type, attributes] with only the JSON-friendly attributes kept, which
+    drops references such as the SDL window of window events.
+    """
+    attrs: Dict[str, Any] = {}
+    for key, value in event.dict.items():
+        if isinstance(value, (bool, int, float, str)) or value is None:
+            attrs[key] = value
+        elif isinstance(value, (tuple, list)) and all(
+            isinstance(v, (int, float)) for v in value
+        ):
+            attrs[key] = list(value)
+    return [event.type, attrs]
+
+
+def decode_event(data: List[Any]) -> pygame.event.Event:
+    event_type, attrs = data
+    return pygame.event.Event(
+        event_type,
+        {k: tuple(v) if isinstance(v, list) else v for k, v in attrs.items()},
+    )
+
+
+def describe_launch(window: Window) -> Launch:
+    return [window.app.namespace, window.title, *window.rect]
+
+
+class Recorder:
+    """
+    Writes a session as gzipped JSON lines: a header naming the main app,
+    then one record per frame with its start time, the dt the kernel was
+    given, the events it handled and the windows launched during it.
+    """
+
+    def __init__(self, path: str, app: str, compositor: bool = False) -> None:
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.start = time.perf_counter()
+        self.frames = 0
+        self.launches: List[Launch] = []
+        self._write(
+            {
+                "version": RECORDING_VERSION,
+                "app": app,
+                "screen": list(SCREEN_SIZE),
+                "fps": FPS,
+                "compositor": compositor,
+                "pygame": pygame.version.ver,
+            }
+        )
+        Logger.info(f"Recording session to '{path}'", "system")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def launch(self, window: Window) -> None:
+        self.launches.append(describe_launch(window))
+
+    def frame(
+        self, frame_start: float, dt: float, events: List[pygame.event.Event]
+    ) -> None:
+        record: Dict[str, Any] = {
+            "t": round(frame_start - self.start, 6),
+            "dt": round(dt, 6),
+        }
+        if events:
+            record["e"] = [encode_event(event) for event in events]
+        if self.launches:
+            record["w"] = self.launches
+            self.launches = []
+        self._write(record)
+        self.frames += 1
+
+    def close(self) -> None:
+        self.file.close()
+        Logger.info(f"Recorded {self.frames} frames to '{self.path}'", "system")
+
+
+class ReplayScheduler(FrameScheduler):
+    """
+    Drives the main loop from a recording instead of live input: every
+    frame gets the recorded events and dt, at the recorded pace when
+    realtime or back to back otherwise. Per-frame work times go to a CSV
+    file next to the recording, and launches are checked against the
+    recorded ones to catch a replay that went off course.
+    """
+
+    def __init__(
+        self, path: str, realtime: bool = True, timings: Optional[str] = None
+    ) -> None:
+        super().__init__(FPS, idle=False)
+        self.path = path
+        self.realtime = realtime
+        self.file = gzip.open(path, "rt", encoding="utf-8")
+        self.header: Dict[str, Any] = json.loads(self.file.readline())
+        if self.header.get("version") != RECORDING_VERSION:
+            raise ValueError(
+                f"Unsupported recording version {self.header.get('version')}"
+            )
+        if tuple(self.header["screen"]) != SCREEN_SIZE:
+            Logger.warn(
+                f"Recording was made at {self.header['screen']}, replaying at"
+                f" {SCREEN_SIZE}",
+                "system",
+            )
+
+        self.app: str = self.header["app"]
+        self.records: Iterator[Dict[str, Any]] = (
+            json.loads(line) for line in self.file
+        )
+        self.record: Dict[str, Any] = {}
+        self.finished = False
+        self.launched: List[Launch] = []
+        self.diverged = 0
+        self.started: Optional[float] = None
+
+        self.timings_path = timings or path + ".timings.csv"
+        self.timings_file = open(self.timings_path, "w", newline="")
+        self.timings = csv.writer(self.timings_file)
+        self.timings.writerow(["frame", "t", "dt", "events", "work_ms"])
+        Logger.info(f"Replaying session from '{path}'", "system")
+
+    def next_frame(self, kernel: "Kernel") -> Tuple[float, List[pygame.event.Event]]:
+        # Live input (and the dummy driver's window events) is not replayed
+        pygame.event.get()
+
+        record = next(self.records, None)
+        if record is None:
+            self.finished = True
+            return 0.0, []
+
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - record["t"]
+        elif self.realtime:
+            wait = self.started + record["t"] - now
+            if wait > 0:
+                time.sleep(wait)
+
+        dt = record["dt"]
+        self.record = record
+        self.frames += 1
+        self.intervals.append(dt)
+        self.frame_start = time.perf_counter()
+        return dt, [decode_event(data) for data in record.get("e", ())]
+
+    def end_frame(self) -> None:
+        work = time.perf_counter() - self.frame_start
+        self.work_times.append(work)
+        record = self.record
+        self.timings.writerow(
+            [
+                self.frames,
+                record["t"],
+                record["dt"],
+                len(record.get("e", ())),
+                round(work * 1000, 4),
+            ]
+        )
+
+        if self.launched != record.get("w", []):
+            self.diverged += 1
+            if self.diverged == 1:
+                Logger.warn(
+                    f"Replay diverged at frame {self.frames}: launched"
+                    f" {self.launched}, recorded {record.get('w', [])}",
+                    "system",
+                )
+        self.launched = []
+
+    def launch(self, window: Window) -> None:
+        self.launched.append(describe_launch(window))
+
+    def close(self) -> None:
+        self.file.close()
+        self.timings_file.close()
+        Logger.info(
+            f"Replayed {self.frames} frames, timings in '{self.timings_path}'",
+            "system",
+        )
+        if self.diverged:
+            Logger.warn(f"{self.diverged} frames launched other windows", "system")
@@ -0,0 +1,170 @@
+import pygame
+from pygame._sdl2.video import Renderer, Texture, Window as SDLWindow, get_drivers
+from logger import Logger
+from window import Window
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from constants import BORDER, BORDER_COLOR
+
+if TYPE_CHECKING:
+    from kernel import Kernel
+
+# Window id -> (texture, version of the surface it was uploaded from)
+TextureCache = Dict[int, Tuple[Texture, int]]
+
+
+class SurfaceBackend:
+    """
+    Software compositing: windows are blitted onto the display surface.
+    """
+
+    name = "surface"
+
+    def __init__(self, size: Tuple[int, int], caption: str) -> None:
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption(caption)
+
+    def present(self, kernel: "Kernel") -> None:
+        if kernel.compositor:
+            damage = kernel.draw(self.screen)
+            if damage:
+                pygame.display.update(damage)
+        else:
+            self.screen.fill((0, 0, 0))
+            kernel.draw(self.screen)
+            pygame.display.flip()
+
+    def close(self) -> None:
+        pass
+
+
+class TextureBackend:
+    """
+    Compositing with an SDL2 Renderer. Window content and title bar chrome
+    are kept as textures and uploaded again only after the window re-renders
+    them, then every frame is assembled from textures. driver names the SDL
+    render driver ("software" needs no GPU), None lets SDL pick.
+    """
+
+    name = "renderer"
+
+    def __init__(
+        self, size: Tuple[int, int], caption: str, driver: Optional[str] = None
+    ) -> None:
+        index = -1
+        if driver is not None:
+            drivers = [info.name for info in get_drivers()]
+            if driver not in drivers:
+                raise ValueError(
+                    f"Unknown render driver '{driver}', have {', '.join(drivers)}"
+                )
+            index = drivers.index(driver)
+
+        self.window = SDLWindow(caption, size)
+        self.renderer = Renderer(self.window, index)
+        self.content: TextureCache = {}
+        self.chrome: TextureCache = {}
+        self.overlay: Optional[Texture] = None
+        self.overlay_source: Optional[pygame.Surface] = None
+        self.uploads = 0
+        self.allocations = 0
+        Logger.info(f"Compositing with SDL renderer '{driver or 'auto'}'", "system")
+
+    def present(self, kernel: "Kernel") -> None:
+        if kernel.draw(self):
+            self.renderer.present()
+
+    def close(self) -> None:
+        self.content.clear()
+        self.chrome.clear()
+        self.overlay = self.overlay_source = None
+        del self.renderer
+        self.window.destroy()
+
+    def clear(self, color: Tuple[int, int, int]) -> None:
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.clear()
+
+    def upload(
+        self, cache: TextureCache, key: int, surface: pygame.Surface, version: int
+    ) -> Texture:
+        """
+        Texture for key holding surface, uploaded only if version changed.
+        """
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry[0]
+
+        if entry is not None and entry[0].get_rect().size == surface.get_size():
+            texture = entry[0]
+            texture.update(surface)
+        else:
+            texture = Texture.from_surface(self.renderer, surface)
+            self.allocations += 1
+        self.uploads += 1
+        cache[key] = (texture, version)
+        return texture
+
+    def draw_window(self, win: Window, clip: pygame.Rect) -> None:
+        """
+        Draw the part of win inside clip, in the same layers as
+        Window.composite(): chrome, border, content.
+        """
+        rect = win.rect
+        if not win.embedded and win.chrome is not None:
+            texture = self.upload(self.chrome, win.id, win.chrome, win.chrome_version)
+            self._draw(texture, texture.get_rect(topleft=rect.topleft), clip)
+
+        renderer = self.renderer
+        renderer.draw_color = pygame.Color(BORDER_COLOR)
+        x, y, w, h = rect
+        for strip in (
+            (x, y, w, BORDER),
+            (x, y + h - BORDER, w, BORDER),
+            (x, y, BORDER, h),
+            (x + w - BORDER, y, BORDER, h),
+        ):
+            part = clip.clip(strip)
+            if part.w and part.h:
+                renderer.fill_rect(part)
+
+        texture = self.upload(self.content, win.id, win.surface, win.content_version)
+        self._draw(texture, win.content_rect, clip)
+
+    def draw_overlay(self, overlay: pygame.Surface, rect: pygame.Rect) -> None:
+        if overlay is not self.overlay_source:
+            self.overlay = Texture.from_surface(self.renderer, overlay)
+            self.overlay_source = overlay
+            self.uploads += 1
+        if self.overlay is not None:
+            self.overlay.draw(dstrect=rect)
+
+    def prune(self, live: Dict[int, List[pygame.Rect]]) -> None:
+        """
+        Drop textures of windows that are no longer in live.
+        """
+        for cache in (self.content, self.chrome):
+            if len(cache) > len(live):
+                for key in [key for key in cache if key not in live]:
+                    del cache[key]
+
+    @staticmethod
+    def _draw(texture: Texture, dest: pygame.Rect, clip: pygame.Rect) -> None:
+        part = dest.clip(clip)
+        if part.w and part.h:
+            texture.draw(srcrect=part.move(-dest.x, -dest.y), dstrect=part)
+
+
+Backend = Union[SurfaceBackend, TextureBackend]
+
+BACKENDS = {backend.name: backend for backend in (SurfaceBackend, TextureBackend)}
+
+
+def create_backend(
+    name: str, size: Tuple[int, int], caption: str, driver: Optional[str] = None
+) -> Backend:
+    if name == TextureBackend.name:
+        return TextureBackend(size, caption, driver)
+    if name == SurfaceBackend.name:
+        return SurfaceBackend(size, caption)
+    raise ValueError(f"Unknown render backend '{name}'")
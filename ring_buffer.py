@@ -0,0 +1,79 @@
+from typing import Generic, Iterable, Iterator, List, Optional, TypeVar, overload
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """
+    Fixed-capacity buffer that overwrites its oldest item when full. Items
+    are addressed either by position (0 = oldest kept) or by sequence
+    number, which counts every item ever appended and so stays stable
+    while old items are dropped.
+    """
+
+    __slots__ = ("items", "capacity", "start", "size", "total")
+
+    def __init__(self, capacity: int) -> None:
+        self.items: List[Optional[T]] = [None] * capacity
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def append(self, item: T) -> None:
+        end = self.start + self.size
+        if end >= self.capacity:
+            end -= self.capacity
+        self.items[end] = item
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = end + 1 if end + 1 < self.capacity else 0
+        self.total += 1
+
+    def extend(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.append(item)
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: "int | slice") -> "T | List[T]":
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("ring buffer index out of range")
+        index += self.start
+        if index >= self.capacity:
+            index -= self.capacity
+        return self.items[index]  # type: ignore[return-value]
+
+    def __iter__(self) -> Iterator[T]:
+        for i in range(self.size):
+            yield self[i]
+
+    @property
+    def first_seq(self) -> int:
+        """
+        Sequence number of the oldest item still kept.
+        """
+        return self.total - self.size
+
+    def get_seq(self, seq: int) -> T:
+        return self[seq - self.first_seq]
+
+    def clear(self) -> None:
+        self.items = [None] * self.capacity
+        self.start = 0
+        self.size = 0
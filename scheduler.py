@@ -0,0 +1,80 @@
+import time
+import pygame
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Sequence, Tuple
+
+from constants import FRAME_HISTORY, IDLE_MAX_WAIT
+
+if TYPE_CHECKING:
+    from kernel import Kernel
+
+
+def percentiles(
+    samples: Sequence[float], points: Sequence[int] = (50, 90, 99)
+) -> Dict[int, float]:
+    if not samples:
+        return {p: 0.0 for p in points}
+
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {p: ordered[min(last, round(p / 100 * last))] for p in points}
+
+
+class FrameScheduler:
+    """
+    Drives the main loop's frame timing. Runs at the target rate while the
+    kernel has work and blocks in pygame.event.wait() while it has none,
+    waking on the first input event or the next app deadline.
+    """
+
+    def __init__(self, fps: int, idle: bool = True, busy_loop: bool = False) -> None:
+        self.fps = fps
+        self.idle = idle
+        self.busy_loop = busy_loop
+        self.clock = pygame.time.Clock()
+
+        self.frame_start = time.perf_counter()
+        self.work_times: Deque[float] = deque(maxlen=FRAME_HISTORY)
+        self.intervals: Deque[float] = deque(maxlen=FRAME_HISTORY)
+        self.frames = 0
+        self.idle_frames = 0
+
+    def next_frame(self, kernel: "Kernel") -> Tuple[float, List[pygame.event.Event]]:
+        """
+        Wait until the next frame should run. Returns (dt, events).
+        """
+        if self.idle and not kernel.has_pending_work():
+            deadline = kernel.next_deadline()
+            wait = IDLE_MAX_WAIT if deadline is None else min(deadline, IDLE_MAX_WAIT)
+
+            if wait > 0:
+                self.idle_frames += 1
+                event = pygame.event.wait(max(1, int(wait * 1000)))
+                events = [] if event.type == pygame.NOEVENT else [event]
+                events.extend(pygame.event.get())
+
+                dt = self.clock.tick() / 1000.0
+                self.frame_start = time.perf_counter()
+                return dt, events
+
+        if self.busy_loop:
+            dt = self.clock.tick_busy_loop(self.fps) / 1000.0
+        else:
+            dt = self.clock.tick(self.fps) / 1000.0
+
+        self.frames += 1
+        self.intervals.append(dt)
+        self.frame_start = time.perf_counter()
+        return dt, pygame.event.get()
+
+    def end_frame(self) -> None:
+        self.work_times.append(time.perf_counter() - self.frame_start)
+
+    def stats(self) -> Dict[str, Dict[int, float]]:
+        """
+        Frame-time percentiles in milliseconds over the recent history.
+        """
+        return {
+            "work": {p: v * 1000 for p, v in percentiles(self.work_times).items()},
+            "interval": {p: v * 1000 for p, v in percentiles(self.intervals).items()},
+        }
@@ -0,0 +1,178 @@
+import bisect
+import pygame
+from typing import Dict, List, Set, Tuple, Iterable
+
+from constants import GRID_CELL_SIZE
+
+Span = Tuple[int, int, int, int]
+
+
+class SpatialGrid:
+    """
+    Uniform grid over screen space mapping each cell to the ids of the
+    windows overlapping it, ordered bottom to top by their z stamp, so a
+    point query can walk a cell from the top and stop at the first hit.
+    Cells are kept sorted by the stamp each window had when it was filed,
+    so a window is found again by binary search after its z stamp changed;
+    raising appends to a cell and lowering inserts at its front.
+
+    Rects outside the screen are clamped to the edge cells, so callers must
+    still confirm a hit against the real rect.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        z: Dict[int, int],
+        cell_size: int = GRID_CELL_SIZE,
+    ) -> None:
+        self.z = z
+        self.cell_size = cell_size
+        self.cols = max(1, -(-width // cell_size))
+        self.rows = max(1, -(-height // cell_size))
+        self.cells: List[List[int]] = [[] for _ in range(self.cols * self.rows)]
+        self.spans: Dict[int, Span] = {}
+        # z stamp each window was filed into its cells with
+        self.stamps: Dict[int, int] = {}
+
+    def _col(self, x: int) -> int:
+        return min(max(x // self.cell_size, 0), self.cols - 1)
+
+    def _row(self, y: int) -> int:
+        return min(max(y // self.cell_size, 0), self.rows - 1)
+
+    def _span(self, rect: pygame.Rect) -> Span:
+        return (
+            self._col(rect.left),
+            self._row(rect.top),
+            self._col(rect.right - 1),
+            self._row(rect.bottom - 1),
+        )
+
+    def _cells(self, span: Span) -> Iterable[List[int]]:
+        c0, r0, c1, r1 = span
+        cells = self.cells
+        cols = self.cols
+        for row in range(r0, r1 + 1):
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                yield cells[base + col]
+
+    def _insert(self, cell: List[int], wid: int, stamp: int) -> None:
+        stamps = self.stamps
+        if not cell or stamps[cell[-1]] <= stamp:
+            # Common case: the new or raised window is the topmost here
+            cell.append(wid)
+        elif stamp <= stamps[cell[0]]:
+            # A lowered window
+            cell.insert(0, wid)
+        else:
+            bisect.insort(cell, wid, key=stamps.__getitem__)
+
+    def _discard(self, cell: List[int], wid: int, stamp: int) -> None:
+        if cell[-1] == wid:
+            cell.pop()
+        else:
+            del cell[bisect.bisect_left(cell, stamp, key=self.stamps.__getitem__)]
+
+    def update(self, wid: int, rect: pygame.Rect) -> None:
+        span = self._span(rect)
+        old = self.spans.get(wid)
+        if old == span:
+            return
+
+        if old is not None:
+            stamp = self.stamps[wid]
+            for cell in self._cells(old):
+                self._discard(cell, wid, stamp)
+        stamp = self.stamps[wid] = self.z[wid]
+        for cell in self._cells(span):
+            self._insert(cell, wid, stamp)
+        self.spans[wid] = span
+
+    def restack(self, wid: int) -> None:
+        """
+        Move a window within its cells after its z stamp changed.
+        """
+        span = self.spans.get(wid)
+        if span is None:
+            return
+
+        stamps = self.stamps
+        key = stamps.__getitem__
+        old = stamps[wid]
+        stamp = self.z[wid]
+        cells = list(self._cells(span))
+        for cell in cells:
+            if cell[-1] == wid:
+                cell.pop()
+            else:
+                del cell[bisect.bisect_left(cell, old, key=key)]
+
+        stamps[wid] = stamp
+        if stamp > old:
+            for cell in cells:
+                if not cell or key(cell[-1]) <= stamp:
+                    cell.append(wid)
+                else:
+                    bisect.insort(cell, wid, key=key)
+        else:
+            for cell in cells:
+                if not cell or stamp <= key(cell[0]):
+                    cell.insert(0, wid)
+                else:
+                    bisect.insort(cell, wid, key=key)
+
+    def remove(self, wid: int) -> None:
+        old = self.spans.pop(wid, None)
+        if old is None:
+            return
+
+        stamp = self.stamps[wid]
+        for cell in self._cells(old):
+            self._discard(cell, wid, stamp)
+        del self.stamps[wid]
+
+    def at(self, pos: Tuple[int, int]) -> List[int]:
+        """
+        Candidate ids for a point, bottom to top. Iterate with reversed().
+        """
+        return self.cells[self._row(pos[1]) * self.cols + self._col(pos[0])]
+
+    def overlapping(self, rect: pygame.Rect) -> Set[int]:
+        result: Set[int] = set()
+        for cell in self._cells(self._span(rect)):
+            result.update(cell)
+        return result
+
+    def __contains__(self, wid: int) -> bool:
+        return wid in self.spans
+
+
+def subtract_rect(rect: pygame.Rect, cover: pygame.Rect) -> List[pygame.Rect]:
+    """
+    The parts of rect not under cover, as up to four disjoint rects: full
+    width bands above and below, then the pieces left and right of it.
+    Called for every overlapping pair of windows when the stack changes,
+    so it sticks to plain int arithmetic.
+    """
+    x, y, w, h = rect
+    cx, cy, cw, ch = cover
+    right, bottom = x + w, y + h
+    cright, cbottom = cx + cw, cy + ch
+    if cx >= right or cright <= x or cy >= bottom or cbottom <= y:
+        return [rect]
+
+    top = cy if cy > y else y
+    low = cbottom if cbottom < bottom else bottom
+    pieces = []
+    if y < top:
+        pieces.append(pygame.Rect(x, y, w, top - y))
+    if low < bottom:
+        pieces.append(pygame.Rect(x, low, w, bottom - low))
+    if x < cx:
+        pieces.append(pygame.Rect(x, top, cx - x, low - top))
+    if cright < right:
+        pieces.append(pygame.Rect(cright, top, right - cright, low - top))
+    return pieces
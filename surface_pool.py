@@ -0,0 +1,139 @@
+import pygame
+from collections import OrderedDict
+from logger import Logger
+from typing import Dict, List, Tuple, Any
+
+from constants import SURFACE_BUCKET, SURFACE_POOL_BYTES
+
+# (width, height, per-pixel alpha) of a backing surface
+BucketKey = Tuple[int, int, bool]
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class SurfacePool:
+    """
+    Kernel-owned allocator for window surfaces. Sizes are rounded up to
+    SURFACE_BUCKET pixels and callers get an exact-size subsurface of the
+    backing surface. Resizing inside a bucket is then free, and backings
+    released by closed or resized windows are reused, up to
+    SURFACE_POOL_BYTES kept idle. Backings use the display's pixel format
+    once a display mode is set, so blitting them needs no conversion.
+    """
+
+    def __init__(
+        self, bucket: int = SURFACE_BUCKET, budget: int = SURFACE_POOL_BYTES
+    ) -> None:
+        self.bucket = bucket
+        self.budget = budget
+        # Least recently released bucket first
+        self.free: "OrderedDict[BucketKey, List[pygame.Surface]]" = OrderedDict()
+        self.free_bytes = 0
+        # Owner (window id) -> bytes of backing surfaces it holds
+        self.owners: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bucket_key(self, size: Tuple[int, int], alpha: bool) -> BucketKey:
+        b = self.bucket
+        w, h = size
+        return (max(b, -(-w // b) * b), max(b, -(-h // b) * b), alpha)
+
+    def _allocate(self, key: BucketKey) -> pygame.Surface:
+        w, h, alpha = key
+        surface = pygame.Surface((w, h), pygame.SRCALPHA if alpha else 0)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha() if alpha else surface.convert()
+        return surface
+
+    def acquire(
+        self, size: Tuple[int, int], owner: int, alpha: bool = False
+    ) -> pygame.Surface:
+        """
+        A cleared surface of exactly size, charged to owner until released.
+        """
+        key = self.bucket_key(size, alpha)
+        pooled = self.free.get(key)
+        if pooled:
+            backing = pooled.pop()
+            if not pooled:
+                del self.free[key]
+            self.free_bytes -= surface_bytes(backing)
+            backing.fill((0, 0, 0, 0))
+            self.hits += 1
+        else:
+            backing = self._allocate(key)
+            self.misses += 1
+
+        self.owners[owner] = self.owners.get(owner, 0) + surface_bytes(backing)
+        return backing.subsurface((0, 0) + tuple(size))
+
+    def resize(
+        self, surface: pygame.Surface, size: Tuple[int, int], owner: int
+    ) -> pygame.Surface:
+        """
+        surface resized to size, on the same backing when it still fits
+        the bucket. Contents are not preserved either way.
+        """
+        backing = surface.get_parent() or surface
+        alpha = bool(backing.get_flags() & pygame.SRCALPHA)
+        key = self.bucket_key(size, alpha)
+        if backing.get_size() == key[:2]:
+            return backing.subsurface((0, 0) + tuple(size))
+
+        self.release(surface, owner)
+        return self.acquire(size, owner, alpha)
+
+    def release(self, surface: pygame.Surface, owner: int) -> None:
+        backing = surface.get_parent() or surface
+        size = surface_bytes(backing)
+        held = self.owners.get(owner, 0) - size
+        if held > 0:
+            self.owners[owner] = held
+        else:
+            self.owners.pop(owner, None)
+
+        w, h = backing.get_size()
+        key = (w, h, bool(backing.get_flags() & pygame.SRCALPHA))
+        self.free.setdefault(key, []).append(backing)
+        self.free.move_to_end(key)
+        self.free_bytes += size
+        self.trim()
+
+    def trim(self) -> None:
+        """
+        Drop idle backings, least recently released first, down to budget.
+        """
+        while self.free_bytes > self.budget and self.free:
+            key, pooled = next(iter(self.free.items()))
+            backing = pooled.pop(0)
+            if not pooled:
+                del self.free[key]
+            self.free_bytes -= surface_bytes(backing)
+            self.evictions += 1
+            Logger.debug("Evicted pooled surface %dx%d", "surfaces", key[0], key[1])
+
+    def memory(self, owner: int) -> int:
+        return self.owners.get(owner, 0)
+
+    @property
+    def in_use(self) -> int:
+        return sum(self.owners.values())
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_use": self.in_use,
+            "pooled": sum(len(pooled) for pooled in self.free.values()),
+            "pooled_bytes": self.free_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
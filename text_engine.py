@@ -0,0 +1,251 @@
+import os
+import json
+import pygame
+import threading
+from logger import Logger
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from constants import CACHE_DIR, TEXT_STYLE
+
+Color = Tuple[int, int, int]
+
+# Printable ASCII is rasterized up front, anything else on first use.
+PRELOAD_CHARS = "".join(chr(c) for c in range(32, 127))
+ATLAS_COLUMNS = 32
+MAX_TINTS = 32
+WHITE = (255, 255, 255)
+# Drawn for characters the font cannot render, such as NUL
+REPLACEMENT_CHAR = "?"
+
+
+class TextEngine:
+    """
+    Monospace text renderer backed by a glyph atlas.
+
+    Every glyph is rasterized once, in white, into a single alpha atlas.
+    Colors are produced by tinting a copy of the atlas, styles by compositing,
+    so neither costs a FreeType call. Lines are drawn with one Surface.blits.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        font: Optional[pygame.font.Font] = None,
+        cache_dir: Optional[str] = CACHE_DIR,
+        lock: Optional[threading.Lock] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.font = font or pygame.font.Font(path, size)
+        # Guards the atlas, glyphs and tints (and the font) when drawn from
+        # several render threads; blitting from the atlas needs no lock
+        self.lock = lock or threading.Lock()
+        self.char_width = self.font.size("M")[0]
+        self.line_height = self.font.get_height()
+
+        self.glyphs: Dict[str, pygame.Rect] = {}
+        self.tints: Dict[Color, pygame.Surface] = {}
+        self.atlas = self._new_atlas(ATLAS_COLUMNS, 4)
+        self.dirty = False
+
+        self.cache_path: Optional[str] = None
+        if cache_dir is not None:
+            name = f"{os.path.splitext(os.path.basename(path))[0]}-{size}"
+            self.cache_path = os.path.join(cache_dir, name)
+
+        if not self.load_cache():
+            for ch in PRELOAD_CHARS:
+                self._add_glyph(ch)
+            self.save_cache()
+
+    def _new_atlas(self, cols: int, rows: int) -> pygame.Surface:
+        return pygame.Surface(
+            (cols * self.char_width, rows * self.line_height), pygame.SRCALPHA
+        )
+
+    def _cache_key(self) -> Dict[str, object]:
+        return {
+            "font": os.path.abspath(self.path),
+            "mtime": os.path.getmtime(self.path),
+            "size": self.size,
+            "pygame": pygame.version.ver,
+        }
+
+    def load_cache(self) -> bool:
+        if self.cache_path is None:
+            return False
+
+        try:
+            with open(self.cache_path + ".json", "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("key") != self._cache_key():
+                return False
+
+            atlas = pygame.image.load(self.cache_path + ".png")
+            if pygame.display.get_surface() is not None:
+                atlas = atlas.convert_alpha()
+            else:
+                # PNGs load in RGBA order, which blits several times slower
+                # than the layout of atlases rendered here
+                atlas = atlas.convert(self._new_atlas(1, 1))
+        except (OSError, ValueError, pygame.error):
+            return False
+
+        self.atlas = atlas
+        self.glyphs = {ch: pygame.Rect(r) for ch, r in index["glyphs"].items()}
+        self.tints.clear()
+        Logger.debug(
+            "Loaded %d glyphs for %s@%d from cache",
+            "text",
+            len(self.glyphs),
+            self.path,
+            self.size,
+        )
+        return True
+
+    def save_cache(self) -> None:
+        if self.cache_path is None or not self.dirty:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            pygame.image.save(self.atlas, self.cache_path + ".png")
+            index = {
+                "key": self._cache_key(),
+                "glyphs": {ch: list(r) for ch, r in self.glyphs.items()},
+            }
+            with open(self.cache_path + ".json", "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            self.dirty = False
+        except (OSError, pygame.error) as e:
+            Logger.warn(f"Failed to write glyph cache {self.cache_path}: {e}", "text")
+
+    def _add_glyph(self, ch: str) -> pygame.Rect:
+        try:
+            surf = self.font.render(ch, True, WHITE)
+        except ValueError:
+            # NUL
+            surf = self.font.render(REPLACEMENT_CHAR, True, WHITE)
+        except pygame.error:
+            # Zero-width characters such as U+FEFF get an empty glyph
+            surf = pygame.Surface((0, self.line_height), pygame.SRCALPHA)
+        cols = self.atlas.get_width() // self.char_width
+        slot = len(self.glyphs)
+        w = min(surf.get_width(), self.char_width)
+        rect = pygame.Rect(
+            (slot % cols) * self.char_width,
+            (slot // cols) * self.line_height,
+            w,
+            self.line_height,
+        )
+
+        if rect.bottom > self.atlas.get_height():
+            grown = self._new_atlas(
+                cols, self.atlas.get_height() // self.line_height * 2
+            )
+            grown.blit(self.atlas, (0, 0))
+            self.atlas = grown
+
+        # MAX keeps the glyph's own alpha instead of blending it onto the atlas.
+        self.atlas.blit(surf, rect, (0, 0, w, self.line_height), pygame.BLEND_RGBA_MAX)
+        self.glyphs[ch] = rect
+        self.tints.clear()
+        self.dirty = True
+        return rect
+
+    def _tinted(self, color: Color) -> pygame.Surface:
+        color = tuple(color[:3])  # type: ignore[assignment]
+        tint = self.tints.get(color)
+        if tint is None:
+            if color == WHITE:
+                tint = self.atlas
+            else:
+                tint = self.atlas.copy()
+                tint.fill((*color, 255), special_flags=pygame.BLEND_RGBA_MULT)
+            if len(self.tints) >= MAX_TINTS:
+                self.tints.clear()
+            self.tints[color] = tint
+        return tint
+
+    def measure(self, text: str) -> Tuple[int, int]:
+        return len(text) * self.char_width, self.line_height
+
+    def _line_blits(
+        self,
+        atlas: pygame.Surface,
+        text: str,
+        pos: Tuple[int, int],
+        style: TEXT_STYLE,
+        out: List[Tuple[pygame.Surface, Tuple[int, int], pygame.Rect]],
+    ) -> None:
+        x, y = pos
+        cw = self.char_width
+        glyphs = self.glyphs
+        bold = TEXT_STYLE.BOLD & style
+
+        for ch in text:
+            if ch != " ":
+                # Zero-width glyphs have an empty, falsy, rect
+                rect = glyphs.get(ch)
+                if rect is None:
+                    rect = self._add_glyph(ch)
+                out.append((atlas, (x, y), rect))
+                if bold:
+                    out.append((atlas, (x + 1, y), rect))
+            x += cw
+
+    def _decorate(
+        self,
+        surface: pygame.Surface,
+        text: str,
+        pos: Tuple[int, int],
+        color: Color,
+        style: TEXT_STYLE,
+    ) -> None:
+        x, y = pos
+        w = len(text) * self.char_width
+        if TEXT_STYLE.UNDERLINE & style:
+            uy = y + self.font.get_ascent() + 1
+            pygame.draw.line(surface, color, (x, uy), (x + w - 1, uy))
+        if TEXT_STYLE.STRIKETHROUGH & style:
+            sy = y + self.line_height // 2
+            pygame.draw.line(surface, color, (x, sy), (x + w - 1, sy))
+
+    def draw(
+        self,
+        surface: pygame.Surface,
+        text: str,
+        pos: Tuple[int, int],
+        color: Color = (220, 220, 220),
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> int:
+        self.draw_many(surface, ((text, pos),), color, style)
+        return len(text) * self.char_width
+
+    def draw_many(
+        self,
+        surface: pygame.Surface,
+        runs: Iterable[Tuple[str, Tuple[int, int]]],
+        color: Color = (220, 220, 220),
+        style: TEXT_STYLE = TEXT_STYLE(0),
+    ) -> None:
+        """
+        Draw several (text, pos) runs in one color with a single blits call.
+        """
+        blits: List[Tuple[pygame.Surface, Tuple[int, int], pygame.Rect]] = []
+        decorated = style & (TEXT_STYLE.UNDERLINE | TEXT_STYLE.STRIKETHROUGH)
+
+        with self.lock:
+            atlas = self._tinted(color)
+            for text, pos in runs:
+                # Glyph misses grow the atlas and drop the tints, so re-fetch after.
+                count = len(self.glyphs)
+                self._line_blits(atlas, text, pos, style, blits)
+                if len(self.glyphs) != count:
+                    atlas = self._tinted(color)
+                    blits = [(atlas, p, r) for _, p, r in blits]
+                if decorated:
+                    self._decorate(surface, text, pos, color, style)
+
+        surface.blits(blits, doreturn=False)
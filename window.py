@@ -1,8 +1,17 @@
+import time
 import pygame
 from app_base import BaseApp
+from profiler import Profiler
 from typing import Tuple, Optional
 
-from constants import TITLEBAR_HEIGHT, BORDER, FONT_SIZE
+from constants import (
+    TITLEBAR_HEIGHT,
+    BORDER,
+    BORDER_COLOR,
+    FONT_SIZE,
+    TITLE_FONT,
+    HIT,
+)
 
 
 class Window:
@@ -21,31 +30,48 @@ class Window:
 
         self.dragging = False
         self.drag_offset = (0, 0)
-        self.active = False
+        self._active = False
         self.visible = True
+        # Frame time not yet passed to app.update(), at reduced tick rates
+        self.pending_dt = 0.0
+        # Some part on screen: visible and not covered by windows above
+        self.exposed = True
         self.embedded = embedded
 
         self.restore_pos = self.rect.topleft
         self.restore_size = self.rect.size
         self.maximized = False
 
-        self.font = pygame.font.Font("fonts/TikTokSans.ttf", FONT_SIZE)
-        if embedded:
-            self.surface = pygame.Surface((rect.w - BORDER * 2, rect.h - BORDER * 2))
-        else:
-            self.surface = pygame.Surface(
-                (rect.w - BORDER * 2, rect.h - TITLEBAR_HEIGHT - BORDER * 2)
-            )
+        self.font = app.kernel.fonts.acquire(TITLE_FONT, FONT_SIZE)
+        self.font_lock = app.kernel.fonts.lock(TITLE_FONT, FONT_SIZE)
+        self.surfaces = app.kernel.surfaces
+        self.surface = self.surfaces.acquire(self.surface_size, id)
+        self.chrome: Optional[pygame.Surface] = None
 
-        self.btn_close_rect = pygame.Rect(
-            0, 0, TITLEBAR_HEIGHT - BORDER, TITLEBAR_HEIGHT - BORDER
-        )
-        self.btn_max_rect = pygame.Rect(
-            0, 0, TITLEBAR_HEIGHT - BORDER, TITLEBAR_HEIGHT - BORDER
-        )
-        self.btn_min_rect = pygame.Rect(
-            0, 0, TITLEBAR_HEIGHT - BORDER, TITLEBAR_HEIGHT - BORDER
-        )
+        # Retained content/chrome, only re-rendered when invalidated
+        self.content_dirty = True
+        self.chrome_dirty = True
+        # Bumped on every re-render, so cached copies know they are stale
+        self.content_version = 0
+        self.chrome_version = 0
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    @active.setter
+    def active(self, value: bool) -> None:
+        if value != self._active:
+            self._active = value
+            self.invalidate_chrome()
+
+    @property
+    def surface_size(self) -> Tuple[int, int]:
+        # Same area as content_rect, so chrome, content and border tile the
+        # whole window rect
+        if self.embedded:
+            return (self.rect.w - BORDER * 2, self.rect.h - BORDER * 2)
+        return (self.rect.w - BORDER * 2, self.rect.h - TITLEBAR_HEIGHT - BORDER)
 
     @property
     def titlebar_rect(self):
@@ -60,7 +86,7 @@ class Window:
                 self.rect.x + BORDER,
                 self.rect.y + BORDER,
                 self.rect.w - BORDER * 2,
-                self.rect.h - BORDER,
+                self.rect.h - BORDER * 2,
             )
         return pygame.Rect(
             self.rect.x + BORDER,
@@ -69,7 +95,57 @@ class Window:
             self.rect.h - BORDER - TITLEBAR_HEIGHT,
         )
 
+    @property
+    def memory(self) -> int:
+        """
+        Bytes of backing surfaces held for content and chrome.
+        """
+        return self.surfaces.memory(self.id)
+
+    def release(self) -> None:
+        self.app.kernel.fonts.release(TITLE_FONT, FONT_SIZE)
+        self.app.release_fonts()
+        self.surfaces.release(self.surface, self.id)
+        if self.chrome is not None:
+            self.surfaces.release(self.chrome, self.id)
+            self.chrome = None
+
+    def damage(self) -> None:
+        """
+        Report the whole window frame as damaged screen area.
+        """
+        self.app.kernel.add_damage(self.rect)
+
+    def set_exposed(self, exposed: bool) -> None:
+        if exposed == self.exposed:
+            return
+        self.exposed = exposed
+        try:
+            self.app.on_visibility_changed(exposed)
+        except Exception as e:
+            print(f"[window] app.on_visibility_changed error in {self.id}: {e}")
+
+    def invalidate(self, rect: Optional[pygame.Rect] = None) -> None:
+        """
+        Mark content for redraw. rect is in content coordinates, None = all.
+        Hidden windows only mark it; they are redrawn once uncovered.
+        """
+        self.content_dirty = True
+        if not self.exposed:
+            return
+        content = self.content_rect
+        if rect is None:
+            self.app.kernel.add_damage(content)
+        else:
+            self.app.kernel.add_damage(rect.move(content.topleft).clip(content))
+
+    def invalidate_chrome(self) -> None:
+        self.chrome_dirty = True
+        if self.exposed and not self.embedded:
+            self.app.kernel.add_damage(self.titlebar_rect)
+
     def toggle_maximize(self):
+        self.damage()
         if getattr(self, "maximized", False):
             self.rect.size = self.restore_size
             self.rect.topleft = self.restore_pos
@@ -83,36 +159,65 @@ class Window:
                 self.app.kernel.screen_height,
             )
             self.maximized = True
+        self.damage()
+        self.app.kernel.window_moved(self)
 
     def contains_point(self, pos: tuple[int, int]) -> bool:
         return self.rect.collidepoint(pos)
 
+    def hit_test(self, pos: Tuple[int, int]) -> HIT:
+        """
+        Classify a screen point using plain arithmetic on the window rect.
+        """
+        x, y = pos
+        r = self.rect
+        if not (r.x <= x < r.x + r.w and r.y <= y < r.y + r.h):
+            return HIT.NONE
+        if self.embedded or y >= r.y + TITLEBAR_HEIGHT:
+            return HIT.CONTENT
+
+        size = TITLEBAR_HEIGHT - BORDER
+        by = r.y + BORDER
+        if by <= y < by + size:
+            bx = r.x + r.w - TITLEBAR_HEIGHT
+            for hit in (HIT.CLOSE, HIT.MAXIMIZE, HIT.MINIMIZE):
+                if bx <= x < bx + size:
+                    return hit
+                bx -= size
+        return HIT.TITLEBAR
+
     def handle_event(self, event: pygame.event.Event) -> bool:
         def move_and_fit(pos: Tuple[int, int]) -> None:
+            self.damage()
             x, y = pos
             ox, oy = self.drag_offset
             self.rect.x = x - ox
             self.rect.y = y - oy
 
-            screen_w, screen_h = pygame.display.get_surface().get_size()
+            screen_w = self.app.kernel.screen_width
+            screen_h = self.app.kernel.screen_height
             self.rect.x = max(0, min(self.rect.x, screen_w - self.rect.w))
             self.rect.y = max(0, min(self.rect.y, screen_h - self.rect.h))
+            self.damage()
+            self.app.kernel.window_moved(self)
 
         if not self.visible:
             return False
 
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if self.titlebar_rect.collidepoint(event.pos):
-                if self.btn_close_rect.collidepoint(event.pos):
-                    self.app.kernel.close_window(self.id)
-                    return True
-                elif self.btn_max_rect.collidepoint(event.pos):
-                    self.toggle_maximize()
-                    return True
-                elif self.btn_min_rect.collidepoint(event.pos):
-                    self.visible = not self.visible
-                    return True
-
+            hit = self.hit_test(event.pos)
+            if hit is HIT.CLOSE:
+                self.app.kernel.close_window(self.id)
+                return True
+            elif hit is HIT.MAXIMIZE:
+                self.toggle_maximize()
+                return True
+            elif hit is HIT.MINIMIZE:
+                self.damage()
+                self.visible = not self.visible
+                self.app.kernel.window_moved(self)
+                return True
+            elif hit is HIT.TITLEBAR:
                 self.dragging = True
                 if self.maximized:
                     self.toggle_maximize()
@@ -134,6 +239,9 @@ class Window:
         elif event.type == pygame.MOUSEMOTION and self.dragging:
             move_and_fit(event.pos)
             return True
+
+        if not self.app.wants_event(event.type):
+            return False
         try:
             self.app.handle_event(event)
         except Exception as e:
@@ -142,65 +250,92 @@ class Window:
 
     def update(self, dt: float) -> None:
         try:
-            if self.surface.get_size() != (
-                self.rect.w - BORDER * 2,
-                self.rect.h - TITLEBAR_HEIGHT - BORDER,
-            ):
-                if self.embedded:
-                    self.surface = pygame.Surface(
-                        (self.rect.w - BORDER * 2, self.rect.h - BORDER * 2)
-                    )
-                else:
-                    self.surface = pygame.Surface(
-                        (
-                            self.rect.w - BORDER * 2,
-                            self.rect.h - TITLEBAR_HEIGHT - BORDER * 2,
-                        )
-                    )
             self.app.update(dt)
         except Exception as e:
             print(f"[window] app.update error in {self.id}: {e}")
 
-    def draw(self, surface: pygame.Surface) -> None:
-        if not self.visible:
-            return
+    def fit_surface(self) -> None:
+        """
+        Match the content surface to the window size before drawing, since
+        update() may run less often than the window is resized.
+        """
+        size = self.surface_size
+        if self.surface.get_size() != size:
+            self.surface = self.surfaces.resize(self.surface, size, self.id)
+            self.chrome_dirty = True
+            self.invalidate()
 
-        if not self.embedded:
-            # Title bar
-            if not self.embedded:
-                titlebar = self.titlebar_rect
-                title_color = (50, 120, 200) if self.active else (100, 100, 100)
-                pygame.draw.rect(surface, title_color, titlebar)
+    def render_chrome(self) -> None:
+        w = self.rect.w
+        if self.chrome is None:
+            self.chrome = self.surfaces.acquire((w, TITLEBAR_HEIGHT), self.id)
+        elif self.chrome.get_width() != w:
+            self.chrome = self.surfaces.resize(
+                self.chrome, (w, TITLEBAR_HEIGHT), self.id
+            )
 
-            # Title text
-            title_surf = self.font.render(self.title, True, (255, 255, 255))
-            title_x = self.rect.x + (self.rect.w - title_surf.get_width()) // 2
-            title_y = self.rect.y + (TITLEBAR_HEIGHT - title_surf.get_height()) // 2
-            surface.blit(title_surf, (title_x, title_y))
+        # Title bar
+        title_color = (50, 120, 200) if self.active else (100, 100, 100)
+        self.chrome.fill(title_color)
 
-            # Buttons
-            x = self.rect.right - (TITLEBAR_HEIGHT)
-            y = self.rect.y + BORDER
-            self.btn_close_rect.topleft = (x, y)
+        # Title text
+        title_surf = self.font.render(self.title, True, (255, 255, 255))
+        title_x = (w - title_surf.get_width()) // 2
+        title_y = (TITLEBAR_HEIGHT - title_surf.get_height()) // 2
+        self.chrome.blit(title_surf, (title_x, title_y))
 
-            x -= TITLEBAR_HEIGHT - BORDER
-            self.btn_max_rect.topleft = (x, y)
+        # Buttons
+        x = w - TITLEBAR_HEIGHT
+        size = TITLEBAR_HEIGHT - BORDER
+        for color in ((200, 80, 80), (200, 200, 80), (80, 200, 80)):
+            pygame.draw.rect(self.chrome, color, (x, BORDER, size, size))
+            x -= size
 
-            x -= TITLEBAR_HEIGHT - BORDER
-            self.btn_min_rect.topleft = (x, y)
+        self.chrome_dirty = False
+        self.chrome_version += 1
 
-            pygame.draw.rect(surface, (200, 80, 80), self.btn_close_rect)
-            pygame.draw.rect(surface, (200, 200, 80), self.btn_max_rect)
-            pygame.draw.rect(surface, (80, 200, 80), self.btn_min_rect)
+    def prepare(self, force: bool = False, profiler: Optional[Profiler] = None) -> bool:
+        """
+        Main thread part of rendering: fit the surface and redraw the chrome
+        if dirty. True if the content needs render_content() too.
+        """
+        self.fit_surface()
+        if not self.embedded and (force or self.chrome_dirty):
+            if profiler is None:
+                self.render_chrome()
+            else:
+                start = time.perf_counter()
+                self.render_chrome()
+                profiler.record(self.id, "chrome", time.perf_counter() - start)
 
+        return force or self.content_dirty
+
+    def render_content(self, profiler: Optional[Profiler] = None) -> None:
+        """
+        Draw the app into the content surface. May run on a render thread
+        for apps with threaded_draw.
+        """
+        start = time.perf_counter() if profiler is not None else 0.0
         try:
             self.app.draw(self.surface)
         except Exception as e:
             self.surface.fill((100, 0, 0))
-            err = self.font.render(str(e), True, (255, 255, 255))
+            with self.font_lock:
+                err = self.font.render(str(e), True, (255, 255, 255))
             self.surface.blit(err, (8, 8))
+        self.content_dirty = False
+        self.content_version += 1
+        if profiler is not None:
+            profiler.record(self.id, "draw", time.perf_counter() - start)
+
+    def composite(self, surface: pygame.Surface) -> None:
+        """
+        Blit the retained chrome and content onto the screen surface.
+        """
+        if not self.embedded and self.chrome is not None:
+            surface.blit(self.chrome, self.rect.topleft)
 
         # Border
-        pygame.draw.rect(surface, (20, 20, 20), self.rect, BORDER)
+        pygame.draw.rect(surface, BORDER_COLOR, self.rect, BORDER)
 
         surface.blit(self.surface, self.content_rect)
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from window import Window
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class WindowStack:
+    """
+    Windows in z-order (bottom to top) with O(1) lookup by id, raise, lower
+    and remove. Iteration walks a cached snapshot, so windows may be opened
+    or closed while iterating, like the plain list this replaces.
+
+    Each window also gets a z stamp, higher meaning closer to the top, so
+    two windows can be compared without walking the order.
+    """
+
+    def __init__(self) -> None:
+        self.order: "OrderedDict[int, Window]" = OrderedDict()
+        self.z: Dict[int, int] = {}
+        self._top_z = 0
+        self._bottom_z = 0
+        self._snapshot: Optional[Tuple[Window, ...]] = None
+
+    def snapshot(self) -> Tuple[Window, ...]:
+        if self._snapshot is None:
+            self._snapshot = tuple(self.order.values())
+        return self._snapshot
+
+    def __iter__(self) -> Iterator[Window]:
+        return iter(self.snapshot())
+
+    def __reversed__(self) -> Iterator[Window]:
+        return reversed(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __bool__(self) -> bool:
+        return bool(self.order)
+
+    def __contains__(self, win: object) -> bool:
+        return isinstance(win, Window) and self.order.get(win.id) is win
+
+    def __getitem__(self, index: int) -> Window:
+        if index == -1 and self.order:
+            return next(reversed(self.order.values()))
+        if index == 0 and self.order:
+            return next(iter(self.order.values()))
+        return self.snapshot()[index]
+
+    @property
+    def top(self) -> Optional[Window]:
+        return self[-1] if self.order else None
+
+    def get(self, wid: Optional[int]) -> Optional[Window]:
+        return self.order.get(wid)  # type: ignore[arg-type]
+
+    def push(self, win: Window) -> None:
+        self.order[win.id] = win
+        self._top_z += 1
+        self.z[win.id] = self._top_z
+        self._snapshot = None
+
+    def raise_to_top(self, wid: int) -> None:
+        self.order.move_to_end(wid)
+        self._top_z += 1
+        self.z[wid] = self._top_z
+        self._snapshot = None
+
+    def lower_to_bottom(self, wid: int) -> None:
+        self.order.move_to_end(wid, last=False)
+        self._bottom_z -= 1
+        self.z[wid] = self._bottom_z
+        self._snapshot = None
+
+    def remove(self, wid: int) -> Optional[Window]:
+        win = self.order.pop(wid, None)
+        if win is not None:
+            del self.z[wid]
+            self._snapshot = None
+        return win